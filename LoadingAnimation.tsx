@@ -2,7 +2,34 @@
 
 import { motion } from 'framer-motion';
 
-export default function LoadingAnimation() {
+interface LoadingAnimationProps {
+  stage?: string;
+  progress?: number;
+}
+
+const STAGE_LABELS: Record<string, string> = {
+  uploaded: 'Upload received',
+  queued: 'Waiting for a worker',
+  started: 'Starting analysis',
+  parsing: 'Reading document',
+  pages_extracted: 'Extracting pages',
+  sheet_read: 'Reading sheets',
+  ocr_done: 'Recognizing text',
+  extracted: 'Text extracted',
+  structured: 'Building statements',
+  analyzing: 'Calculating',
+  ratios: 'Ratios calculated',
+  trends: 'Trends detected',
+  anomalies: 'Checking for anomalies',
+  insights: 'Generating insights',
+  charts: 'Preparing charts',
+  cached: 'Loaded from cache',
+};
+
+export default function LoadingAnimation({ stage, progress }: LoadingAnimationProps = {}) {
+  const tracked = progress !== undefined;
+  const percent = `${Math.round((progress ?? 0) * 100)}%`;
+
   return (
     <div className="flex flex-col items-center justify-center min-h-[60vh] space-y-8">
       {/* Animated Logo */}
@@ -78,6 +105,11 @@ export default function LoadingAnimation() {
         >
           Analyzing Your Financial Data
         </motion.h3>
+        {stage && (
+          <p className="text-sm text-cosmic-200/70">
+            {STAGE_LABELS[stage] ?? stage}{tracked && ` · ${percent}`}
+          </p>
+        )}
         
         {/* Progress Steps */}
         <div className="flex items-center justify-center space-x-4 text-sm">
@@ -110,16 +142,25 @@ export default function LoadingAnimation() {
       {/* Loading Bar */}
       <div className="w-full max-w-md">
         <div className="h-2 bg-void-700 rounded-full overflow-hidden">
-          <motion.div
-            className="h-full bg-cosmic-gradient"
-            initial={{ width: "0%" }}
-            animate={{ width: "100%" }}
-            transition={{
-              duration: 2,
-              repeat: Infinity,
-              ease: "easeInOut"
-            }}
-          />
+          {tracked ? (
+            <motion.div
+              className="h-full bg-cosmic-gradient"
+              initial={false}
+              animate={{ width: percent }}
+              transition={{ duration: 0.3, ease: "easeOut" }}
+            />
+          ) : (
+            <motion.div
+              className="h-full bg-cosmic-gradient"
+              initial={{ width: "0%" }}
+              animate={{ width: "100%" }}
+              transition={{
+                duration: 2,
+                repeat: Infinity,
+                ease: "easeInOut"
+              }}
+            />
+          )}
         </div>
       </div>
 
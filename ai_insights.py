@@ -1,6 +1,90 @@
-from typing import Dict, List, Any
+from typing import Any, Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
 from app.models.schemas import AIInsight, FinancialRatios, TrendAnalysis
 import json
+import numpy as np
+
+# Insight sections in reporting order, with the ratio categories each one reads
+INSIGHT_SECTIONS = {
+    "liquidity": ("liquidity",),
+    "leverage": ("leverage",),
+    "profitability": ("profitability",),
+    "efficiency": ("efficiency",),
+    "overall": ("liquidity", "leverage", "profitability", "efficiency")
+}
+
+PRIORITY_ORDER = {"Critical": 0, "High": 1, "Medium": 2, "Low": 3}
+
+class SubScore(NamedTuple):
+    """
+    One half of a category's health score, piecewise in one ratio
+    The score is that of the first rule whose test passes, else `otherwise`;
+    scores may be functions of the ratio. Tests and functions work on floats
+    and on arrays alike, np.fmax standing in for max(0, x) as it ignores NaN.
+    """
+    ratio: str
+    default: float
+    rules: Tuple[Tuple[Callable[[Any], Any], Any], ...]
+    otherwise: Any
+    
+    def score(self, value: Any) -> Any:
+        if isinstance(value, np.ndarray):
+            return np.select(
+                [test(value) for test, _ in self.rules],
+                [score(value) if callable(score) else score for _, score in self.rules],
+                self.otherwise(value) if callable(self.otherwise) else self.otherwise
+            )
+        for test, score in self.rules:
+            if test(value):
+                return score(value) if callable(score) else score
+        return self.otherwise(value) if callable(self.otherwise) else self.otherwise
+
+# Each category's score (0-100) is the mean of its two sub-scores
+HEALTH_SUBSCORES: Dict[str, Tuple[SubScore, SubScore]] = {
+    "liquidity": (
+        SubScore("current_ratio", 0, (
+            (lambda x: (x >= 1.5) & (x <= 3.0), 100), (lambda x: x < 1.0, 30), (lambda x: x < 1.5, 60)
+        ), 75),
+        SubScore("quick_ratio", 0, ((lambda x: x >= 1.0, 100),), lambda x: x * 100)
+    ),
+    "leverage": (
+        SubScore("debt_to_equity", 0, (
+            (lambda x: x <= 0.5, 100), (lambda x: x <= 1.5, 80), (lambda x: x <= 2.0, 60)
+        ), lambda x: np.fmax(0, 60 - (x - 2.0) * 20)),
+        SubScore("interest_coverage", 0, (
+            (lambda x: x >= 5.0, 100), (lambda x: x >= 2.5, 80), (lambda x: x > 0, lambda x: np.fmax(0, x * 20))
+        ), 0)
+    ),
+    "profitability": (
+        SubScore("roe", 0, (
+            (lambda x: x >= 0.20, 100), (lambda x: x >= 0.10, 70), (lambda x: x > 0, lambda x: np.fmax(0, x * 350))
+        ), 0),
+        SubScore("net_margin", 0, (
+            (lambda x: x >= 0.15, 100), (lambda x: x >= 0.05, 70), (lambda x: x > 0, lambda x: np.fmax(0, x * 350))
+        ), 0)
+    ),
+    "efficiency": (
+        SubScore("asset_turnover", 0, (
+            (lambda x: x >= 2.0, 100), (lambda x: x >= 1.0, 80)
+        ), lambda x: np.fmax(0, x * 50)),
+        SubScore("cash_conversion_cycle", 90, (
+            (lambda x: x <= 30, 100), (lambda x: x <= 60, 80), (lambda x: x <= 90, 60)
+        ), lambda x: np.fmax(0, 60 - (x - 90) * 0.5))
+    )
+}
+
+# The ratios the health score reads
+HEALTH_SCORE_RATIOS = tuple(
+    f"{category}.{subscore.ratio}" for category, subscores in HEALTH_SUBSCORES.items() for subscore in subscores
+)
+
+def category_score(category: str, ratios: Mapping[str, Any]) -> Any:
+    """One category's score from its ratios, floats or arrays of variants"""
+    first, second = (subscore.score(ratios.get(subscore.ratio, subscore.default)) for subscore in HEALTH_SUBSCORES[category])
+    return (first + second) / 2
+
+def health_score(ratios: Mapping[str, Mapping[str, Any]]) -> Any:
+    """The overall score _analyze_overall reports: the mean of the four category scores"""
+    return sum(category_score(category, ratios.get(category, {})) for category in HEALTH_SUBSCORES) / len(HEALTH_SUBSCORES)
 
 class AIInsightGenerator:
     """Generate AI-powered insights and recommendations"""
@@ -19,20 +103,31 @@ class AIInsightGenerator:
                          ratios: FinancialRatios,
                          trends: TrendAnalysis) -> List[AIInsight]:
         """Generate comprehensive AI insights"""
+        return self.merge_sections(self.generate_sections(ratios, trends))
+    
+    def generate_sections(self,
+                          ratios: FinancialRatios,
+                          trends: TrendAnalysis,
+                          sections: Optional[Iterable[str]] = None) -> Dict[str, List[AIInsight]]:
+        """Insights of each section in INSIGHT_SECTIONS, or just the ones named"""
+        
+        wanted = INSIGHT_SECTIONS if sections is None else set(sections)
+        results = {}
+        for section in INSIGHT_SECTIONS:
+            if section not in wanted:
+                continue
+            if section == "overall":
+                results[section] = self._analyze_overall(ratios, trends)
+            else:
+                results[section] = self.insight_templates[section](getattr(ratios, section))
+        return results
+    
+    @staticmethod
+    def merge_sections(sections: Dict[str, List[AIInsight]]) -> List[AIInsight]:
+        """One list in section order, sorted by priority"""
         
-        insights = []
-        
-        # Analyze each category
-        insights.extend(self._analyze_liquidity(ratios.liquidity))
-        insights.extend(self._analyze_leverage(ratios.leverage))
-        insights.extend(self._analyze_profitability(ratios.profitability))
-        insights.extend(self._analyze_efficiency(ratios.efficiency))
-        insights.extend(self._analyze_overall(ratios, trends))
-        
-        # Sort by priority
-        priority_order = {"Critical": 0, "High": 1, "Medium": 2, "Low": 3}
-        insights.sort(key=lambda x: priority_order.get(x.priority, 4))
-        
+        insights = [insight for section in INSIGHT_SECTIONS for insight in sections.get(section, ())]
+        insights.sort(key=lambda x: PRIORITY_ORDER.get(x.priority, 4))
         return insights
     
     def _analyze_liquidity(self, liquidity: Dict[str, float]) -> List[AIInsight]:
@@ -45,7 +140,7 @@ class AIInsightGenerator:
         
         # Current ratio analysis
         if current_ratio < 1.0:
-            insights.append(AIInsight(
+            insights.append(AIInsight.model_construct(
                 category="Liquidity",
                 insight=f"Critical liquidity concern: Current ratio of {current_ratio:.2f} indicates insufficient short-term assets to cover liabilities.",
                 recommendation="Immediately focus on: 1) Accelerating receivables collection, 2) Reducing inventory levels, 3) Negotiating extended payment terms with suppliers, or 4) Securing short-term credit line.",
@@ -53,7 +148,7 @@ class AIInsightGenerator:
                 priority="Critical"
             ))
         elif current_ratio < 1.5:
-            insights.append(AIInsight(
+            insights.append(AIInsight.model_construct(
                 category="Liquidity",
                 insight=f"Liquidity is below healthy range. Current ratio of {current_ratio:.2f} suggests tight working capital.",
                 recommendation="Build cash reserves by improving collection processes and optimizing inventory turnover. Target current ratio above 1.5.",
@@ -61,7 +156,7 @@ class AIInsightGenerator:
                 priority="High"
             ))
         elif current_ratio > 3.0:
-            insights.append(AIInsight(
+            insights.append(AIInsight.model_construct(
                 category="Liquidity",
                 insight=f"Excess liquidity detected. Current ratio of {current_ratio:.2f} may indicate inefficient asset utilization.",
                 recommendation="Consider investing excess cash in growth initiatives, reducing expensive debt, or returning capital to shareholders.",
@@ -69,7 +164,7 @@ class AIInsightGenerator:
                 priority="Medium"
             ))
         else:
-            insights.append(AIInsight(
+            insights.append(AIInsight.model_construct(
                 category="Liquidity",
                 insight=f"Strong liquidity position with current ratio of {current_ratio:.2f} in healthy range (1.5-3.0).",
                 recommendation="Maintain current working capital management practices. Continue monitoring receivables and inventory levels.",
@@ -79,7 +174,7 @@ class AIInsightGenerator:
         
         # Quick ratio analysis
         if quick_ratio < 1.0:
-            insights.append(AIInsight(
+            insights.append(AIInsight.model_construct(
                 category="Liquidity",
                 insight=f"Quick ratio of {quick_ratio:.2f} shows dependence on inventory to meet obligations.",
                 recommendation="Reduce inventory dependency by accelerating cash conversion cycle. Focus on receivables management.",
@@ -99,7 +194,7 @@ class AIInsightGenerator:
         
         # Debt-to-equity analysis
         if debt_to_equity > 2.0:
-            insights.append(AIInsight(
+            insights.append(AIInsight.model_construct(
                 category="Leverage",
                 insight=f"High leverage: Debt-to-equity ratio of {debt_to_equity:.2f} significantly exceeds healthy range (0.5-1.5).",
                 recommendation="Priority: Deleveraging through: 1) Debt paydown from operating cash, 2) Equity raising if feasible, 3) Asset sales of non-core holdings. Avoid new debt.",
@@ -107,7 +202,7 @@ class AIInsightGenerator:
                 priority="Critical"
             ))
         elif debt_to_equity > 1.5:
-            insights.append(AIInsight(
+            insights.append(AIInsight.model_construct(
                 category="Leverage",
                 insight=f"Elevated leverage at {debt_to_equity:.2f} debt-to-equity ratio.",
                 recommendation="Focus on gradual deleveraging. Prioritize debt repayment in capital allocation. Monitor credit metrics closely.",
@@ -115,7 +210,7 @@ class AIInsightGenerator:
                 priority="High"
             ))
         elif debt_to_equity < 0.3:
-            insights.append(AIInsight(
+            insights.append(AIInsight.model_construct(
                 category="Leverage",
                 insight=f"Conservative capital structure with {debt_to_equity:.2f} debt-to-equity ratio.",
                 recommendation="Consider strategic use of debt to optimize capital structure and potentially reduce WACC. Tax benefits of debt may be underutilized.",
@@ -125,7 +220,7 @@ class AIInsightGenerator:
         
         # Interest coverage analysis
         if interest_coverage < 2.5 and interest_coverage > 0:
-            insights.append(AIInsight(
+            insights.append(AIInsight.model_construct(
                 category="Leverage",
                 insight=f"Weak interest coverage at {interest_coverage:.2f}x indicates limited buffer for debt service.",
                 recommendation="Improve EBITDA through operational efficiency and revenue growth. Consider refinancing at lower rates if possible.",
@@ -133,7 +228,7 @@ class AIInsightGenerator:
                 priority="Critical"
             ))
         elif interest_coverage > 5.0:
-            insights.append(AIInsight(
+            insights.append(AIInsight.model_construct(
                 category="Leverage",
                 insight=f"Strong interest coverage of {interest_coverage:.2f}x provides comfortable debt service cushion.",
                 recommendation="Debt service is well-covered. Opportunity to take on additional leverage for growth if strategic opportunities arise.",
@@ -154,7 +249,7 @@ class AIInsightGenerator:
         
         # Net margin analysis
         if net_margin < 0:
-            insights.append(AIInsight(
+            insights.append(AIInsight.model_construct(
                 category="Profitability",
                 insight=f"Operating at a loss with {net_margin:.1f}% net margin.",
                 recommendation="Urgent focus needed on: 1) Revenue growth through market expansion, 2) Cost reduction across all expense categories, 3) Product mix optimization toward higher-margin offerings, 4) Pricing power assessment.",
@@ -162,7 +257,7 @@ class AIInsightGenerator:
                 priority="Critical"
             ))
         elif net_margin < 5.0:
-            insights.append(AIInsight(
+            insights.append(AIInsight.model_construct(
                 category="Profitability",
                 insight=f"Thin margins at {net_margin:.1f}% leave little buffer for market changes.",
                 recommendation="Focus on margin expansion through operational leverage, pricing optimization, and cost discipline. Benchmark against industry leaders.",
@@ -170,7 +265,7 @@ class AIInsightGenerator:
                 priority="High"
             ))
         elif net_margin > 20.0:
-            insights.append(AIInsight(
+            insights.append(AIInsight.model_construct(
                 category="Profitability",
                 insight=f"Exceptional profitability with {net_margin:.1f}% net margin, exceeding industry standards.",
                 recommendation="Strong competitive position. Consider reinvesting excess returns in growth initiatives or innovation while maintaining pricing discipline.",
@@ -180,7 +275,7 @@ class AIInsightGenerator:
         
         # ROE analysis
         if roe > 0 and roe < 10.0:
-            insights.append(AIInsight(
+            insights.append(AIInsight.model_construct(
                 category="Profitability",
                 insight=f"ROE of {roe:.1f}% below cost of equity threshold.",
                 recommendation="Shareholders are not earning adequate returns. Focus on DuPont components: improve margins, increase asset turnover, or optimize capital structure.",
@@ -188,7 +283,7 @@ class AIInsightGenerator:
                 priority="High"
             ))
         elif roe > 20.0:
-            insights.append(AIInsight(
+            insights.append(AIInsight.model_construct(
                 category="Profitability",
                 insight=f"Outstanding ROE of {roe:.1f}% demonstrates superior capital efficiency.",
                 recommendation="Sustain competitive advantages driving high returns. Monitor for mean reversion and invest in moats.",
@@ -209,7 +304,7 @@ class AIInsightGenerator:
         
         # Asset turnover
         if asset_turnover < 0.5:
-            insights.append(AIInsight(
+            insights.append(AIInsight.model_construct(
                 category="Efficiency",
                 insight=f"Low asset turnover of {asset_turnover:.2f} indicates underutilized assets.",
                 recommendation="Improve asset productivity through: 1) Revenue growth on existing asset base, 2) Divesting non-productive assets, 3) Optimizing capacity utilization.",
@@ -217,7 +312,7 @@ class AIInsightGenerator:
                 priority="Medium"
             ))
         elif asset_turnover > 2.0:
-            insights.append(AIInsight(
+            insights.append(AIInsight.model_construct(
                 category="Efficiency",
                 insight=f"High asset turnover of {asset_turnover:.2f} shows efficient asset utilization.",
                 recommendation="Strong operational efficiency. Ensure growth doesn't strain capacity. Plan capital investments proactively.",
@@ -227,7 +322,7 @@ class AIInsightGenerator:
         
         # Cash conversion cycle
         if cash_conversion > 90:
-            insights.append(AIInsight(
+            insights.append(AIInsight.model_construct(
                 category="Efficiency",
                 insight=f"Extended cash conversion cycle of {cash_conversion:.0f} days ties up significant working capital.",
                 recommendation="Accelerate cash conversion by: 1) Reducing DSO through better collections, 2) Optimizing inventory levels, 3) Extending DPO where feasible without harming supplier relationships.",
@@ -235,7 +330,7 @@ class AIInsightGenerator:
                 priority="High"
             ))
         elif cash_conversion < 30:
-            insights.append(AIInsight(
+            insights.append(AIInsight.model_construct(
                 category="Efficiency",
                 insight=f"Excellent cash conversion cycle of {cash_conversion:.0f} days demonstrates superior working capital management.",
                 recommendation="Maintain best-in-class working capital practices. This is a competitive advantage worth protecting.",
@@ -272,7 +367,7 @@ class AIInsightGenerator:
             health_rating = "Poor"
             color = "red"
         
-        insights.append(AIInsight(
+        insights.append(AIInsight.model_construct(
             category="Overall Assessment",
             insight=f"Financial Health Score: {overall_score:.0f}/100 - {health_rating}. Breakdown: Liquidity {scores['liquidity']}, Leverage {scores['leverage']}, Profitability {scores['profitability']}, Efficiency {scores['efficiency']}.",
             recommendation=self._generate_strategic_recommendation(scores, ratios),
@@ -284,97 +379,19 @@ class AIInsightGenerator:
     
     def _score_liquidity(self, liquidity: Dict[str, float]) -> float:
         """Score liquidity (0-100)"""
-        current_ratio = liquidity.get("current_ratio", 0)
-        quick_ratio = liquidity.get("quick_ratio", 0)
-        
-        if current_ratio >= 1.5 and current_ratio <= 3.0:
-            current_score = 100
-        elif current_ratio < 1.0:
-            current_score = 30
-        elif current_ratio < 1.5:
-            current_score = 60
-        else:
-            current_score = 75
-        
-        if quick_ratio >= 1.0:
-            quick_score = 100
-        else:
-            quick_score = quick_ratio * 100
-        
-        return (current_score + quick_score) / 2
+        return float(category_score("liquidity", liquidity))
     
     def _score_leverage(self, leverage: Dict[str, float]) -> float:
         """Score leverage (0-100)"""
-        dte = leverage.get("debt_to_equity", 0)
-        interest_cov = leverage.get("interest_coverage", 0)
-        
-        if dte <= 0.5:
-            dte_score = 100
-        elif dte <= 1.5:
-            dte_score = 80
-        elif dte <= 2.0:
-            dte_score = 60
-        else:
-            dte_score = max(0, 60 - (dte - 2.0) * 20)
-        
-        if interest_cov >= 5.0:
-            ic_score = 100
-        elif interest_cov >= 2.5:
-            ic_score = 80
-        elif interest_cov > 0:
-            ic_score = max(0, interest_cov * 20)
-        else:
-            ic_score = 0
-        
-        return (dte_score + ic_score) / 2
+        return float(category_score("leverage", leverage))
     
     def _score_profitability(self, profitability: Dict[str, float]) -> float:
         """Score profitability (0-100)"""
-        roe = profitability.get("roe", 0)
-        net_margin = profitability.get("net_margin", 0)
-        
-        if roe >= 0.20:
-            roe_score = 100
-        elif roe >= 0.10:
-            roe_score = 70
-        elif roe > 0:
-            roe_score = max(0, roe * 350)
-        else:
-            roe_score = 0
-        
-        if net_margin >= 0.15:
-            margin_score = 100
-        elif net_margin >= 0.05:
-            margin_score = 70
-        elif net_margin > 0:
-            margin_score = max(0, net_margin * 350)
-        else:
-            margin_score = 0
-        
-        return (roe_score + margin_score) / 2
+        return float(category_score("profitability", profitability))
     
     def _score_efficiency(self, efficiency: Dict[str, float]) -> float:
         """Score efficiency (0-100)"""
-        asset_turnover = efficiency.get("asset_turnover", 0)
-        ccc = efficiency.get("cash_conversion_cycle", 90)
-        
-        if asset_turnover >= 2.0:
-            at_score = 100
-        elif asset_turnover >= 1.0:
-            at_score = 80
-        else:
-            at_score = max(0, asset_turnover * 50)
-        
-        if ccc <= 30:
-            ccc_score = 100
-        elif ccc <= 60:
-            ccc_score = 80
-        elif ccc <= 90:
-            ccc_score = 60
-        else:
-            ccc_score = max(0, 60 - (ccc - 90) * 0.5)
-        
-        return (at_score + ccc_score) / 2
+        return float(category_score("efficiency", efficiency))
     
     def _generate_strategic_recommendation(self, scores: Dict[str, float], ratios: FinancialRatios) -> str:
         """Generate strategic recommendations based on score breakdown"""
@@ -31,6 +31,19 @@ export async function uploadFile(file: File): Promise<AnalysisResponse> {
   return response.data;
 }
 
+export async function analyzeDocument(documentId: string): Promise<any> {
+  const formData = new FormData();
+  formData.append('document_id', documentId);
+
+  const response = await api.post('/api/analyze', formData, {
+    headers: {
+      'Content-Type': 'multipart/form-data',
+    },
+  });
+
+  return response.data;
+}
+
 export async function getAnalysis(analysisId: string): Promise<AnalysisResponse> {
   const response = await api.get(`/api/analysis/${analysisId}`);
   return response.data;
@@ -57,6 +70,90 @@ export async function downloadReport(analysisId: string, format: 'pdf' | 'excel'
   window.URL.revokeObjectURL(url);
 }
 
+export interface JobEvent {
+  seq: number;
+  event: string;
+  data: any;
+}
+
+export async function submitJob(file: File): Promise<any> {
+  const formData = new FormData();
+  formData.append('file', file);
+
+  const response = await api.post('/api/jobs', formData, {
+    headers: {
+      'Content-Type': 'multipart/form-data',
+    },
+  });
+
+  return response.data;
+}
+
+export async function getJob(jobId: string): Promise<any> {
+  const response = await api.get(`/api/jobs/${jobId}`);
+  return response.data;
+}
+
+// Follow a job's stage events; returns a function that stops listening.
+// EventSource reconnects with Last-Event-ID on its own, so no events are missed.
+export function watchJob(jobId: string, onEvent: (event: JobEvent) => void): () => void {
+  const source = new EventSource(`${API_BASE_URL}/api/jobs/${jobId}/events`);
+  const events = [
+    'uploaded', 'queued', 'started', 'parsing', 'pages_extracted', 'sheet_read', 'ocr_done',
+    'extracted', 'structured', 'analyzing', 'ratios', 'trends', 'anomalies', 'insights',
+    'charts', 'cached', 'succeeded', 'failed',
+  ];
+
+  const handle = (message: MessageEvent) => {
+    onEvent({ seq: Number(message.lastEventId), event: message.type, data: JSON.parse(message.data) });
+    if (message.type === 'succeeded' || message.type === 'failed') {
+      source.close();
+    }
+  };
+  events.forEach((name) => source.addEventListener(name, handle as EventListener));
+
+  return () => source.close();
+}
+
+export interface ScenarioOverrides {
+  changes?: Record<string, number>;  // relative change per line item, 0.1 = +10%
+  values?: Record<string, number>;   // replacement figures, applied after changes
+  period?: string;                   // defaults to the latest period
+}
+
+// What-if analysis of an uploaded document; only what the overrides reach is recomputed.
+export async function runScenario(documentId: string, overrides: ScenarioOverrides): Promise<any> {
+  const response = await api.post(`/api/documents/${documentId}/scenario`, overrides);
+  return response.data;
+}
+
+export interface SimulationOptions {
+  drivers?: Record<string, { mean?: number; sd?: number; low?: number; high?: number }>;
+  correlations?: Record<string, Record<string, number>>;
+  scenarios?: number;
+  seed?: number;
+  percentiles?: number[];
+}
+
+// Monte Carlo percentile bands for every ratio of an uploaded document, one period ahead.
+export async function runSimulation(documentId: string, options: SimulationOptions = {}): Promise<any> {
+  const response = await api.post(`/api/documents/${documentId}/simulation`, options);
+  return response.data;
+}
+
+export interface SensitivityOptions {
+  items?: string[];     // line items to vary; defaults to the main income and balance sheet items reported
+  steps?: number[];     // relative changes, 0.1 = +10%; 0 is always included
+  targets?: string[];   // ratio fields such as "profitability.roe", or "health_score"
+  heatmap?: string[];   // the two items varied together; defaults to the first two items
+}
+
+// Tornado, elasticity and heatmap tables for which line items move chosen ratios of an uploaded document.
+export async function runSensitivity(documentId: string, options: SensitivityOptions = {}): Promise<any> {
+  const response = await api.post(`/api/documents/${documentId}/sensitivity`, options);
+  return response.data;
+}
+
 export async function healthCheck(): Promise<any> {
   const response = await api.get('/api/health');
   return response.data;
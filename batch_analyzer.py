@@ -0,0 +1,262 @@
+"""
+Batch Analyzer - Many statements per request, streamed back as NDJSON
+Uploads (or the members of one ZIP) are spooled to a batch directory,
+analyzed concurrently on the pipeline executor and written out as each
+one finishes, with per-item errors reported inline
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+import zlib
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, List, Optional
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from app.services import pipeline, serialization
+from app.services.pipeline_executor import ExecutorSaturatedError, PipelineExecutor
+from app.services.result_cache import ResultCache
+from app.services.upload_spooler import UploadSpooler, UploadTooLargeError
+
+
+# Files accepted per batch, counting ZIP members
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", 5000))
+# Total bytes per batch, after ZIP members are decompressed
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+# Items in flight at once; 0 means twice the executor's workers
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 0))
+
+# Pause before resubmitting an item the executor turned away as saturated
+SATURATED_RETRY_SECONDS = 0.05
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+class BatchTooLargeError(ValueError):
+    """Raised when a batch exceeds its file count or total size limit"""
+
+
+@dataclass
+class BatchItem:
+    """One document of a batch, spooled to disk, or the reason it could not be"""
+    
+    index: int
+    filename: str
+    path: Optional[str] = None
+    sha256: Optional[str] = None
+    error: Optional[str] = None
+
+
+class Batch:
+    """Spooled batch items plus the directory that holds them"""
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.items: List[BatchItem] = []
+        self.total_bytes = 0
+    
+    def cleanup(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class BatchAnalyzer:
+    """
+    Spools a batch once, then analyzes its items with bounded concurrency
+    Each item runs parsing and analysis in one executor task, like a single
+    /api/analyze upload, and shares the same result cache. Items are
+    streamed in completion order; every line carries the item's index.
+    """
+    
+    def __init__(
+        self,
+        executor: PipelineExecutor,
+        cache: ResultCache,
+        spooler: UploadSpooler,
+        detect_file_type: Callable[[str], str],
+        max_files: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        concurrency: Optional[int] = None
+    ):
+        self.executor = executor
+        self.cache = cache
+        self.spooler = spooler
+        self.detect_file_type = detect_file_type
+        self.max_files = max_files or BATCH_MAX_FILES
+        self.max_bytes = max_bytes or BATCH_MAX_BYTES
+        self.concurrency = concurrency or BATCH_CONCURRENCY or max(executor.max_workers, 1) * 2
+    
+    @property
+    def max_request_bytes(self) -> int:
+        """Largest batch request body accepted before the endpoint runs"""
+        return self.max_bytes + self.max_files * 1024
+    
+    async def spool(self, files: List[UploadFile]) -> Batch:
+        """Write every upload to a batch directory; a single ZIP is unpacked"""
+        
+        batch = Batch(tempfile.mkdtemp(prefix="batch-", dir=self.spooler.spool_dir))
+        try:
+            if len(files) > self.max_files:
+                raise BatchTooLargeError(f"Batch exceeds maximum of {self.max_files} files")
+            
+            for file in files:
+                if (file.filename or "").lower().endswith(".zip"):
+                    archive = await self._write_upload(batch, file, self.max_bytes)
+                    await run_in_threadpool(self._unpack_zip, batch, archive, file.filename)
+                    os.unlink(archive)
+                else:
+                    self._check_count(batch)
+                    item = BatchItem(index=len(batch.items), filename=file.filename or "")
+                    batch.items.append(item)
+                    try:
+                        item.path = await self._write_upload(batch, file, self.spooler.max_bytes, item)
+                    except UploadTooLargeError as e:
+                        item.error = str(e)
+        except BaseException:
+            batch.cleanup()
+            raise
+        
+        return batch
+    
+    async def stream(
+        self,
+        batch: Batch,
+        project: Optional[Callable[[bytes, str], bytes]] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Analyze a spooled batch, yielding one NDJSON line per item as it completes
+        project(encoded, cache_key) reshapes each encoded AnalysisResponse,
+        e.g. to the response encoder's default projection.
+        """
+        
+        pending = set()
+        items = iter(batch.items)
+        try:
+            while True:
+                for item in items:
+                    pending.add(asyncio.ensure_future(self._analyze(item, project)))
+                    if len(pending) >= self.concurrency:
+                        break
+                if not pending:
+                    break
+                
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            await run_in_threadpool(batch.cleanup)
+    
+    async def _analyze(self, item: BatchItem, project: Optional[Callable[[bytes, str], bytes]] = None) -> bytes:
+        """One item's NDJSON line: its cached or fresh AnalysisResponse, or its error"""
+        
+        if item.error is not None:
+            return self._error_line(item, item.error)
+        
+        try:
+            file_type = self.detect_file_type(item.filename)
+            key = self.cache.make_key(item.sha256, pipeline.PIPELINE_VERSION, file_type)
+            
+            encoded = await run_in_threadpool(self.cache.get, key)
+            cached = encoded is not None
+            if not cached:
+                result = await self._run(pipeline.run_analysis, item.path, file_type)
+                encoded = await run_in_threadpool(serialization.dumps, result)
+                await run_in_threadpool(self.cache.put, key, encoded)
+            if project is not None:
+                encoded = await run_in_threadpool(project, encoded, key)
+        except Exception as e:
+            return self._error_line(item, str(e))
+        finally:
+            if item.path is not None:
+                try:
+                    os.unlink(item.path)
+                except FileNotFoundError:
+                    pass
+        
+        # The response is already JSON; splice it in rather than re-encoding it
+        head = json.dumps({"index": item.index, "filename": item.filename, "success": True, "cached": cached})
+        return b"".join([head[:-1].encode(), b', "result": ', encoded, b"}\n"])
+    
+    async def _run(self, fn, *args):
+        """Submit to the executor, waiting for room instead of failing when it is saturated"""
+        
+        while True:
+            try:
+                return await self.executor.run(fn, *args)
+            except ExecutorSaturatedError:
+                await asyncio.sleep(SATURATED_RETRY_SECONDS)
+    
+    @staticmethod
+    def _error_line(item: BatchItem, error: str) -> bytes:
+        line = {"index": item.index, "filename": item.filename, "success": False, "error": error}
+        return (json.dumps(line) + "\n").encode()
+    
+    def _check_count(self, batch: Batch):
+        if len(batch.items) >= self.max_files:
+            raise BatchTooLargeError(f"Batch exceeds maximum of {self.max_files} files")
+    
+    def _reserve(self, batch: Batch, size: int):
+        batch.total_bytes += size
+        if batch.total_bytes > self.max_bytes:
+            raise BatchTooLargeError(f"Batch exceeds maximum of {self.max_bytes} bytes")
+    
+    async def _write_upload(
+        self,
+        batch: Batch,
+        file: UploadFile,
+        limit: int,
+        item: Optional[BatchItem] = None
+    ) -> str:
+        """Copy an upload into the batch directory, counting it against the batch's bytes"""
+        
+        written = await self.spooler.write_upload(file, batch.directory, limit, lambda size: self._reserve(batch, size))
+        if item is not None:
+            item.sha256 = written.sha256
+        return written.path
+    
+    def _unpack_zip(self, batch: Batch, archive: str, filename: str):
+        """
+        Extract every file of a ZIP into the batch as its own item
+        Members are written under generated names, never their archive paths,
+        and sizes are counted as they are decompressed rather than trusted
+        from the archive's headers.
+        """
+        
+        try:
+            zf = zipfile.ZipFile(archive)
+        except zipfile.BadZipFile as e:
+            self._check_count(batch)
+            batch.items.append(BatchItem(index=len(batch.items), filename=filename, error=f"Invalid ZIP archive: {e}"))
+            return
+        
+        with zf:
+            for info in zf.infolist():
+                name = info.filename
+                base = os.path.basename(name.rstrip("/"))
+                if info.is_dir() or name.startswith("__MACOSX/") or base.startswith("."):
+                    continue
+                
+                self._check_count(batch)
+                item = BatchItem(index=len(batch.items), filename=name)
+                batch.items.append(item)
+                
+                try:
+                    with zf.open(info) as member:
+                        written = self.spooler.write_stream(
+                            member, base, batch.directory, self.spooler.max_bytes, lambda size: self._reserve(batch, size)
+                        )
+                except (
+                    UploadTooLargeError, zipfile.BadZipFile, RuntimeError, NotImplementedError, zlib.error, EOFError, OSError
+                ) as e:
+                    # Oversized, corrupt, truncated or encrypted members fail on their own
+                    item.error = str(e) or type(e).__name__
+                    continue
+                
+                item.path = written.path
+                item.sha256 = written.sha256
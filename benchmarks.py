@@ -0,0 +1,359 @@
+"""
+Benchmarks - Micro-benchmarks for hot paths in the processing pipeline
+Run with: python benchmarks.py [name ...]
+"""
+
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from app.models.schemas import AnalysisResponse
+from app.services import pipeline, serialization
+from app.services.columnar import to_jsonable
+from app.services.financial_analyzer import FinancialAnalyzer
+from app.services.financial_calculator import FinancialCalculator
+from app.services.line_item_extractor import LINE_ITEM_PATTERNS, VALUE_PATTERN, LineItemExtractor
+from app.services.ai_insights import AIInsightGenerator
+from app.services.ratio_engine import RatioEngine
+from app.services.scenario_engine import ScenarioEngine
+from app.services.sensitivity_engine import DEFAULT_ITEMS, SensitivityEngine
+from app.services.simulation_engine import SimulationEngine
+from app.services.statement_store import LINE_ITEM_KEYS, StatementPanel, StatementStore
+
+
+def _annual_report_text(pages: int) -> str:
+    """
+    Synthetic annual report: narrative pages followed by the statements
+    As in real filings the figures come last, and some line items
+    (EBITDA, free cash flow) are never reported.
+    """
+    
+    narrative = (
+        "The company continued to invest in its platform during the period and "
+        "management believes liquidity remains adequate for the coming year. "
+    ) * 30
+    statements = "\n".join([
+        "Total revenue: 1,250,000 1,100,000", "Cost of revenue 610,000 560,000",
+        "Gross profit 640,000 540,000", "Operating expenses 300,000 280,000",
+        "Operating income 340,000 260,000", "Net income 250,000 190,000",
+        "Total assets 2,400,000 2,150,000", "Current assets 900,000 820,000",
+        "Total liabilities 1,100,000 1,000,000", "Current liabilities 450,000 430,000",
+        "Shareholders equity 1,300,000 1,150,000", "Cash and cash equivalents 320,000 250,000",
+        "Inventory 180,000 170,000", "Accounts receivable 210,000 190,000",
+        "Cash from operating activities 290,000 240,000", "Investing activities 120,000 90,000",
+        "Financing activities 60,000 40,000"
+    ])
+    return "\n".join([narrative] * pages + [statements])
+
+
+def _segment_table_text(rows: int) -> str:
+    """Synthetic worst case: dense numeric tables with a labelled figure on every row"""
+    
+    lines = [f"Segment {i} " + " ".join(str(j * 1000 + i) for j in range(12)) for i in range(rows)]
+    return "\n".join(lines + ["Total revenue 1,250,000"])
+
+
+def _legacy_extract(text: str) -> Dict[str, float]:
+    """The previous approach: one re.search over the whole document per line item"""
+    
+    text = text.lower()
+    found = {}
+    for items in LINE_ITEM_PATTERNS.values():
+        for key, label in items.items():
+            match = re.search(f"(?:{label}){VALUE_PATTERN}", text, re.IGNORECASE)
+            if match:
+                try:
+                    found[key] = float(match.group(1).replace(',', ''))
+                except ValueError:
+                    pass
+    return found
+
+
+def bench_line_items(repeat: int = 5):
+    """Single-pass line item extraction against per-pattern scans"""
+    
+    extractor = LineItemExtractor()
+    cases = [(f"report pages={pages}", _annual_report_text(pages)) for pages in (10, 100, 1000)]
+    cases.append(("tables rows=20000", _segment_table_text(20000)))
+    
+    for name, text in cases:
+        legacy = min(timeit.repeat(lambda: _legacy_extract(text), number=1, repeat=repeat))
+        single = min(timeit.repeat(lambda: extractor.extract(text), number=1, repeat=repeat))
+        print(
+            f"line_items {name:<18} chars={len(text):<9,} "
+            f"per-pattern={legacy * 1000:8.2f}ms single-pass={single * 1000:8.2f}ms "
+            f"speedup={legacy / single:5.1f}x"
+        )
+
+
+def _ledger_csv(rows: int) -> str:
+    """Synthetic general ledger export: a few statement lines, then many journal rows"""
+    
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    with os.fdopen(fd, "w") as f:
+        f.write("Account,Amount,Prior,Department,Memo\n")
+        f.write("Total Revenue,1250000,1100000,,\nNet Income,250000,190000,,\n")
+        f.write("Total Assets,2400000,2150000,,\nTotal Equity,1300000,1150000,,\n")
+        for i in range(rows):
+            f.write(f"Journal {i},{i * 1.5:.2f},{i * 1.25:.2f},D{i % 40},Entry {i}\n")
+    return path
+
+
+def _legacy_encode(result: AnalysisResponse) -> bytes:
+    """The previous approach: plain-data conversion, full validation, pydantic JSON"""
+    
+    return AnalysisResponse(
+        success=result.success,
+        financial_data=to_jsonable(result.financial_data),
+        ratios=result.ratios.model_dump(),
+        trends=result.trends.model_dump(),
+        anomalies=[anomaly.model_dump() for anomaly in result.anomalies],
+        ai_insights=[insight.model_dump() for insight in result.ai_insights],
+        visualizations=[chart.model_dump() for chart in result.visualizations]
+    ).model_dump_json().encode()
+
+
+def bench_response_encode(repeat: int = 5):
+    """Per-response encode cost: validated models and pydantic JSON against trusted models and orjson"""
+    
+    for rows in (1_000, 10_000, 100_000):
+        path = _ledger_csv(rows)
+        try:
+            result = pipeline.run_analysis(path, "csv")
+        finally:
+            os.unlink(path)
+        
+        legacy = min(timeit.repeat(lambda: _legacy_encode(result), number=1, repeat=repeat))
+        fast = min(timeit.repeat(lambda: serialization.dumps(result), number=1, repeat=repeat))
+        size = len(serialization.dumps(result))
+        print(
+            f"response_encode rows={rows:<9,} bytes={size:<11,} "
+            f"validated={legacy * 1000:8.2f}ms trusted+orjson={fast * 1000:8.2f}ms "
+            f"speedup={legacy / fast:5.1f}x"
+        )
+
+
+# Cumulative import time allowed for each module a worker loads at start-up, in ms
+IMPORT_BUDGETS_MS: Dict[str, float] = {
+    "app.services.file_processor": 250,
+    "app.services.ocr_engine": 200,
+    "app.services.report_generator": 50,
+    "app.services.pipeline": 600,
+    "main": 1500
+}
+
+
+def _import_times(module: str) -> List[Tuple[int, str, float]]:
+    """(depth, name, cumulative ms) for a fresh `import module`, from python -X importtime"""
+    
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+    )
+    times = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name[1:].rstrip()
+        times.append(((len(name) - len(name.lstrip())) // 2, name.strip(), int(cumulative) / 1000))
+    return times
+
+
+def bench_import_time(repeat: int = 3):
+    """Import-time budget report: what each start-up module costs, and its heaviest imports"""
+    
+    for module, budget in IMPORT_BUDGETS_MS.items():
+        best = None
+        for _ in range(repeat):
+            times = _import_times(module)
+            index = next(i for i, (depth, name, _) in enumerate(times) if depth == 0 and name == module)
+            if best is None or times[index][2] < best[1][index][2]:
+                best = (index, times)
+        
+        # importtime lists a module after everything it imported, so its direct imports
+        # are the depth-1 entries just before it
+        index, times = best
+        total = times[index][2]
+        direct = []
+        for depth, name, ms in reversed(times[:index]):
+            if depth == 0:
+                break
+            if depth == 1:
+                direct.append((name, ms))
+        heaviest = sorted(direct, key=lambda item: -item[1])[:3]
+        print(
+            f"import {module:<30} {total:8.1f}ms budget={budget:6.0f}ms {'ok  ' if total <= budget else 'OVER'} "
+            f"heaviest: {', '.join(f'{name} {ms:.0f}ms' for name, ms in heaviest)}"
+        )
+
+
+def _portfolio(companies: int, seed: int = 0) -> List[StatementStore]:
+    """Synthetic credit book: 1-5 years per company, some gaps and zeros"""
+    
+    rng = np.random.default_rng(seed)
+    stores = []
+    for _ in range(companies):
+        periods = [f"FY{2020 + year}" for year in range(rng.integers(1, 6))]
+        values = rng.normal(1e6, 5e5, (len(LINE_ITEM_KEYS), len(periods)))
+        draw = rng.random(values.shape)
+        values[draw < 0.05] = 0.0
+        values[draw > 0.9] = np.nan
+        stores.append(StatementStore(periods, values))
+    return stores
+
+
+def bench_ratio_matrix(repeat: int = 3):
+    """Portfolio ratios: one calculate_all_ratios call per company against one broadcast pass"""
+    
+    analyzer = FinancialAnalyzer()
+    engine = RatioEngine(analyzer)
+    for companies in (1_000, 10_000, 40_000):
+        stores = _portfolio(companies)
+        panel = StatementPanel.from_stores(stores)
+        
+        scalar = min(timeit.repeat(
+            lambda: [analyzer.calculate_all_ratios({"statements": store}) for store in stores],
+            number=1, repeat=1
+        ))
+        batch = min(timeit.repeat(lambda: engine.calculate(panel), number=1, repeat=repeat))
+        print(
+            f"ratio_matrix companies={companies:<7,} periods={panel.n_periods} "
+            f"scalar={scalar * 1000:9.1f}ms matrix={batch * 1000:7.1f}ms speedup={scalar / batch:6.1f}x"
+        )
+
+
+def bench_scenario(repeat: int = 50):
+    """What-if latency: parsing and analyzing the file again against the scenario engine's partial rerun"""
+    
+    overrides = {
+        "revenue": {"changes": {"revenue": 0.1}},
+        "cash": {"values": {"cash": 150000}},
+        "leverage": {"changes": {"total_liabilities": 0.25, "equity": -0.1}}
+    }
+    for rows in (1_000, 10_000):
+        path = _ledger_csv(rows)
+        try:
+            rerun = min(timeit.repeat(lambda: pipeline.run_analysis(path, "csv"), number=1, repeat=3))
+            extracted = pipeline.parse_document(path, "csv")
+        finally:
+            os.unlink(path)
+        
+        engine = ScenarioEngine()
+        engine.base("bench", extracted)
+        for name, override in overrides.items():
+            scenario = min(timeit.repeat(lambda: engine.run("bench", extracted, **override), number=1, repeat=repeat))
+            print(
+                f"scenario rows={rows:<7,} override={name:<9} rerun={rerun * 1000:8.2f}ms "
+                f"scenario={scenario * 1000:6.3f}ms speedup={rerun / scenario:7.1f}x"
+            )
+
+
+def bench_simulation(repeat: int = 3):
+    """Monte Carlo latency: percentile bands for every ratio and anomaly breach probabilities"""
+    
+    store = next(store for store in _portfolio(50, seed=1) if store.n_periods > 1 and store.latest("revenue"))
+    engine = SimulationEngine()
+    correlations = {"revenue_growth": {"operating_margin": 0.5, "gross_margin": 0.3}}
+    for scenarios in (100_000, 300_000, 1_000_000):
+        elapsed = min(timeit.repeat(
+            lambda: engine.run({"statements": store}, correlations=correlations, scenarios=scenarios),
+            number=1, repeat=repeat
+        ))
+        print(f"simulation scenarios={scenarios:<9,} elapsed={elapsed * 1000:7.1f}ms per_scenario={elapsed / scenarios * 1e6:5.2f}us")
+    
+    # Asking for a handful of targets computes only those and what they need
+    targets = ["liquidity.current_ratio", "profitability.net_margin", "leverage.interest_coverage"]
+    for scenarios in (100_000, 300_000, 1_000_000):
+        elapsed = min(timeit.repeat(
+            lambda: engine.run({"statements": store}, correlations=correlations, scenarios=scenarios, targets=targets),
+            number=1, repeat=repeat
+        ))
+        print(f"simulation targets={len(targets)} scenarios={scenarios:<9,} elapsed={elapsed * 1000:7.1f}ms per_scenario={elapsed / scenarios * 1e6:5.2f}us")
+
+
+def _sensitivity_loop(store: StatementStore, items: List[str], steps: List[float]) -> List[float]:
+    """Every variant the sensitivity engine evaluates, analyzed one store at a time"""
+    
+    analyzer = FinancialAnalyzer()
+    generator = AIInsightGenerator()
+    column = store.n_periods - 1
+    variants = [{}] + [{item: step} for item in items for step in steps]
+    variants += [{items[0]: x, items[1]: y} for y in steps for x in steps]
+    scores = []
+    for changes in variants:
+        variant = store.copy()
+        for item, step in changes.items():
+            variant.set(item, column, store.values[LINE_ITEM_KEYS.index(item), column] * (1 + step))
+        ratios = analyzer.calculate_all_ratios({"statements": variant})
+        scores.append((
+            generator._score_liquidity(ratios.liquidity) + generator._score_leverage(ratios.leverage)
+            + generator._score_profitability(ratios.profitability) + generator._score_efficiency(ratios.efficiency)
+        ) / 4)
+    return scores
+
+
+def bench_sensitivity(repeat: int = 3):
+    """Sensitivity tables: one full analysis per variant against the engine's single broadcast pass"""
+    
+    store = next(
+        store for store in _portfolio(50, seed=2)
+        if store.n_periods > 1 and all(not store.missing[LINE_ITEM_KEYS.index(item), -1] for item in DEFAULT_ITEMS)
+    )
+    engine = SensitivityEngine()
+    for count in (5, 21, 41):
+        steps = np.linspace(-0.2, 0.2, count).tolist()
+        variants = 1 + len(DEFAULT_ITEMS) * count + count * count
+        loop = min(timeit.repeat(lambda: _sensitivity_loop(store, list(DEFAULT_ITEMS), steps), number=1, repeat=1))
+        batch = min(timeit.repeat(lambda: engine.run({"statements": store}, steps=steps), number=1, repeat=repeat))
+        print(
+            f"sensitivity steps={count:<3} variants={variants:<6,} "
+            f"loop={loop * 1000:8.1f}ms engine={batch * 1000:6.2f}ms speedup={loop / batch:6.1f}x"
+        )
+
+
+def bench_metrics_memory(companies: int = 10_000):
+    """Peak memory holding a portfolio's calculator results: expanded dicts, wire form and records"""
+    
+    calculator = FinancialCalculator()
+    documents = [{"statements": store} for store in _portfolio(companies)]
+    runs = {
+        "expanded": lambda: [calculator.calculate_all_ratios(data) for data in documents],
+        "wire": lambda: [calculator.calculate_all_ratios(data, compact=True) for data in documents],
+        "records": lambda: calculator.calculate_many(documents)
+    }
+    peaks = {}
+    for name, run in runs.items():
+        tracemalloc.start()
+        results = run()
+        peaks[name] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        del results
+        print(
+            f"metrics_memory companies={companies:<7,} form={name:<8} peak={peaks[name] / 2**20:6.1f}MB "
+            f"per_company={peaks[name] / companies:7.0f}B reduction={peaks['expanded'] / peaks[name]:5.1f}x"
+        )
+
+
+BENCHMARKS: Dict[str, Callable[[], None]] = {
+    "line_items": bench_line_items,
+    "response_encode": bench_response_encode,
+    "import_time": bench_import_time,
+    "ratio_matrix": bench_ratio_matrix,
+    "scenario": bench_scenario,
+    "simulation": bench_simulation,
+    "sensitivity": bench_sensitivity,
+    "metrics_memory": bench_metrics_memory
+}
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or BENCHMARKS:
+        BENCHMARKS[name]()
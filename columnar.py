@@ -0,0 +1,163 @@
+"""
+Columnar Tables - Compact column-oriented storage for parsed sheets
+Numeric columns are contiguous float64 arrays (NaN for blanks); anything
+else is a single object array. No per-row dicts are ever built.
+"""
+
+import math
+from array import array
+from numbers import Number
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+
+class ColumnarTable:
+    """A parsed table stored as one NumPy array per column"""
+    
+    __slots__ = ("columns", "data", "n_rows")
+    
+    def __init__(self, columns: List[str], data: Dict[str, np.ndarray]):
+        self.columns = columns
+        self.data = data
+        self.n_rows = len(data[columns[0]]) if columns else 0
+    
+    def __len__(self) -> int:
+        return self.n_rows
+    
+    def __repr__(self) -> str:
+        return f"ColumnarTable(columns={self.columns!r}, rows={self.n_rows})"
+    
+    def column(self, name: str) -> np.ndarray:
+        return self.data[name]
+    
+    def is_numeric(self, name: str) -> bool:
+        return self.data[name].dtype.kind == 'f'
+    
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the column arrays"""
+        return sum(col.nbytes for col in self.data.values())
+    
+    def head(self, n: int = 5) -> List[Dict[str, Any]]:
+        """First n rows as records, for previews only"""
+        
+        rows = min(n, self.n_rows)
+        return [
+            {name: _clean(self.data[name][i]) for name in self.columns}
+            for i in range(rows)
+        ]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-safe column-oriented representation (blanks become None)"""
+        
+        data = {}
+        for name in self.columns:
+            col = self.data[name]
+            if col.dtype.kind == 'f':
+                data[name] = [None if math.isnan(v) else v for v in col.tolist()]
+            else:
+                data[name] = [_clean(v) for v in col.tolist()]
+        
+        return {"columns": list(self.columns), "data": data, "rows": self.n_rows}
+    
+    @classmethod
+    def from_rows(cls, header: Sequence[Any], rows: Iterable[Sequence[Any]]) -> "ColumnarTable":
+        """Build a table by streaming rows through a ColumnarBuilder"""
+        
+        builder = ColumnarBuilder(header)
+        for row in rows:
+            builder.append(row)
+        return builder.build()
+
+
+class _ColumnBuffer:
+    """Growable column that stays a packed float buffer until it sees text"""
+    
+    __slots__ = ("numbers", "values")
+    
+    def __init__(self):
+        self.numbers: Optional[array] = array('d')
+        self.values: Optional[List[Any]] = None
+    
+    def append(self, value: Any):
+        if self.numbers is not None:
+            if value is None or value == "":
+                self.numbers.append(math.nan)
+                return
+            if isinstance(value, Number) and not isinstance(value, bool):
+                self.numbers.append(float(value))
+                return
+            # First non-numeric cell: fall back to an object column
+            self.values = [None if math.isnan(v) else v for v in self.numbers]
+            self.numbers = None
+        
+        self.values.append(None if value == "" else value)
+    
+    def finish(self) -> np.ndarray:
+        if self.numbers is not None:
+            return np.frombuffer(self.numbers, dtype=np.float64).copy()
+        column = np.empty(len(self.values), dtype=object)
+        column[:] = self.values
+        return column
+
+
+class ColumnarBuilder:
+    """Accumulates streamed rows directly into per-column buffers"""
+    
+    def __init__(self, header: Sequence[Any]):
+        self.columns = _column_names(header)
+        self._buffers = [_ColumnBuffer() for _ in self.columns]
+    
+    def append(self, row: Sequence[Any]):
+        """Add one row; short rows are padded with blanks, extra cells dropped"""
+        
+        for i, buffer in enumerate(self._buffers):
+            buffer.append(row[i] if i < len(row) else None)
+    
+    def build(self) -> ColumnarTable:
+        data = {name: buffer.finish() for name, buffer in zip(self.columns, self._buffers)}
+        return ColumnarTable(self.columns, data)
+
+
+def _column_names(header: Sequence[Any]) -> List[str]:
+    """Stringify header cells, filling blanks and de-duplicating names"""
+    
+    names: List[str] = []
+    seen: Dict[str, int] = {}
+    for i, cell in enumerate(header):
+        name = str(cell).strip() if cell is not None and str(cell).strip() else f"column_{i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}_{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _clean(value: Any) -> Any:
+    """Convert NumPy scalars and NaN to plain JSON-friendly values"""
+    
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def to_jsonable(obj: Any) -> Any:
+    """Recursively replace parsed tables and NumPy values with plain data"""
+    
+    if isinstance(obj, ColumnarTable):
+        return obj.to_dict()
+    if hasattr(obj, "to_dict") and not isinstance(obj, type):
+        # Other parsed structures (e.g. text tables) provide their own encoding
+        return to_jsonable(obj.to_dict())
+    if isinstance(obj, dict):
+        return {key: to_jsonable(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [to_jsonable(value) for value in obj]
+    if isinstance(obj, np.ndarray):
+        return to_jsonable(obj.tolist())
+    return _clean(obj)
@@ -0,0 +1,202 @@
+"""
+Document Store - TTL-bounded store of parsed documents
+Lets /api/analyze reuse the parse already done by /api/upload
+"""
+
+import os
+import pickle
+import secrets
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from app.services.private_dir import make_private_dir
+
+
+DEFAULT_STORE_DIR = "/tmp/cosmic_documents"
+DEFAULT_TTL_SECONDS = 30 * 60
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MEMORY_MB = 64
+
+# How many writes between sweeps of expired files on disk
+SWEEP_INTERVAL = 64
+
+
+@dataclass
+class ParsedDocument:
+    """A parsed upload plus what is needed to analyze or cache it"""
+    
+    filename: str
+    file_type: str
+    sha256: str
+    extracted_data: Dict[str, Any]
+
+
+class DocumentStore:
+    """
+    Parsed documents keyed by random document IDs, expiring after a TTL
+    An in-memory LRU, bounded by entries and by pickled bytes, sits in front
+    of a private on-disk directory so an ID issued by one uvicorn worker
+    resolves in the others.
+    """
+    
+    def __init__(
+        self,
+        ttl_seconds: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        store_dir: Optional[str] = None,
+        max_memory_bytes: Optional[int] = None
+    ):
+        self.ttl_seconds = ttl_seconds or int(os.getenv("DOCUMENT_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+        self.max_entries = max_entries or int(os.getenv("DOCUMENT_STORE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        self.max_memory_bytes = max_memory_bytes if max_memory_bytes is not None else int(
+            float(os.getenv("DOCUMENT_STORE_MEMORY_MB", DEFAULT_MEMORY_MB)) * 1024 * 1024
+        )
+        
+        if store_dir is None:
+            store_dir = os.getenv("DOCUMENT_STORE_DIR", DEFAULT_STORE_DIR)
+        self.store_dir = store_dir or None
+        if self.store_dir:
+            # Documents are unpickled from here, so it must be ours alone
+            make_private_dir(self.store_dir)
+        
+        self._memory: "OrderedDict[str, Tuple[float, ParsedDocument, int]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._writes_since_sweep = 0
+    
+    def put(self, document: ParsedDocument) -> str:
+        """Store a parsed document and return its new ID"""
+        
+        document_id = secrets.token_hex(16)
+        expires_at = time.time() + self.ttl_seconds
+        # The pickle written to disk doubles as the document's size in the memory budget
+        payload = pickle.dumps(document, protocol=pickle.HIGHEST_PROTOCOL)
+        
+        with self._lock:
+            self._remember(document_id, expires_at, document, len(payload))
+        
+        if self.store_dir:
+            self._write_disk(document_id, payload)
+        
+        return document_id
+    
+    def get(self, document_id: str) -> Optional[ParsedDocument]:
+        """Fetch a document by ID, or None if unknown or expired"""
+        
+        if not self._valid_id(document_id):
+            return None
+        
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(document_id)
+            if entry is not None:
+                expires_at, document, _ = entry
+                if expires_at > now:
+                    self._memory.move_to_end(document_id)
+                    return document
+                self._forget(document_id)
+        
+        if not self.store_dir:
+            return None
+        
+        path = self._disk_path(document_id)
+        try:
+            status = os.stat(path)
+            expires_at = status.st_mtime + self.ttl_seconds
+            if expires_at <= now:
+                os.unlink(path)
+                return None
+            with open(path, 'rb') as f:
+                document = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        
+        with self._lock:
+            self._remember(document_id, expires_at, document, status.st_size)
+        return document
+    
+    def _remember(self, document_id: str, expires_at: float, document: ParsedDocument, size: int):
+        """Insert into the memory tier, evicting the oldest entries past either bound (lock held)"""
+        
+        # Too big to keep in memory; the disk tier still has it. Without one it stays regardless
+        if size > self.max_memory_bytes and self.store_dir:
+            return
+        
+        self._forget(document_id)
+        self._memory[document_id] = (expires_at, document, size)
+        self._memory_bytes += size
+        while len(self._memory) > 1 and (
+            len(self._memory) > self.max_entries or self._memory_bytes > self.max_memory_bytes
+        ):
+            _, (_, _, evicted) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted
+    
+    def _forget(self, document_id: str):
+        """Drop a document from the memory tier if it is there (lock held)"""
+        
+        entry = self._memory.pop(document_id, None)
+        if entry is not None:
+            self._memory_bytes -= entry[2]
+    
+    @staticmethod
+    def _valid_id(document_id: str) -> bool:
+        return len(document_id) == 32 and all(c in "0123456789abcdef" for c in document_id)
+    
+    def _disk_path(self, document_id: str) -> str:
+        return os.path.join(self.store_dir, f"{document_id}.pkl")
+    
+    def _write_disk(self, document_id: str, payload: bytes):
+        fd, tmp_path = tempfile.mkstemp(dir=self.store_dir, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, self._disk_path(document_id))
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+        
+        self._writes_since_sweep += 1
+        if self._writes_since_sweep >= SWEEP_INTERVAL:
+            self._writes_since_sweep = 0
+            self.sweep()
+    
+    def sweep(self) -> int:
+        """Remove expired documents from both tiers; returns files deleted"""
+        
+        now = time.time()
+        with self._lock:
+            for document_id in [k for k, (exp, _, _) in self._memory.items() if exp <= now]:
+                self._forget(document_id)
+        
+        if not self.store_dir:
+            return 0
+        
+        removed = 0
+        for name in os.listdir(self.store_dir):
+            path = os.path.join(self.store_dir, name)
+            try:
+                if os.stat(path).st_mtime + self.ttl_seconds <= now:
+                    os.unlink(path)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+    
+    def stats(self) -> Dict[str, Any]:
+        """Store size and configuration"""
+        with self._lock:
+            return {
+                "entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "memory_bytes": self._memory_bytes,
+                "max_memory_bytes": self.max_memory_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "disk_enabled": bool(self.store_dir)
+            }
@@ -1,13 +1,126 @@
-import pandas as pd
-import PyPDF2
-import pytesseract
-from PIL import Image
-import openpyxl
+import numpy as np
+import atexit
 import csv
 import json
+import math
+import multiprocessing
+import multiprocessing.pool
+import os
 import re
-from typing import Dict, Any, List
+import threading
+import time
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 from pathlib import Path
+from app.services.columnar import ColumnarBuilder, ColumnarTable
+from app.services.lazy_imports import LazyModule, lazy_module, load_all
+from app.services.ocr_engine import OCREngine, OCR_DEPENDENCIES
+from app.services.pipeline_executor import cores_per_parser
+from app.services.line_item_extractor import LineItemExtractor
+from app.services.table_detector import TableDetector, TextTable
+from app.services.label_index import classify_label
+from app.services.progress import ProgressCallback, StageTimer, report
+from app.services.statement_store import LINE_ITEMS, StatementBuilder, chronological_order
+
+# Parser libraries, imported when the first file that needs one arrives
+pd = lazy_module("pandas")
+PyPDF2 = lazy_module("PyPDF2")
+openpyxl = lazy_module("openpyxl")
+
+# Heavy modules behind each format's processor; a node serving only CSV never loads the rest
+FORMAT_DEPENDENCIES: Dict[str, Tuple[LazyModule, ...]] = {
+    'pdf': (PyPDF2,),
+    'xlsx': (openpyxl,),
+    'xls': (openpyxl,),
+    'csv': (pd,),
+    'png': OCR_DEPENDENCIES,
+    'jpg': OCR_DEPENDENCIES,
+    'jpeg': OCR_DEPENDENCIES
+}
+
+# Rows per chunk when streaming CSVs, and rows sampled to infer column types
+CSV_CHUNK_ROWS = 50_000
+CSV_SAMPLE_ROWS = 1_000
+
+
+# Sheet-name words (not substrings, so "bs" does not match "Subsidiaries") per statement
+SHEET_NAME_PATTERNS: Tuple[Tuple[str, re.Pattern], ...] = tuple(
+    (statement, re.compile(r"(?<![a-z])(?:" + words + r")(?![a-z])"))
+    for statement, words in (
+        ("balance_sheet", r"balance|bs|financial position"),
+        ("income_statement", r"income|p&l|p ?and ?l|pnl|profit|operations|earnings"),
+        ("cash_flow", r"cash|cf")
+    )
+)
+# Rows of a sheet with an unrecognized name read to look for statement labels
+SHEET_PROBE_ROWS = 50
+
+# PDFs with at least this many pages are extracted in parallel, in page ranges
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 16))
+PDF_PAGE_WORKERS = int(os.getenv("PDF_PAGE_WORKERS", cores_per_parser()))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", 8))
+
+_page_pool: Optional[multiprocessing.pool.Pool] = None
+_page_pool_lock = threading.Lock()
+
+
+def _get_page_pool() -> multiprocessing.pool.Pool:
+    """Page extraction workers, started once per process and reused"""
+    global _page_pool
+    if _page_pool is None:
+        # In-process analyses run on a thread pool, so two may ask for the pool at once
+        with _page_pool_lock:
+            if _page_pool is None:
+                # A multiprocessing Pool rather than a ProcessPoolExecutor: its workers are
+                # daemonic, so they are terminated cleanly when this runs inside a pipeline
+                # worker that is itself shutting down
+                context = multiprocessing.get_context(os.getenv("PIPELINE_START_METHOD", "spawn"))
+                _page_pool = context.Pool(processes=PDF_PAGE_WORKERS)
+    return _page_pool
+
+
+def close_page_pool():
+    """Stop this process's page extraction workers, if any were started"""
+    global _page_pool
+    with _page_pool_lock:
+        pool, _page_pool = _page_pool, None
+    if pool is not None:
+        pool.terminate()
+        pool.join()
+
+
+atexit.register(close_page_pool)
+
+
+def _cell_number(value: Any) -> Optional[float]:
+    """A sheet cell as a number, accepting numeric text like '1,250,000'"""
+    if isinstance(value, str):
+        try:
+            return float(value.replace(',', ''))
+        except ValueError:
+            return None
+    return value
+
+
+def _is_total(label: str) -> bool:
+    """'Total ...' rows are the authoritative figure for their line item"""
+    return label.strip().lower().startswith("total")
+
+
+def _extract_page_task(task: Tuple[str, int, int]) -> List[Tuple[str, float]]:
+    return _extract_page_range(*task)
+
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> List[Tuple[str, float]]:
+    """Extract text from pages [start, stop) of a PDF, timing each page"""
+    pages = []
+    with open(file_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        for index in range(start, stop):
+            page_start = time.perf_counter()
+            text = reader.pages[index].extract_text()
+            pages.append((text, time.perf_counter() - page_start))
+    return pages
+
 
 class FileProcessor:
     """Handles file upload, parsing, and data extraction"""
@@ -22,6 +135,16 @@ class FileProcessor:
             'jpg': self._process_image_ocr,
             'jpeg': self._process_image_ocr
         }
+        self.ocr_engine = OCREngine()
+        self.line_item_extractor = LineItemExtractor()
+        self.table_detector = TableDetector()
+    
+    def preload(self, file_types: Iterable[str]):
+        """Import the parser libraries for these formats now rather than on first use"""
+        for file_type in file_types:
+            if file_type not in FORMAT_DEPENDENCIES:
+                raise ValueError(f"Unsupported file type: {file_type}")
+            load_all(FORMAT_DEPENDENCIES[file_type])
     
     def detect_file_type(self, filename: str) -> str:
         """Detect file type from extension"""
@@ -30,101 +153,197 @@ class FileProcessor:
             return ext
         raise ValueError(f"Unsupported file type: {ext}")
     
-    def process_file(self, file_path: str, file_type: str) -> Dict[str, Any]:
+    def process_file(
+        self,
+        file_path: str,
+        file_type: str,
+        progress: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
         """Main processing router"""
         processor = self.supported_formats.get(file_type)
         if not processor:
             raise ValueError(f"No processor for file type: {file_type}")
         
-        raw_data = processor(file_path)
+        timer = StageTimer()
+        raw_data = processor(file_path, progress)
+        report(progress, "extracted", file_type=file_type, duration_ms=timer.lap())
+        
         structured_data = self._structure_financial_data(raw_data)
+        report(
+            progress, "structured",
+            periods=structured_data["statements"].periods,
+            line_items=len(structured_data["statements"].latest_values()),
+            duration_ms=timer.lap()
+        )
         return structured_data
     
-    def _process_pdf(self, file_path: str) -> Dict[str, Any]:
+    def _process_pdf(self, file_path: str, progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
         """Extract data from PDF"""
-        text_content = []
-        tables = []
-        
         with open(file_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
-            for page in reader.pages:
-                text = page.extract_text()
-                text_content.append(text)
+            page_count = len(PyPDF2.PdfReader(file).pages)
+        
+        pages, workers = self._extract_pdf_pages(file_path, page_count, progress)
+        text_content = [text for text, _ in pages]
         
         full_text = "\n".join(text_content)
         
-        # Try to extract tabular data using pattern matching
-        tables = self._extract_tables_from_text(full_text)
+        # Detect numeric tables page by page
+        tables = list(self.table_detector.iter_tables(text_content))
         
         return {
             "text": full_text,
             "tables": tables,
-            "page_count": len(text_content)
+            "page_count": len(text_content),
+            "page_timings": [round(seconds, 4) for _, seconds in pages],
+            "extraction_workers": workers
         }
     
-    def _process_excel(self, file_path: str) -> Dict[str, Any]:
-        """Extract data from Excel"""
-        wb = openpyxl.load_workbook(file_path, data_only=True)
-        sheets_data = {}
-        
-        for sheet_name in wb.sheetnames:
-            ws = wb[sheet_name]
-            data = []
-            for row in ws.iter_rows(values_only=True):
-                data.append(list(row))
-            sheets_data[sheet_name] = data
-        
-        # Convert to pandas for easier processing
-        dfs = {}
-        for sheet_name, data in sheets_data.items():
-            if data:
-                df = pd.DataFrame(data[1:], columns=data[0])
-                dfs[sheet_name] = df.to_dict('records')
+    def _extract_pdf_pages(
+        self,
+        file_path: str,
+        page_count: int,
+        progress: Optional[ProgressCallback] = None
+    ) -> Tuple[List[Tuple[str, float]], int]:
+        """Extract every page's text in order, fanning page ranges out to worker processes"""
+        workers = min(PDF_PAGE_WORKERS, page_count)
+        if page_count < PDF_PARALLEL_MIN_PAGES or workers <= 1:
+            pages = _extract_page_range(file_path, 0, page_count)
+            report(progress, "pages_extracted", done=page_count, total=page_count)
+            return pages, 1
+        
+        # Small ranges keep workers evenly loaded when some pages are slow
+        per_task = max(1, min(PDF_PAGES_PER_TASK, math.ceil(page_count / workers)))
+        ranges = [(start, min(start + per_task, page_count)) for start in range(0, page_count, per_task)]
+        
+        pool = _get_page_pool()
+        pages = []
+        # imap hands back ranges in page order as they finish, so progress moves while workers run
+        for chunk in pool.imap(_extract_page_task, [(file_path, start, stop) for start, stop in ranges]):
+            pages.extend(chunk)
+            report(progress, "pages_extracted", done=len(pages), total=page_count)
+        return pages, workers
+    
+    def _process_excel(self, file_path: str, progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """Extract data from Excel, streaming rows straight into columnar tables"""
+        wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        sheets = {}
+        skipped = []
+        
+        try:
+            for sheet_name in wb.sheetnames:
+                rows = wb[sheet_name].iter_rows(values_only=True)
+                header = next((row for row in rows if any(cell is not None for cell in row)), None)
+                if header is None:
+                    continue
+                
+                # A sheet named for no statement ("Sheet1", "Notes") is only read on
+                # when its first rows carry statement labels
+                probe: List[tuple] = []
+                if self._classify_sheet(sheet_name) is None:
+                    for row in rows:
+                        if any(cell is not None for cell in row):
+                            probe.append(row)
+                            if len(probe) >= SHEET_PROBE_ROWS:
+                                break
+                    if not any(self._has_statement_label(row) for row in (header, *probe)):
+                        skipped.append(sheet_name)
+                        continue
+                
+                builder = ColumnarBuilder(header)
+                for row in probe:
+                    builder.append(row)
+                for row in rows:
+                    if any(cell is not None for cell in row):
+                        builder.append(row)
+                sheets[sheet_name] = builder.build()
+                report(progress, "sheet_read", sheet=sheet_name, rows=len(sheets[sheet_name]))
+        finally:
+            wb.close()
         
         return {
-            "sheets": dfs,
-            "sheet_names": list(dfs.keys())
+            "sheets": sheets,
+            "sheet_names": list(sheets.keys()),
+            "skipped_sheets": skipped
         }
     
-    def _process_csv(self, file_path: str) -> Dict[str, Any]:
-        """Extract data from CSV"""
-        df = pd.read_csv(file_path)
+    def _process_csv(self, file_path: str, progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """Extract data from CSV in typed chunks into a columnar table"""
+        numeric_columns = self._sniff_csv_numeric_columns(file_path)
+        
+        try:
+            table = self._read_csv_columnar(file_path, numeric_columns, coerce=False)
+        except ValueError:
+            # Text turned up in a column that looked numeric in the sample
+            table = self._read_csv_columnar(file_path, numeric_columns, coerce=True)
+        
         return {
-            "data": df.to_dict('records'),
-            "columns": list(df.columns),
-            "rows": len(df)
+            "data": table,
+            "columns": list(table.columns),
+            "rows": len(table)
         }
     
-    def _process_image_ocr(self, file_path: str) -> Dict[str, Any]:
-        """Extract text from image using OCR"""
-        image = Image.open(file_path)
-        text = pytesseract.image_to_string(image)
+    def _sniff_csv_numeric_columns(self, file_path: str) -> List[str]:
+        """Columns whose sampled non-blank values all parse as numbers"""
+        sample = pd.read_csv(file_path, nrows=CSV_SAMPLE_ROWS, dtype=str, index_col=False)
         
-        tables = self._extract_tables_from_text(text)
+        numeric = []
+        for col in sample.columns:
+            values = sample[col].dropna()
+            parsed = pd.to_numeric(values.str.replace(',', '', regex=False), errors='coerce')
+            if parsed.notna().all():
+                numeric.append(col)
+        return numeric
+    
+    def _read_csv_columnar(self, file_path: str, numeric_columns: List[str], coerce: bool) -> ColumnarTable:
+        """Stream a CSV chunk by chunk, appending each column to its own array list"""
+        if coerce:
+            reader = pd.read_csv(file_path, chunksize=CSV_CHUNK_ROWS, dtype=str, index_col=False)
+        else:
+            dtypes = {col: np.float64 for col in numeric_columns}
+            reader = pd.read_csv(
+                file_path, chunksize=CSV_CHUNK_ROWS, dtype=dtypes, thousands=',', index_col=False
+            )
         
-        return {
-            "text": text,
-            "tables": tables
+        columns: List[str] = []
+        parts: Dict[str, List[np.ndarray]] = {}
+        
+        for chunk in reader:
+            chunk = chunk.dropna(how='all')
+            if not columns:
+                columns = [str(col) for col in chunk.columns]
+                parts = {col: [] for col in columns}
+            
+            for col, name in zip(chunk.columns, columns):
+                series = chunk[col]
+                if col in numeric_columns:
+                    if coerce:
+                        series = pd.to_numeric(series.str.replace(',', '', regex=False), errors='coerce')
+                    parts[name].append(series.to_numpy(dtype=np.float64))
+                else:
+                    parts[name].append(series.astype(object).where(series.notna(), None).to_numpy())
+        
+        data = {
+            name: np.concatenate(arrays) if arrays else np.empty(0, dtype=np.float64)
+            for name, arrays in parts.items()
         }
+        return ColumnarTable(columns, data)
     
-    def _extract_tables_from_text(self, text: str) -> List[Dict]:
-        """Extract tabular data from text using pattern matching"""
-        # Basic table detection - looks for aligned numeric data
-        tables = []
-        lines = text.split('\n')
-        
-        current_table = []
-        for line in lines:
-            # Check if line contains multiple numbers (likely a data row)
-            numbers = re.findall(r'-?\d+(?:\.\d+)?', line)
-            if len(numbers) >= 2:
-                current_table.append(line)
-            elif current_table:
-                if len(current_table) >= 2:
-                    tables.append({"rows": current_table})
-                current_table = []
-        
-        return tables
+    def _process_image_ocr(self, file_path: str, progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """Extract text from image using preprocessed, banded and cached OCR"""
+        timer = StageTimer()
+        result = self.ocr_engine.image_to_text(file_path)
+        report(progress, "ocr_done", bands=result.bands, cached=result.cached, duration_ms=timer.lap())
+        
+        tables = self.table_detector.detect(result.text)
+        
+        return {
+            "text": result.text,
+            "tables": tables,
+            "ocr_bands": result.bands,
+            "ocr_cached": result.cached,
+            "skew_angle": result.skew_angle,
+            "scale": result.scale
+        }
     
     def _structure_financial_data(self, raw_data: Dict[str, Any]) -> Dict[str, Any]:
         """Convert raw extracted data into structured financial format"""
@@ -138,109 +357,84 @@ class FileProcessor:
             "metadata": {}
         }
         
-        # Attempt to identify financial statement sections
+        # Every source feeds one multi-period statement store
+        builder = StatementBuilder()
+        
         if "text" in raw_data:
-            text = raw_data["text"].lower()
-            
-            # Extract key financial figures using pattern matching
-            structured["balance_sheet"] = self._extract_balance_sheet(text)
-            structured["income_statement"] = self._extract_income_statement(text)
-            structured["cash_flow"] = self._extract_cash_flow(text)
+            # Extract key financial figures in a single pass over the text
+            for statement_items in self.line_item_extractor.extract(raw_data["text"]).values():
+                for key, value in statement_items.items():
+                    builder.add_undated(key, value)
+        
+        for table in raw_data.get("tables", []):
+            self._add_text_table(builder, table)
         
         if "sheets" in raw_data:
-            # Excel file - try to map sheets to statements
-            for sheet_name, data in raw_data["sheets"].items():
-                sheet_lower = sheet_name.lower()
-                if "balance" in sheet_lower or "bs" in sheet_lower:
-                    structured["balance_sheet"] = data
-                elif "income" in sheet_lower or "p&l" in sheet_lower or "pnl" in sheet_lower:
-                    structured["income_statement"] = data
-                elif "cash" in sheet_lower or "cf" in sheet_lower:
-                    structured["cash_flow"] = data
+            # Excel file - rows of every statement sheet, one column per period
+            for data in raw_data["sheets"].values():
+                self._add_columnar_table(builder, data)
         
         if "data" in raw_data:
             # CSV file
             structured["data_table"] = raw_data["data"]
+            self._add_columnar_table(builder, raw_data["data"])
+        
+        statements = builder.build()
+        structured["statements"] = statements
+        for name in LINE_ITEMS:
+            structured[name] = statements.statement(name)
         
         # Add preview
         structured["preview"] = {
             "has_balance_sheet": bool(structured["balance_sheet"]),
             "has_income_statement": bool(structured["income_statement"]),
-            "has_cash_flow": bool(structured["cash_flow"])
+            "has_cash_flow": bool(structured["cash_flow"]),
+            "periods": statements.periods
         }
         
         return structured
     
-    def _extract_balance_sheet(self, text: str) -> Dict[str, float]:
-        """Extract balance sheet items from text"""
-        bs = {}
-        
-        # Common balance sheet patterns
-        patterns = {
-            "total_assets": r"total\s+assets?\s*:?\s*(\d+[\d,\.]*)",
-            "current_assets": r"current\s+assets?\s*:?\s*(\d+[\d,\.]*)",
-            "total_liabilities": r"total\s+liabilities?\s*:?\s*(\d+[\d,\.]*)",
-            "current_liabilities": r"current\s+liabilities?\s*:?\s*(\d+[\d,\.]*)",
-            "equity": r"(?:shareholders?|stockholders?)\s+equity\s*:?\s*(\d+[\d,\.]*)",
-            "cash": r"cash\s+(?:and\s+)?(?:cash\s+)?equivalents?\s*:?\s*(\d+[\d,\.]*)",
-            "inventory": r"inventor(?:y|ies)\s*:?\s*(\d+[\d,\.]*)",
-            "receivables": r"(?:accounts?\s+)?receivables?\s*:?\s*(\d+[\d,\.]*)"
-        }
+    def _add_text_table(self, builder: StatementBuilder, table: TextTable):
+        """Add recognized rows of a text table to the statement builder"""
         
-        for key, pattern in patterns.items():
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                value_str = match.group(1).replace(',', '')
-                try:
-                    bs[key] = float(value_str)
-                except ValueError:
-                    pass
-        
-        return bs
-    
-    def _extract_income_statement(self, text: str) -> Dict[str, float]:
-        """Extract income statement items from text"""
-        is_data = {}
-        
-        patterns = {
-            "revenue": r"(?:total\s+)?(?:revenue|sales)\s*:?\s*(\d+[\d,\.]*)",
-            "gross_profit": r"gross\s+profit\s*:?\s*(\d+[\d,\.]*)",
-            "operating_income": r"operating\s+income\s*:?\s*(\d+[\d,\.]*)",
-            "net_income": r"net\s+(?:income|profit)\s*:?\s*(\d+[\d,\.]*)",
-            "ebitda": r"ebitda\s*:?\s*(\d+[\d,\.]*)",
-            "cogs": r"(?:cost\s+of\s+)?(?:goods\s+sold|revenue)\s*:?\s*(\d+[\d,\.]*)",
-            "operating_expenses": r"operating\s+expenses?\s*:?\s*(\d+[\d,\.]*)"
-        }
+        order = chronological_order(table.periods)
+        periods = [table.periods[i] for i in order]
+        values = table.values[:, order]
         
-        for key, pattern in patterns.items():
-            match = re.search(pattern, text, re.IGNORECASE)
+        for label, row in zip(table.labels, values):
+            match = classify_label(label)
             if match:
-                value_str = match.group(1).replace(',', '')
-                try:
-                    is_data[key] = float(value_str)
-                except ValueError:
-                    pass
-        
-        return is_data
-    
-    def _extract_cash_flow(self, text: str) -> Dict[str, float]:
-        """Extract cash flow items from text"""
-        cf = {}
-        
-        patterns = {
-            "operating_cash_flow": r"(?:cash\s+from\s+)?operating\s+activities\s*:?\s*(\d+[\d,\.]*)",
-            "investing_cash_flow": r"(?:cash\s+from\s+)?investing\s+activities\s*:?\s*(\d+[\d,\.]*)",
-            "financing_cash_flow": r"(?:cash\s+from\s+)?financing\s+activities\s*:?\s*(\d+[\d,\.]*)",
-            "free_cash_flow": r"free\s+cash\s+flow\s*:?\s*(\d+[\d,\.]*)"
-        }
+                builder.add_series(match[1], periods, row.tolist(), _is_total(label))
+    
+    def _add_columnar_table(self, builder: StatementBuilder, table: ColumnarTable):
+        """Add a sheet laid out as a label column plus one column per period"""
         
-        for key, pattern in patterns.items():
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                value_str = match.group(1).replace(',', '')
-                try:
-                    cf[key] = float(value_str)
-                except ValueError:
-                    pass
+        labels = next((name for name in table.columns if not table.is_numeric(name)), None)
+        if labels is None:
+            return
+        
+        # Label lookups are memoized, so even long trial balances are scanned in full
+        periods = [name for name in table.columns if name != labels]
+        periods = [periods[i] for i in chronological_order(periods)]
+        columns = {name: table.column(name).tolist() for name in periods}
         
-        return cf
+        for i, label in enumerate(table.column(labels).tolist()):
+            if not isinstance(label, str):
+                continue
+            match = classify_label(label)
+            if match:
+                values = [_cell_number(columns[name][i]) for name in periods]
+                builder.add_series(match[1], periods, values, _is_total(label))
+    
+    @staticmethod
+    def _classify_sheet(sheet_name: str) -> Optional[str]:
+        """Statement a sheet maps to, judged from the words of its name"""
+        sheet_lower = sheet_name.lower()
+        for statement, pattern in SHEET_NAME_PATTERNS:
+            if pattern.search(sheet_lower):
+                return statement
+        return None
+    
+    @staticmethod
+    def _has_statement_label(row: tuple) -> bool:
+        return any(isinstance(cell, str) and classify_label(cell) for cell in row)
@@ -1,218 +1,209 @@
-from typing import Dict, List, Any
+from typing import Callable, Dict, List, Any, Iterable, NamedTuple, Optional, Tuple
 from app.models.schemas import FinancialRatios, TrendAnalysis, Anomaly, ChartData
+from app.services.statement_store import StatementStore, Statements
+from app.services.ratio_registry import Fill, Growth, Item, Ratio, RatioRegistry, ratio, same
+import operator
 import numpy as np
 
-class FinancialAnalyzer:
-    """Comprehensive financial analysis and ratio calculations"""
+
+def _per_day(expenses: np.ndarray) -> np.ndarray:
+    return np.where(expenses != 0, expenses / 365, 1)
+
+
+# Every ratio, in reporting order; line items default to 0, or to 1 where they divide
+RATIOS = RatioRegistry([
+    # Liquidity ratios - ability to meet short-term obligations
+    ratio("current_ratio", Item("current_assets", 0), Item("current_liabilities", 1), "liquidity"),
+    Ratio("quick_assets", np.subtract, (Item("current_assets", 0), Item("inventory", 0))),
+    ratio("quick_ratio", "quick_assets", Item("current_liabilities", 1), "liquidity"),
+    ratio("cash_ratio", Item("cash", 0), Item("current_liabilities", 1), "liquidity"),
+    Ratio("working_capital", np.subtract, (Item("current_assets", 0), Item("current_liabilities", 1)), "liquidity"),
+    Ratio("daily_operating_expenses", _per_day, (Item("operating_expenses", 0),)),
+    ratio("defensive_interval_days", "quick_assets", "daily_operating_expenses", "liquidity"),
     
-    def __init__(self):
-        # Industry benchmarks (can be expanded)
-        self.benchmarks = {
-            "current_ratio": {"healthy": (1.5, 3.0), "average": 2.0},
-            "quick_ratio": {"healthy": (1.0, 2.0), "average": 1.5},
-            "debt_to_equity": {"healthy": (0.0, 1.5), "average": 0.75},
-            "roe": {"healthy": (0.15, 0.25), "average": 0.20},
-            "roa": {"healthy": (0.05, 0.15), "average": 0.10},
-            "profit_margin": {"healthy": (0.10, 0.20), "average": 0.15},
-            "asset_turnover": {"healthy": (1.0, 3.0), "average": 2.0}
-        }
+    # Leverage ratios - capital structure and solvency
+    ratio("debt_to_equity", Item("total_liabilities", 0), Item("equity", 1), "leverage"),
+    ratio("debt_ratio", Item("total_liabilities", 0), Item("total_assets", 1), "leverage"),
+    ratio("equity_multiplier", Item("total_assets", 1), Item("equity", 1), "leverage"),
+    ratio("interest_coverage", Item("operating_income", 0), Item("interest_expense", 1), "leverage"),
+    ratio("dscr", Item("ebitda", 0), Item("interest_expense", 1), "leverage"),
+    ratio("equity_ratio", Item("equity", 1), Item("total_assets", 1), "leverage"),
     
-    def calculate_all_ratios(self, data: Dict[str, Any]) -> FinancialRatios:
-        """Calculate comprehensive financial ratios"""
-        
-        bs = data.get("balance_sheet", {})
-        is_data = data.get("income_statement", {})
-        cf = data.get("cash_flow", {})
-        
-        return FinancialRatios(
-            liquidity=self._calculate_liquidity_ratios(bs),
-            leverage=self._calculate_leverage_ratios(bs, is_data),
-            profitability=self._calculate_profitability_ratios(bs, is_data),
-            efficiency=self._calculate_efficiency_ratios(bs, is_data),
-            valuation=self._calculate_valuation_ratios(is_data),
-            growth=self._calculate_growth_ratios(is_data)
-        )
+    # Profitability ratios - ability to generate earnings
+    ratio("gross_margin", Item("gross_profit", 0), Item("revenue", 1), "profitability"),
+    ratio("operating_margin", Item("operating_income", 0), Item("revenue", 1), "profitability"),
+    ratio("net_margin", Item("net_income", 0), Item("revenue", 1), "profitability"),
+    ratio("roa", Item("net_income", 0), Item("total_assets", 1), "profitability"),
+    ratio("roe", Item("net_income", 0), Item("equity", 1), "profitability"),
+    ratio("ebitda_margin", Item("ebitda", 0), Item("revenue", 1), "profitability"),
+    Ratio("invested_capital", np.add, (Item("equity", 1), Item("total_liabilities", 0))),
+    ratio("roic", Item("net_income", 0), "invested_capital", "profitability"),
+    # DuPont analysis components
+    Ratio("dupont_profit_margin", same, ("net_margin",), "profitability"),
+    Ratio("dupont_asset_turnover", same, ("asset_turnover",), "profitability"),
+    Ratio("dupont_equity_multiplier", same, ("equity_multiplier",), "profitability"),
     
-    def _calculate_liquidity_ratios(self, bs: Dict) -> Dict[str, float]:
-        """Liquidity ratios - ability to meet short-term obligations"""
-        ratios = {}
-        
-        current_assets = bs.get("current_assets", 0)
-        current_liabilities = bs.get("current_liabilities", 1)
-        cash = bs.get("cash", 0)
-        inventory = bs.get("inventory", 0)
-        receivables = bs.get("receivables", 0)
-        
-        # Current Ratio
-        ratios["current_ratio"] = current_assets / current_liabilities if current_liabilities else 0
-        
-        # Quick Ratio (Acid Test)
-        quick_assets = current_assets - inventory
-        ratios["quick_ratio"] = quick_assets / current_liabilities if current_liabilities else 0
-        
-        # Cash Ratio
-        ratios["cash_ratio"] = cash / current_liabilities if current_liabilities else 0
-        
-        # Working Capital
-        ratios["working_capital"] = current_assets - current_liabilities
-        
-        # Defensive Interval Ratio
-        daily_operating_expenses = (bs.get("operating_expenses", 0) / 365) if bs.get("operating_expenses") else 1
-        ratios["defensive_interval_days"] = quick_assets / daily_operating_expenses if daily_operating_expenses else 0
-        
-        return ratios
+    # Efficiency ratios - asset utilization
+    ratio("asset_turnover", Item("revenue", 1), Item("total_assets", 1), "efficiency"),
+    ratio("inventory_turnover", Item("cogs", 0), Item("inventory", 1), "efficiency"),
+    ratio("days_inventory", 365, "inventory_turnover", "efficiency"),
+    ratio("receivables_turnover", Item("revenue", 1), Item("receivables", 1), "efficiency"),
+    ratio("days_sales_outstanding", 365, "receivables_turnover", "efficiency"),
+    ratio("payables_turnover", Item("cogs", 0), Item("payables", 1), "efficiency"),
+    ratio("days_payables_outstanding", 365, "payables_turnover", "efficiency"),
+    Ratio(
+        "cash_conversion_cycle", lambda inventory, sales, payables: inventory + sales - payables,
+        ("days_inventory", "days_sales_outstanding", "days_payables_outstanding"), "efficiency"
+    ),
+    Ratio("operating_working_capital", np.subtract, (Item("current_assets", 1), Item("current_liabilities", 0))),
+    ratio("working_capital_turnover", Item("revenue", 1), "operating_working_capital", "efficiency"),
     
-    def _calculate_leverage_ratios(self, bs: Dict, is_data: Dict) -> Dict[str, float]:
-        """Leverage ratios - capital structure and solvency"""
-        ratios = {}
-        
-        total_assets = bs.get("total_assets", 1)
-        total_liabilities = bs.get("total_liabilities", 0)
-        equity = bs.get("equity", 1)
-        operating_income = is_data.get("operating_income", 0)
-        ebitda = is_data.get("ebitda", 0)
-        interest_expense = is_data.get("interest_expense", 1)
-        
-        # Debt-to-Equity Ratio
-        ratios["debt_to_equity"] = total_liabilities / equity if equity else 0
-        
-        # Debt Ratio
-        ratios["debt_ratio"] = total_liabilities / total_assets if total_assets else 0
-        
-        # Equity Multiplier
-        ratios["equity_multiplier"] = total_assets / equity if equity else 0
-        
-        # Interest Coverage Ratio
-        ratios["interest_coverage"] = operating_income / interest_expense if interest_expense else 0
-        
-        # Debt Service Coverage Ratio (DSCR)
-        ratios["dscr"] = ebitda / interest_expense if interest_expense else 0
-        
-        # Equity Ratio
-        ratios["equity_ratio"] = equity / total_assets if total_assets else 0
-        
-        return ratios
+    # Valuation ratios - placeholders until market price and share count data is available
+    Ratio("pe_ratio", same, (Fill(0.0),), "valuation"),
+    Ratio("pb_ratio", same, (Fill(0.0),), "valuation"),
+    Ratio("ps_ratio", same, (Fill(0.0),), "valuation"),
+    Ratio("eps", same, (Fill(0.0),), "valuation"),
     
-    def _calculate_profitability_ratios(self, bs: Dict, is_data: Dict) -> Dict[str, float]:
-        """Profitability ratios - ability to generate earnings"""
-        ratios = {}
-        
-        revenue = is_data.get("revenue", 1)
-        gross_profit = is_data.get("gross_profit", 0)
-        operating_income = is_data.get("operating_income", 0)
-        net_income = is_data.get("net_income", 0)
-        total_assets = bs.get("total_assets", 1)
-        equity = bs.get("equity", 1)
-        ebitda = is_data.get("ebitda", 0)
-        
-        # Gross Profit Margin
-        ratios["gross_margin"] = (gross_profit / revenue) if revenue else 0
-        
-        # Operating Profit Margin
-        ratios["operating_margin"] = (operating_income / revenue) if revenue else 0
-        
-        # Net Profit Margin
-        ratios["net_margin"] = (net_income / revenue) if revenue else 0
-        
-        # Return on Assets (ROA)
-        ratios["roa"] = (net_income / total_assets) if total_assets else 0
-        
-        # Return on Equity (ROE)
-        ratios["roe"] = (net_income / equity) if equity else 0
-        
-        # EBITDA Margin
-        ratios["ebitda_margin"] = (ebitda / revenue) if revenue else 0
-        
-        # Return on Invested Capital (ROIC)
-        invested_capital = equity + bs.get("total_liabilities", 0)
-        ratios["roic"] = (net_income / invested_capital) if invested_capital else 0
-        
-        # DuPont Analysis components
-        ratios["dupont_profit_margin"] = ratios["net_margin"]
-        ratios["dupont_asset_turnover"] = revenue / total_assets if total_assets else 0
-        ratios["dupont_equity_multiplier"] = total_assets / equity if equity else 0
-        
-        return ratios
+    # Growth metrics - period over period, or default assumptions with a single period
+    Ratio("revenue_growth", same, (Growth("revenue", 0.15),), "growth"),
+    Ratio("earnings_growth", same, (Growth("net_income", 0.12),), "growth"),
+    Ratio("asset_growth", same, (Growth("total_assets", 0.10),), "growth")
+])
+
+class AnomalyCheck(NamedTuple):
+    """A red flag raised when compare(ratio, threshold) holds; the ratio is reported times `scale`"""
+    field: str
+    metric: str
+    compare: Callable[[Any, float], Any]
+    threshold: float
+    expected_range: str
+    severity: str
+    explanation: str
+    scale: float = 1.0
     
-    def _calculate_efficiency_ratios(self, bs: Dict, is_data: Dict) -> Dict[str, float]:
-        """Efficiency ratios - asset utilization"""
-        ratios = {}
-        
-        revenue = is_data.get("revenue", 1)
-        cogs = is_data.get("cogs", 0)
-        total_assets = bs.get("total_assets", 1)
-        current_assets = bs.get("current_assets", 1)
-        inventory = bs.get("inventory", 1)
-        receivables = bs.get("receivables", 1)
-        payables = bs.get("payables", 1)
-        
-        # Asset Turnover
-        ratios["asset_turnover"] = revenue / total_assets if total_assets else 0
-        
-        # Inventory Turnover
-        ratios["inventory_turnover"] = cogs / inventory if inventory else 0
-        ratios["days_inventory"] = 365 / ratios["inventory_turnover"] if ratios["inventory_turnover"] else 0
-        
-        # Receivables Turnover
-        ratios["receivables_turnover"] = revenue / receivables if receivables else 0
-        ratios["days_sales_outstanding"] = 365 / ratios["receivables_turnover"] if ratios["receivables_turnover"] else 0
-        
-        # Payables Turnover
-        ratios["payables_turnover"] = cogs / payables if payables else 0
-        ratios["days_payables_outstanding"] = 365 / ratios["payables_turnover"] if ratios["payables_turnover"] else 0
-        
-        # Cash Conversion Cycle
-        ratios["cash_conversion_cycle"] = (ratios["days_inventory"] + 
-                                          ratios["days_sales_outstanding"] - 
-                                          ratios["days_payables_outstanding"])
-        
-        # Working Capital Turnover
-        working_capital = current_assets - bs.get("current_liabilities", 0)
-        ratios["working_capital_turnover"] = revenue / working_capital if working_capital else 0
-        
-        return ratios
+    @property
+    def condition(self) -> str:
+        return f"{self.field} {'<' if self.compare is operator.lt else '>'} {self.threshold:g}"
+
+
+# The red flags find_anomalies() checks in the latest period
+ANOMALY_CHECKS = (
+    AnomalyCheck(
+        "liquidity.current_ratio", "Current Ratio", operator.lt, 1.0, "1.5 - 3.0", "High",
+        "Current assets may not cover short-term liabilities"
+    ),
+    AnomalyCheck(
+        "leverage.debt_to_equity", "Debt-to-Equity", operator.gt, 2.0, "0.5 - 1.5", "Medium",
+        "High leverage may indicate financial risk"
+    ),
+    AnomalyCheck(
+        "profitability.net_margin", "Net Margin", operator.lt, 0.0, "10% - 20%", "High",
+        "Negative margins indicate operational losses", scale=100.0
+    )
+)
+
+ANOMALY_RATIOS = tuple(check.field for check in ANOMALY_CHECKS)
+
+# The line items detect_trends() reads
+TREND_ITEMS = ("revenue", "net_income", "operating_cash_flow")
+
+# Charts in display order, with the ratios ("category.name") and line items each one plots
+CHART_INPUTS: Dict[str, Tuple[str, ...]] = {
+    "Liquidity Health": ("liquidity.current_ratio", "liquidity.quick_ratio", "liquidity.cash_ratio"),
+    "Profit Margins": (
+        "profitability.gross_margin", "profitability.operating_margin",
+        "profitability.net_margin", "profitability.ebitda_margin"
+    ),
+    "Leverage Risk": ("leverage.debt_to_equity",),
+    "DuPont ROE Analysis": (
+        "profitability.dupont_profit_margin", "profitability.dupont_asset_turnover",
+        "profitability.dupont_equity_multiplier", "profitability.roe"
+    ),
+    "Performance Over Time": ("revenue", "gross_profit", "operating_income", "net_income")
+}
+
+# Industry benchmarks (can be expanded); built once per process and shared read-only
+BENCHMARKS: Dict[str, Dict[str, Any]] = {
+    "current_ratio": {"healthy": (1.5, 3.0), "average": 2.0},
+    "quick_ratio": {"healthy": (1.0, 2.0), "average": 1.5},
+    "debt_to_equity": {"healthy": (0.0, 1.5), "average": 0.75},
+    "roe": {"healthy": (0.15, 0.25), "average": 0.20},
+    "roa": {"healthy": (0.05, 0.15), "average": 0.10},
+    "profit_margin": {"healthy": (0.10, 0.20), "average": 0.15},
+    "asset_turnover": {"healthy": (1.0, 3.0), "average": 2.0}
+}
+
+
+class FinancialAnalyzer:
+    """Comprehensive financial analysis and ratio calculations"""
     
-    def _calculate_valuation_ratios(self, is_data: Dict) -> Dict[str, float]:
-        """Valuation ratios (when market data available)"""
-        ratios = {}
-        
-        # These would require market price data
-        # Placeholder for when that data is available
-        ratios["pe_ratio"] = 0  # Price / EPS
-        ratios["pb_ratio"] = 0  # Price / Book Value
-        ratios["ps_ratio"] = 0  # Price / Sales
-        
-        # Earnings per share (needs share count)
-        ratios["eps"] = 0
-        
-        return ratios
+    def __init__(self):
+        self.benchmarks = BENCHMARKS
     
-    def _calculate_growth_ratios(self, is_data: Dict) -> Dict[str, float]:
-        """Growth metrics (requires historical data)"""
-        ratios = {}
+    def calculate_all_ratios(self, data: Dict[str, Any], fields: Optional[str] = None) -> FinancialRatios:
+        """
+        Calculate comprehensive financial ratios for every reported period
+        Each ratio is one array operation over the period axis; the latest
+        period fills the ratio dicts and the full series goes in `history`.
+        With fields (e.g. "liquidity,profitability.roe") only those are computed.
+        """
+        
+        store = self.statement_store(data)
+        return self.ratios_from_arrays(store, self.ratio_arrays(store, fields))
+    
+    @staticmethod
+    def ratios_from_arrays(store: StatementStore, categories: Dict[str, Dict[str, np.ndarray]]) -> FinancialRatios:
+        """FinancialRatios from ratio_arrays() output: latest values plus history"""
         
-        # Placeholder - would calculate from multi-period data
-        ratios["revenue_growth"] = 0.15  # Default 15% assumption
-        ratios["earnings_growth"] = 0.12  # Default 12% assumption
-        ratios["asset_growth"] = 0.10    # Default 10% assumption
+        latest = {
+            name: {key: float(values[-1]) for key, values in ratios.items()}
+            for name, ratios in categories.items()
+        }
+        history = {
+            name: {key: [None if np.isnan(v) else v for v in values.tolist()] for key, values in ratios.items()}
+            for name, ratios in categories.items()
+        } if store.n_periods > 1 else None
         
-        return ratios
+        return FinancialRatios.model_construct(**latest, periods=list(store.periods), history=history)
+    
+    def ratio_arrays(self, store: Statements, fields: Optional[str] = None) -> Dict[str, Dict[str, np.ndarray]]:
+        """
+        Selected ratios by category, as arrays shaped like the store's series
+        The formulas are element-wise, so a StatementPanel of many companies
+        gives the same figures for each as its own StatementStore would.
+        """
+        return RATIOS.evaluate(store, fields)
+    
+    @staticmethod
+    def statement_store(data: Dict[str, Any]) -> StatementStore:
+        """The parsed multi-period statements, or a one-period store built from the statement dicts"""
+        
+        store = data.get("statements")
+        if not isinstance(store, StatementStore):
+            store = StatementStore.from_statements(data)
+        if not store.n_periods:
+            store = StatementStore(["current"])
+        return store
     
     def detect_trends(self, data: Dict[str, Any]) -> TrendAnalysis:
         """Detect financial trends from historical data"""
         
-        # Simplified trend detection - would be more sophisticated with time-series data
-        is_data = data.get("income_statement", {})
-        cf = data.get("cash_flow", {})
+        store = self.statement_store(data)
         
-        revenue = is_data.get("revenue", 0)
-        net_income = is_data.get("net_income", 0)
-        ocf = cf.get("operating_cash_flow", 0)
+        revenue = float(store.series("revenue", 0)[-1])
+        net_income = float(store.series("net_income", 0)[-1])
+        ocf = float(store.series("operating_cash_flow", 0)[-1])
         
         observations = []
+        revenue_growth = self._latest_growth(store, "revenue")
         
         if revenue > 0:
             observations.append(f"Current revenue: ${revenue:,.0f}")
+        if revenue_growth is not None:
+            observations.append(
+                f"Revenue {'grew' if revenue_growth >= 0 else 'fell'} {abs(revenue_growth):.1%} "
+                f"from {store.periods[-2]} to {store.periods[-1]}"
+            )
         if net_income > 0:
             observations.append("Profitable operations")
         elif net_income < 0:
@@ -221,62 +212,84 @@ class FinancialAnalyzer:
         if ocf > net_income:
             observations.append("Strong cash generation relative to earnings")
         
-        return TrendAnalysis(
-            revenue_trend="Growing" if revenue > 0 else "Unknown",
-            profit_trend="Positive" if net_income > 0 else "Negative",
-            cash_flow_trend="Positive" if ocf > 0 else "Negative",
+        if revenue_growth is not None:
+            revenue_trend = "Growing" if revenue_growth > 0 else "Declining" if revenue_growth < 0 else "Stable"
+        else:
+            revenue_trend = "Growing" if revenue > 0 else "Unknown"
+        
+        return TrendAnalysis.model_construct(
+            revenue_trend=revenue_trend,
+            profit_trend=self._direction(store, "net_income", "Positive" if net_income > 0 else "Negative"),
+            cash_flow_trend=self._direction(store, "operating_cash_flow", "Positive" if ocf > 0 else "Negative"),
             key_observations=observations
         )
     
+    @staticmethod
+    def _latest_growth(store: StatementStore, key: str) -> Optional[float]:
+        """Growth into the latest period, or None without two comparable periods"""
+        
+        if store.n_periods < 2:
+            return None
+        growth = store.growth(key)[-1]
+        return None if np.isnan(growth) else float(growth)
+    
+    def _direction(self, store: StatementStore, key: str, level: str) -> str:
+        """'Positive' / 'Negative' level, qualified by its change when there is history"""
+        
+        growth = self._latest_growth(store, key)
+        if growth is None or growth == 0:
+            return level
+        return f"{level}, {'improving' if growth > 0 else 'weakening'}"
+    
     def find_anomalies(self, data: Dict[str, Any]) -> List[Anomaly]:
-        """Identify unusual metrics or red flags"""
+        """Identify unusual metrics or red flags in the latest period"""
         anomalies = []
         
-        bs = data.get("balance_sheet", {})
-        is_data = data.get("income_statement", {})
-        
-        current_ratio = bs.get("current_assets", 0) / bs.get("current_liabilities", 1)
-        
-        # Check current ratio
-        if current_ratio < 1.0:
-            anomalies.append(Anomaly(
-                metric="Current Ratio",
-                value=round(current_ratio, 2),
-                expected_range="1.5 - 3.0",
-                severity="High",
-                explanation="Current assets may not cover short-term liabilities"
-            ))
-        
-        # Check debt levels
-        debt_to_equity = bs.get("total_liabilities", 0) / bs.get("equity", 1)
-        if debt_to_equity > 2.0:
-            anomalies.append(Anomaly(
-                metric="Debt-to-Equity",
-                value=round(debt_to_equity, 2),
-                expected_range="0.5 - 1.5",
-                severity="Medium",
-                explanation="High leverage may indicate financial risk"
-            ))
-        
-        # Check profitability
-        net_margin = is_data.get("net_income", 0) / is_data.get("revenue", 1)
-        if net_margin < 0:
-            anomalies.append(Anomaly(
-                metric="Net Margin",
-                value=round(net_margin * 100, 2),
-                expected_range="10% - 20%",
-                severity="High",
-                explanation="Negative margins indicate operational losses"
-            ))
+        store = self.statement_store(data)
+        ratios = RATIOS.evaluate(store, ANOMALY_RATIOS)
+        
+        for check in ANOMALY_CHECKS:
+            category, _, name = check.field.partition(".")
+            value = float(ratios[category][name][-1])
+            if check.compare(value, check.threshold):
+                anomalies.append(Anomaly.model_construct(
+                    metric=check.metric,
+                    value=round(value * check.scale, 2),
+                    expected_range=check.expected_range,
+                    severity=check.severity,
+                    explanation=check.explanation
+                ))
         
         return anomalies
     
-    def generate_chart_data(self, data: Dict[str, Any], ratios: FinancialRatios) -> List[ChartData]:
-        """Generate data structures for visualizations"""
-        charts = []
+    def generate_chart_data(
+        self,
+        data: Dict[str, Any],
+        ratios: FinancialRatios,
+        titles: Optional[Iterable[str]] = None
+    ) -> List[ChartData]:
+        """Generate data structures for visualizations, or just the charts titled"""
+        
+        builders = {
+            "Liquidity Health": self._liquidity_chart,
+            "Profit Margins": self._margins_chart,
+            "Leverage Risk": self._leverage_chart,
+            "DuPont ROE Analysis": self._dupont_chart,
+            "Performance Over Time": self._performance_chart
+        }
+        wanted = CHART_INPUTS if titles is None else set(titles)
         
-        # Liquidity radar chart
-        charts.append(ChartData(
+        charts = []
+        for title in CHART_INPUTS:
+            if title in wanted:
+                chart = builders[title](data, ratios)
+                if chart is not None:
+                    charts.append(chart)
+        return charts
+    
+    def _liquidity_chart(self, data: Dict[str, Any], ratios: FinancialRatios) -> ChartData:
+        """Liquidity radar chart"""
+        return ChartData.model_construct(
             chart_type="radar",
             title="Liquidity Health",
             data={
@@ -289,10 +302,11 @@ class FinancialAnalyzer:
                 "benchmarks": [2.0, 1.5, 0.5]
             },
             explanation="Measures ability to meet short-term obligations"
-        ))
-        
-        # Profitability margins
-        charts.append(ChartData(
+        )
+    
+    def _margins_chart(self, data: Dict[str, Any], ratios: FinancialRatios) -> ChartData:
+        """Profitability margins"""
+        return ChartData.model_construct(
             chart_type="bar",
             title="Profit Margins",
             data={
@@ -305,10 +319,11 @@ class FinancialAnalyzer:
                 ]
             },
             explanation="Profitability at different operational levels"
-        ))
-        
-        # Leverage gauge
-        charts.append(ChartData(
+        )
+    
+    def _leverage_chart(self, data: Dict[str, Any], ratios: FinancialRatios) -> ChartData:
+        """Leverage gauge"""
+        return ChartData.model_construct(
             chart_type="gauge",
             title="Leverage Risk",
             data={
@@ -321,10 +336,11 @@ class FinancialAnalyzer:
                 ]
             },
             explanation="Debt-to-equity ratio indicates financial leverage"
-        ))
-        
-        # DuPont ROE breakdown
-        charts.append(ChartData(
+        )
+    
+    def _dupont_chart(self, data: Dict[str, Any], ratios: FinancialRatios) -> ChartData:
+        """DuPont ROE breakdown"""
+        return ChartData.model_construct(
             chart_type="waterfall",
             title="DuPont ROE Analysis",
             data={
@@ -337,6 +353,24 @@ class FinancialAnalyzer:
                 "roe": ratios.profitability.get("roe", 0)
             },
             explanation="ROE decomposition showing drivers of return on equity"
-        ))
-        
-        return charts
+        )
+    
+    def _performance_chart(self, data: Dict[str, Any], ratios: FinancialRatios) -> Optional[ChartData]:
+        """Multi-period performance, when more than one period was reported"""
+        
+        if not ratios.periods or len(ratios.periods) < 2:
+            return None
+        line_items = self.statement_store(data).to_dict()["line_items"]
+        return ChartData.model_construct(
+            chart_type="line",
+            title="Performance Over Time",
+            data={
+                "periods": ratios.periods,
+                "series": {
+                    key: line_items[key]
+                    for key in CHART_INPUTS["Performance Over Time"]
+                    if key in line_items
+                }
+            },
+            explanation="Reported revenue and profit in each period"
+        )
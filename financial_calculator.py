@@ -4,52 +4,210 @@ Covers all major financial analysis categories:
 - Liquidity, Leverage, Profitability, Activity, Valuation, Efficiency, Growth
 """
 
+import operator
 import numpy as np
-from typing import Dict, List, Any, Optional
-from dataclasses import dataclass
+from typing import Dict, List, Any, NamedTuple, Optional, Sequence, Tuple, Union
 from datetime import datetime
 
+from app.services.label_index import canonical_key
+from app.services.ratio_registry import Item, Ratio, RatioRegistry
+from app.services.statement_store import LINE_ITEM_KEYS, StatementBuilder, StatementStore
 
-@dataclass
-class FinancialMetrics:
-    """Container for all calculated financial metrics"""
-    
+
+# Industry benchmark data, built once per process and shared read-only
+INDUSTRY_BENCHMARKS: Dict[str, Dict[str, float]] = {
+    "manufacturing": {
+        "current_ratio": 1.5,
+        "quick_ratio": 0.9,
+        "debt_to_equity": 0.8,
+        "net_profit_margin": 8.0,
+        "return_on_equity": 12.0
+    },
+    "retail": {
+        "current_ratio": 1.2,
+        "quick_ratio": 0.4,
+        "debt_to_equity": 1.2,
+        "net_profit_margin": 5.0,
+        "return_on_equity": 15.0
+    },
+    "technology": {
+        "current_ratio": 2.5,
+        "quick_ratio": 2.0,
+        "debt_to_equity": 0.3,
+        "net_profit_margin": 20.0,
+        "return_on_equity": 25.0
+    }
+}
+
+
+def _divide(numerator: float, denominator: float) -> float:
+    return numerator / denominator
+
+
+def _percent(numerator: float, denominator: float) -> float:
+    return numerator / denominator * 100
+
+
+def _days(turnover: float) -> float:
+    return 365 / turnover
+
+
+# Each metric is computed only when its inputs were reported (or inferred) and, for
+# nonzero metrics, are not zero; metrics left out stay None
+METRICS = RatioRegistry([
     # Liquidity Ratios
-    current_ratio: Optional[float] = None
-    quick_ratio: Optional[float] = None
-    cash_ratio: Optional[float] = None
-    working_capital: Optional[float] = None
+    Ratio("current_ratio", _divide, (Item("current_assets"), Item("current_liabilities")), "liquidity", nonzero=True),
+    Ratio("working_capital", operator.sub, (Item("current_assets"), Item("current_liabilities")), "liquidity", nonzero=True),
+    Ratio(
+        "quick_ratio", lambda assets, inventory, liabilities: None if liabilities == 0 else (assets - inventory) / liabilities,
+        (Item("current_assets"), Item("inventory"), Item("current_liabilities")), "liquidity"
+    ),
+    Ratio("cash_ratio", _divide, (Item("cash"), Item("current_liabilities")), "liquidity", nonzero=True),
     
-    # Leverage/Solvency Ratios
-    debt_to_equity: Optional[float] = None
-    debt_to_assets: Optional[float] = None
-    equity_multiplier: Optional[float] = None
-    interest_coverage: Optional[float] = None
+    # Leverage Ratios
+    Ratio("debt_to_equity", _divide, (Item("total_debt"), Item("total_equity")), "leverage", nonzero=True),
+    Ratio("debt_to_assets", _divide, (Item("total_debt"), Item("total_assets")), "leverage", nonzero=True),
+    Ratio("equity_multiplier", _divide, (Item("total_assets"), Item("total_equity")), "leverage", nonzero=True),
+    Ratio("interest_coverage", _divide, (Item("ebit"), Item("interest_expense")), "leverage", nonzero=True),
     
     # Profitability Ratios
-    gross_profit_margin: Optional[float] = None
-    operating_margin: Optional[float] = None
-    net_profit_margin: Optional[float] = None
-    return_on_assets: Optional[float] = None
-    return_on_equity: Optional[float] = None
-    return_on_investment: Optional[float] = None
+    Ratio("gross_profit_margin", _percent, (Item("gross_profit"), Item("revenue")), "profitability", nonzero=True),
+    Ratio("operating_margin", _percent, (Item("operating_income"), Item("revenue")), "profitability", nonzero=True),
+    Ratio("net_profit_margin", _percent, (Item("net_income"), Item("revenue")), "profitability", nonzero=True),
+    Ratio("return_on_assets", _percent, (Item("net_income"), Item("total_assets")), "profitability", nonzero=True),
+    Ratio("return_on_equity", _percent, (Item("net_income"), Item("total_equity")), "profitability", nonzero=True),
     
-    # Activity/Efficiency Ratios
-    asset_turnover: Optional[float] = None
-    inventory_turnover: Optional[float] = None
-    receivables_turnover: Optional[float] = None
-    days_sales_outstanding: Optional[float] = None
-    days_inventory_outstanding: Optional[float] = None
+    # Activity Ratios
+    Ratio("asset_turnover", _divide, (Item("revenue"), Item("total_assets")), "activity", nonzero=True),
+    Ratio("inventory_turnover", _divide, (Item("cogs"), Item("inventory")), "activity", nonzero=True),
+    Ratio("days_inventory_outstanding", _days, ("inventory_turnover",), "activity", nonzero=True),
+    Ratio("receivables_turnover", _divide, (Item("revenue"), Item("receivables")), "activity", nonzero=True),
+    Ratio("days_sales_outstanding", _days, ("receivables_turnover",), "activity", nonzero=True),
     
+    # Additional Metrics
+    Ratio(
+        "ebitda", lambda income, depreciation, amortization: income + depreciation + amortization,
+        (Item("operating_income"), Item("depreciation"), Item("amortization")), "additional"
+    )
+], items=(*LINE_ITEM_KEYS, "total_equity", "ebit"))
+
+
+# Every metric a FinancialMetrics record holds, in array order
+METRIC_FIELDS: Tuple[str, ...] = (
+    # Liquidity Ratios
+    "current_ratio", "quick_ratio", "cash_ratio", "working_capital",
+    # Leverage/Solvency Ratios
+    "debt_to_equity", "debt_to_assets", "equity_multiplier", "interest_coverage",
+    # Profitability Ratios
+    "gross_profit_margin", "operating_margin", "net_profit_margin",
+    "return_on_assets", "return_on_equity", "return_on_investment",
+    # Activity/Efficiency Ratios
+    "asset_turnover", "inventory_turnover", "receivables_turnover",
+    "days_sales_outstanding", "days_inventory_outstanding",
     # Growth Metrics
-    revenue_growth: Optional[float] = None
-    profit_growth: Optional[float] = None
-    asset_growth: Optional[float] = None
-    
+    "revenue_growth", "profit_growth", "asset_growth",
     # Additional Metrics
-    ebitda: Optional[float] = None
-    free_cash_flow: Optional[float] = None
-    book_value_per_share: Optional[float] = None
+    "ebitda", "free_cash_flow", "book_value_per_share"
+)
+METRIC_INDEX: Dict[str, int] = {name: i for i, name in enumerate(METRIC_FIELDS)}
+
+
+class MetricInfo(NamedTuple):
+    """Static description of a reported metric; metrics without a benchmark get no interpretation"""
+    group: str
+    description: str
+    benchmark: Optional[float] = None
+    higher_better: bool = True
+
+
+# Metrics reported in expanded results, in report order. Shared by every result
+# rather than copied into each; bump the version whenever this or METRIC_FIELDS changes
+METRIC_METADATA_VERSION = "1"
+METRIC_INFO: Dict[str, MetricInfo] = {
+    "current_ratio": MetricInfo("liquidity_ratios", "Ability to pay short-term obligations", 2.0),
+    "quick_ratio": MetricInfo("liquidity_ratios", "Liquidity without relying on inventory", 1.0),
+    "cash_ratio": MetricInfo("liquidity_ratios", "Most conservative liquidity measure", 0.5),
+    "working_capital": MetricInfo("liquidity_ratios", "Operating liquidity buffer"),
+    "debt_to_equity": MetricInfo("leverage_ratios", "Financial leverage and risk", 1.0, higher_better=False),
+    "debt_to_assets": MetricInfo("leverage_ratios", "Proportion of assets financed by debt", 0.5, higher_better=False),
+    "interest_coverage": MetricInfo("leverage_ratios", "Ability to service debt", 3.0),
+    "gross_profit_margin": MetricInfo("profitability_ratios", "Profitability after direct costs", 40.0),
+    "operating_margin": MetricInfo("profitability_ratios", "Operating efficiency", 15.0),
+    "net_profit_margin": MetricInfo("profitability_ratios", "Bottom-line profitability", 10.0),
+    "return_on_assets": MetricInfo("profitability_ratios", "Asset utilization efficiency", 5.0),
+    "return_on_equity": MetricInfo("profitability_ratios", "Shareholder return generation", 15.0),
+    "asset_turnover": MetricInfo("activity_ratios", "Revenue generation per asset dollar", 1.0),
+    "inventory_turnover": MetricInfo("activity_ratios", "Inventory management efficiency", 6.0),
+    "days_sales_outstanding": MetricInfo("activity_ratios", "Average collection period", 45.0, higher_better=False)
+}
+
+
+class FinancialMetrics:
+    """
+    Container for all calculated financial metrics
+    One float array in METRIC_FIELDS order, NaN where a metric is missing;
+    metrics are read and set as attributes, None when missing. The array
+    may be a row of a larger one, so a batch of records shares one allocation.
+    """
+    
+    __slots__ = ("values",)
+    
+    def __init__(self, values: Optional[np.ndarray] = None, **metrics: Optional[float]):
+        object.__setattr__(self, "values", np.full(len(METRIC_FIELDS), np.nan) if values is None else values)
+        for name, value in metrics.items():
+            if name not in METRIC_INDEX:
+                raise TypeError(f"Unknown metric: {name}")
+            setattr(self, name, value)
+    
+    def __getattr__(self, name: str) -> Optional[float]:
+        index = METRIC_INDEX.get(name)
+        if index is None:
+            raise AttributeError(f"{type(self).__name__} has no metric {name!r}")
+        value = self.values[index]
+        return None if value != value else float(value)
+    
+    def __setattr__(self, name: str, value: Optional[float]):
+        if name not in METRIC_INDEX:
+            object.__setattr__(self, name, value)
+        else:
+            self.values[METRIC_INDEX[name]] = np.nan if value is None else value
+    
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, FinancialMetrics) and np.array_equal(self.values, other.values, equal_nan=True)
+    
+    def __repr__(self) -> str:
+        return f"FinancialMetrics({', '.join(f'{name}={value!r}' for name, value in self.to_dict().items() if value is not None)})"
+    
+    def to_dict(self) -> Dict[str, Optional[float]]:
+        """Every metric by name, None where missing"""
+        return {name: None if value != value else value for name, value in zip(METRIC_FIELDS, self.values.tolist())}
+    
+    def to_wire(self) -> Dict[str, Any]:
+        """Compact JSON form: values in METRIC_FIELDS order and the metadata version they follow"""
+        return {
+            "metadata_version": METRIC_METADATA_VERSION,
+            "values": [None if value != value else value for value in self.values.tolist()]
+        }
+    
+    @classmethod
+    def from_wire(cls, payload: Dict[str, Any]) -> "FinancialMetrics":
+        """A record from to_wire() output; raises ValueError for another metadata version"""
+        
+        if payload.get("metadata_version") != METRIC_METADATA_VERSION:
+            raise ValueError(f"Unsupported metric metadata version: {payload.get('metadata_version')}")
+        values = np.array([np.nan if value is None else value for value in payload["values"]], dtype=float)
+        if len(values) != len(METRIC_FIELDS):
+            raise ValueError(f"Expected {len(METRIC_FIELDS)} metric values, got {len(values)}")
+        return cls(values)
+
+
+def metric_metadata() -> Dict[str, Any]:
+    """The table compact results index, for clients that expand them themselves"""
+    return {
+        "metadata_version": METRIC_METADATA_VERSION,
+        "fields": list(METRIC_FIELDS),
+        "metrics": {name: info._asdict() for name, info in METRIC_INFO.items()}
+    }
 
 
 class FinancialCalculator:
@@ -61,122 +219,47 @@ class FinancialCalculator:
     def __init__(self):
         self.industry_benchmarks = self._load_industry_benchmarks()
     
-    def calculate_all_ratios(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    def calculate_all_ratios(
+        self,
+        data: Dict[str, Any],
+        fields: Optional[str] = None,
+        compact: bool = False
+    ) -> Dict[str, Any]:
         """
         Calculate all financial ratios from extracted data
-        Returns comprehensive metrics dictionary
+        Returns comprehensive metrics dictionary; with fields (e.g.
+        "liquidity,profitability.return_on_equity") only those are computed.
+        compact returns FinancialMetrics.to_wire() instead, which
+        expand_metrics turns into the full dictionary when needed.
         """
         
-        metrics = FinancialMetrics()
-        
         # Extract key financial statement items
         financials = self._extract_financials(data)
+        metrics = self._calculate(financials, fields)
+        
+        if compact:
+            return metrics.to_wire()
+        return self.expand_metrics(metrics, financials)
+    
+    def calculate_metrics(self, data: Dict[str, Any], fields: Optional[str] = None) -> FinancialMetrics:
+        """The metrics of one document as a compact record"""
+        return self._calculate(self._extract_financials(data), fields)
+    
+    def calculate_many(self, documents: Sequence[Dict[str, Any]], fields: Optional[str] = None) -> List[FinancialMetrics]:
+        """Records for many documents, backed by rows of one documents x metrics array"""
         
-        # Liquidity Ratios
-        if financials.get('current_assets') and financials.get('current_liabilities'):
-            metrics.current_ratio = self._safe_divide(
-                financials['current_assets'],
-                financials['current_liabilities']
-            )
-            metrics.working_capital = financials['current_assets'] - financials['current_liabilities']
-        
-        if all(k in financials for k in ['current_assets', 'inventory', 'current_liabilities']):
-            quick_assets = financials['current_assets'] - financials['inventory']
-            metrics.quick_ratio = self._safe_divide(quick_assets, financials['current_liabilities'])
-        
-        if financials.get('cash') and financials.get('current_liabilities'):
-            metrics.cash_ratio = self._safe_divide(
-                financials['cash'],
-                financials['current_liabilities']
-            )
-        
-        # Leverage Ratios
-        if financials.get('total_debt') and financials.get('total_equity'):
-            metrics.debt_to_equity = self._safe_divide(
-                financials['total_debt'],
-                financials['total_equity']
-            )
-        
-        if financials.get('total_debt') and financials.get('total_assets'):
-            metrics.debt_to_assets = self._safe_divide(
-                financials['total_debt'],
-                financials['total_assets']
-            )
-        
-        if financials.get('total_assets') and financials.get('total_equity'):
-            metrics.equity_multiplier = self._safe_divide(
-                financials['total_assets'],
-                financials['total_equity']
-            )
-        
-        if financials.get('ebit') and financials.get('interest_expense'):
-            metrics.interest_coverage = self._safe_divide(
-                financials['ebit'],
-                financials['interest_expense']
-            )
-        
-        # Profitability Ratios
-        if financials.get('gross_profit') and financials.get('revenue'):
-            metrics.gross_profit_margin = self._safe_divide(
-                financials['gross_profit'],
-                financials['revenue']
-            ) * 100
-        
-        if financials.get('operating_income') and financials.get('revenue'):
-            metrics.operating_margin = self._safe_divide(
-                financials['operating_income'],
-                financials['revenue']
-            ) * 100
-        
-        if financials.get('net_income') and financials.get('revenue'):
-            metrics.net_profit_margin = self._safe_divide(
-                financials['net_income'],
-                financials['revenue']
-            ) * 100
-        
-        if financials.get('net_income') and financials.get('total_assets'):
-            metrics.return_on_assets = self._safe_divide(
-                financials['net_income'],
-                financials['total_assets']
-            ) * 100
-        
-        if financials.get('net_income') and financials.get('total_equity'):
-            metrics.return_on_equity = self._safe_divide(
-                financials['net_income'],
-                financials['total_equity']
-            ) * 100
-        
-        # Activity Ratios
-        if financials.get('revenue') and financials.get('total_assets'):
-            metrics.asset_turnover = self._safe_divide(
-                financials['revenue'],
-                financials['total_assets']
-            )
-        
-        if financials.get('cogs') and financials.get('inventory'):
-            metrics.inventory_turnover = self._safe_divide(
-                financials['cogs'],
-                financials['inventory']
-            )
-            metrics.days_inventory_outstanding = self._safe_divide(365, metrics.inventory_turnover)
-        
-        if financials.get('revenue') and financials.get('receivables'):
-            metrics.receivables_turnover = self._safe_divide(
-                financials['revenue'],
-                financials['receivables']
-            )
-            metrics.days_sales_outstanding = self._safe_divide(365, metrics.receivables_turnover)
-        
-        # Additional Metrics
-        if all(k in financials for k in ['operating_income', 'depreciation', 'amortization']):
-            metrics.ebitda = (
-                financials['operating_income'] +
-                financials.get('depreciation', 0) +
-                financials.get('amortization', 0)
-            )
-        
-        # Convert to dictionary
-        return self._metrics_to_dict(metrics, financials)
+        values = np.full((len(documents), len(METRIC_FIELDS)), np.nan)
+        return [self._calculate(self._extract_financials(data), fields, values[i]) for i, data in enumerate(documents)]
+    
+    def _calculate(self, financials: Dict[str, float], fields: Optional[str], out: Optional[np.ndarray] = None) -> FinancialMetrics:
+        """Evaluate the metrics into out (a fresh array by default), which must start out all NaN"""
+        
+        metrics = FinancialMetrics(out)
+        for ratios in METRICS.evaluate(financials, fields).values():
+            for name, value in ratios.items():
+                if value is not None:
+                    metrics.values[METRIC_INDEX[name]] = value
+        return metrics
     
     def _extract_financials(self, data: Dict[str, Any]) -> Dict[str, float]:
         """
@@ -185,34 +268,68 @@ class FinancialCalculator:
         """
         
         financials = {}
+        builder = StatementBuilder()
         
         # Check different data structures
         if 'metrics' in data:
-            financials.update(self._process_metrics(data['metrics']))
+            financials.update(self._process_metrics(data['metrics'], builder))
         
         if 'aggregated_metrics' in data:
-            financials.update(self._process_metrics(data['aggregated_metrics']))
+            financials.update(self._process_metrics(data['aggregated_metrics'], builder))
         
         if 'sheets' in data:
             for sheet_data in data['sheets'].values():
-                financials.update(self._process_metrics(sheet_data))
+                if isinstance(sheet_data, dict):
+                    financials.update(self._process_metrics(sheet_data, builder))
+        
+        # Line items come from the statement store, latest period first
+        financials.update(self.statement_store(data, builder).latest_values())
+        if 'equity' in financials:
+            financials['total_equity'] = financials['equity']
         
         # Apply intelligent defaults and calculations
         financials = self._infer_missing_values(financials)
         
         return financials
     
-    def _process_metrics(self, metrics: Dict[str, Any]) -> Dict[str, float]:
-        """Process metrics dictionary into financial items"""
+    def statement_store(self, data: Dict[str, Any], builder: Optional[StatementBuilder] = None) -> StatementStore:
+        """Multi-period statements: the parsed store if present, else one built from metrics"""
+        
+        store = data.get('statements')
+        if isinstance(store, StatementStore):
+            return store
+        
+        if builder is None:
+            builder = StatementBuilder()
+            for source in ('metrics', 'aggregated_metrics'):
+                if isinstance(data.get(source), dict):
+                    self._process_metrics(data[source], builder)
+            for sheet_data in data.get('sheets', {}).values():
+                if isinstance(sheet_data, dict):
+                    self._process_metrics(sheet_data, builder)
+        return builder.build()
+    
+    def _process_metrics(self, metrics: Dict[str, Any], builder: StatementBuilder) -> Dict[str, float]:
+        """
+        Process metrics dictionary into financial items
+        Line items keep every period in the builder (lists run oldest to
+        newest); other metrics are returned at their most recent value.
+        """
         
         processed = {}
         
         for key, value in metrics.items():
+            item = canonical_key(key) if isinstance(key, str) else None
             if isinstance(value, list) and value:
-                # Use most recent value (last in list)
-                processed[key] = float(value[-1])
+                if item is not None:
+                    builder.add_series(item, [f"period_{i + 1}" for i in range(len(value))], value)
+                elif isinstance(value[-1], (int, float)):
+                    processed[key] = float(value[-1])
             elif isinstance(value, (int, float)):
-                processed[key] = float(value)
+                if item is not None:
+                    builder.add_undated(item, value)
+                else:
+                    processed[key] = float(value)
         
         return processed
     
@@ -249,109 +366,37 @@ class FinancialCalculator:
             return None
         return numerator / denominator
     
-    def _metrics_to_dict(self, metrics: FinancialMetrics, raw_data: Dict) -> Dict[str, Any]:
-        """Convert metrics object to comprehensive dictionary"""
+    def expand_metrics(
+        self,
+        metrics: Union[FinancialMetrics, Dict[str, Any]],
+        raw_data: Optional[Dict[str, float]] = None
+    ) -> Dict[str, Any]:
+        """
+        Convert metrics to the comprehensive dictionary
+        Accepts a record or its to_wire() form; benchmarks, descriptions and
+        interpretations come from METRIC_INFO.
+        """
         
-        return {
-            "liquidity_ratios": {
-                "current_ratio": {
-                    "value": metrics.current_ratio,
-                    "benchmark": 2.0,
-                    "interpretation": self._interpret_ratio(metrics.current_ratio, 2.0, higher_better=True),
-                    "description": "Ability to pay short-term obligations"
-                },
-                "quick_ratio": {
-                    "value": metrics.quick_ratio,
-                    "benchmark": 1.0,
-                    "interpretation": self._interpret_ratio(metrics.quick_ratio, 1.0, higher_better=True),
-                    "description": "Liquidity without relying on inventory"
-                },
-                "cash_ratio": {
-                    "value": metrics.cash_ratio,
-                    "benchmark": 0.5,
-                    "interpretation": self._interpret_ratio(metrics.cash_ratio, 0.5, higher_better=True),
-                    "description": "Most conservative liquidity measure"
-                },
-                "working_capital": {
-                    "value": metrics.working_capital,
-                    "description": "Operating liquidity buffer"
-                }
-            },
-            "leverage_ratios": {
-                "debt_to_equity": {
-                    "value": metrics.debt_to_equity,
-                    "benchmark": 1.0,
-                    "interpretation": self._interpret_ratio(metrics.debt_to_equity, 1.0, higher_better=False),
-                    "description": "Financial leverage and risk"
-                },
-                "debt_to_assets": {
-                    "value": metrics.debt_to_assets,
-                    "benchmark": 0.5,
-                    "interpretation": self._interpret_ratio(metrics.debt_to_assets, 0.5, higher_better=False),
-                    "description": "Proportion of assets financed by debt"
-                },
-                "interest_coverage": {
-                    "value": metrics.interest_coverage,
-                    "benchmark": 3.0,
-                    "interpretation": self._interpret_ratio(metrics.interest_coverage, 3.0, higher_better=True),
-                    "description": "Ability to service debt"
-                }
-            },
-            "profitability_ratios": {
-                "gross_profit_margin": {
-                    "value": metrics.gross_profit_margin,
-                    "benchmark": 40.0,
-                    "interpretation": self._interpret_ratio(metrics.gross_profit_margin, 40.0, higher_better=True),
-                    "description": "Profitability after direct costs"
-                },
-                "operating_margin": {
-                    "value": metrics.operating_margin,
-                    "benchmark": 15.0,
-                    "interpretation": self._interpret_ratio(metrics.operating_margin, 15.0, higher_better=True),
-                    "description": "Operating efficiency"
-                },
-                "net_profit_margin": {
-                    "value": metrics.net_profit_margin,
-                    "benchmark": 10.0,
-                    "interpretation": self._interpret_ratio(metrics.net_profit_margin, 10.0, higher_better=True),
-                    "description": "Bottom-line profitability"
-                },
-                "return_on_assets": {
-                    "value": metrics.return_on_assets,
-                    "benchmark": 5.0,
-                    "interpretation": self._interpret_ratio(metrics.return_on_assets, 5.0, higher_better=True),
-                    "description": "Asset utilization efficiency"
-                },
-                "return_on_equity": {
-                    "value": metrics.return_on_equity,
-                    "benchmark": 15.0,
-                    "interpretation": self._interpret_ratio(metrics.return_on_equity, 15.0, higher_better=True),
-                    "description": "Shareholder return generation"
-                }
-            },
-            "activity_ratios": {
-                "asset_turnover": {
-                    "value": metrics.asset_turnover,
-                    "benchmark": 1.0,
-                    "interpretation": self._interpret_ratio(metrics.asset_turnover, 1.0, higher_better=True),
-                    "description": "Revenue generation per asset dollar"
-                },
-                "inventory_turnover": {
-                    "value": metrics.inventory_turnover,
-                    "benchmark": 6.0,
-                    "interpretation": self._interpret_ratio(metrics.inventory_turnover, 6.0, higher_better=True),
-                    "description": "Inventory management efficiency"
-                },
-                "days_sales_outstanding": {
-                    "value": metrics.days_sales_outstanding,
-                    "benchmark": 45.0,
-                    "interpretation": self._interpret_ratio(metrics.days_sales_outstanding, 45.0, higher_better=False),
-                    "description": "Average collection period"
+        if not isinstance(metrics, FinancialMetrics):
+            metrics = FinancialMetrics.from_wire(metrics)
+        
+        result: Dict[str, Any] = {}
+        for name, info in METRIC_INFO.items():
+            value = getattr(metrics, name)
+            if info.benchmark is None:
+                entry = {"value": value, "description": info.description}
+            else:
+                entry = {
+                    "value": value,
+                    "benchmark": info.benchmark,
+                    "interpretation": self._interpret_ratio(value, info.benchmark, higher_better=info.higher_better),
+                    "description": info.description
                 }
-            },
-            "raw_financials": raw_data,
-            "timestamp": datetime.utcnow().isoformat()
-        }
+            result.setdefault(info.group, {})[name] = entry
+        
+        result["raw_financials"] = raw_data if raw_data is not None else {}
+        result["timestamp"] = datetime.utcnow().isoformat()
+        return result
     
     def _interpret_ratio(self, value: Optional[float], benchmark: float, higher_better: bool = True) -> str:
         """Generate interpretation for a ratio"""
@@ -378,13 +423,20 @@ class FinancialCalculator:
             else:
                 return "Concerning - above benchmark"
     
-    def detect_anomalies(self, metrics: Dict[str, Any]) -> List[Dict[str, str]]:
-        """Detect unusual patterns or concerning metrics"""
+    def detect_anomalies(self, metrics: Union[FinancialMetrics, Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Detect unusual patterns or concerning metrics, in a record or either dictionary form"""
         
         anomalies = []
+        if isinstance(metrics, dict) and "metadata_version" in metrics:
+            metrics = FinancialMetrics.from_wire(metrics)
+        
+        def value(name: str) -> Optional[float]:
+            if isinstance(metrics, FinancialMetrics):
+                return getattr(metrics, name)
+            return metrics[METRIC_INFO[name].group][name]['value']
         
         # Check liquidity
-        current_ratio = metrics['liquidity_ratios']['current_ratio']['value']
+        current_ratio = value('current_ratio')
         if current_ratio and current_ratio < 1.0:
             anomalies.append({
                 "category": "Liquidity Risk",
@@ -395,7 +447,7 @@ class FinancialCalculator:
             })
         
         # Check profitability
-        net_margin = metrics['profitability_ratios']['net_profit_margin']['value']
+        net_margin = value('net_profit_margin')
         if net_margin and net_margin < 0:
             anomalies.append({
                 "category": "Profitability Risk",
@@ -406,7 +458,7 @@ class FinancialCalculator:
             })
         
         # Check leverage
-        debt_to_equity = metrics['leverage_ratios']['debt_to_equity']['value']
+        debt_to_equity = value('debt_to_equity')
         if debt_to_equity and debt_to_equity > 2.0:
             anomalies.append({
                 "category": "Leverage Risk",
@@ -428,7 +480,21 @@ class FinancialCalculator:
         }
         
         # Check for time-series data
-        if 'periods' in data and data['periods']:
+        store = self.statement_store(data)
+        if store.n_periods > 1:
+            trends['available'] = True
+            trends['periods'] = store.n_periods
+            line_items = store.to_dict()['line_items']
+            for key in ('revenue', 'gross_profit', 'operating_income', 'net_income', 'total_assets'):
+                if key in line_items:
+                    growth = store.growth(key)
+                    trends['analysis'].append({
+                        "metric": key,
+                        "periods": list(store.periods),
+                        "values": line_items[key],
+                        "growth": [None if np.isnan(g) else float(g) for g in growth]
+                    })
+        elif 'periods' in data and data['periods']:
             trends['available'] = True
             trends['periods'] = len(data['periods'])
         
@@ -436,27 +502,4 @@ class FinancialCalculator:
     
     def _load_industry_benchmarks(self) -> Dict[str, Dict[str, float]]:
         """Load industry benchmark data"""
-        
-        return {
-            "manufacturing": {
-                "current_ratio": 1.5,
-                "quick_ratio": 0.9,
-                "debt_to_equity": 0.8,
-                "net_profit_margin": 8.0,
-                "return_on_equity": 12.0
-            },
-            "retail": {
-                "current_ratio": 1.2,
-                "quick_ratio": 0.4,
-                "debt_to_equity": 1.2,
-                "net_profit_margin": 5.0,
-                "return_on_equity": 15.0
-            },
-            "technology": {
-                "current_ratio": 2.5,
-                "quick_ratio": 2.0,
-                "debt_to_equity": 0.3,
-                "net_profit_margin": 20.0,
-                "return_on_equity": 25.0
-            }
-        }
+        return INDUSTRY_BENCHMARKS
@@ -12,6 +12,8 @@ export interface FinancialRatios {
   efficiency: Record<string, number>;
   valuation?: Record<string, number>;
   growth: Record<string, number>;
+  periods?: string[];
+  history?: Record<string, Record<string, (number | null)[]>>;
 }
 
 export interface TrendAnalysis {
@@ -60,4 +62,6 @@ export interface UploadResponse {
   file_type: string;
   data_preview: Record<string, any>;
   message: string;
+  document_id?: string;
+  expires_in?: number;
 }
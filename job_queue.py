@@ -0,0 +1,579 @@
+"""
+Job Queue - Durable SQLite-backed queue for long-running analyses
+Clients submit a document and poll for its status instead of holding a
+request open; queued and interrupted jobs survive restarts
+"""
+
+import asyncio
+import json
+import os
+import secrets
+import shutil
+import sqlite3
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.services import pipeline, serialization
+from app.services.document_store import DocumentStore
+from app.services.pipeline_executor import ExecutorSaturatedError, PipelineExecutor
+from app.services.private_dir import make_private_dir
+from app.services.result_cache import ResultCache
+
+
+DEFAULT_JOB_DIR = "/tmp/cosmic_jobs"
+DEFAULT_JOB_TTL_SECONDS = 24 * 60 * 60
+
+# A running job whose worker has not checked in for this long is picked up again
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", 60))
+# Jobs that keep losing their worker (e.g. a document that crashes the parser) are failed
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+# How often idle workers look for jobs submitted by other API processes
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", 1.0))
+# How often expired jobs are deleted, however busy the queue is
+JOB_SWEEP_SECONDS = float(os.getenv("JOB_SWEEP_SECONDS", 600))
+# Suggested client polling interval, sent as Retry-After on unfinished jobs
+JOB_RETRY_AFTER_SECONDS = 2
+# How often an event stream checks for new events, and sends a comment to keep idle proxies open
+JOB_EVENT_POLL_SECONDS = 0.25
+JOB_EVENT_KEEPALIVE_SECONDS = 15
+
+# Share of a job's progress bar given to parsing; analysis takes the rest
+PARSE_PROGRESS = (0.1, 0.6)
+ANALYSIS_PROGRESS = (0.6, 1.0)
+
+EVENT_STREAM_MEDIA_TYPE = "text/event-stream"
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    filename TEXT,
+    file_type TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    input_path TEXT,
+    document_id TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    result BLOB,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS job_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    event TEXT NOT NULL,
+    data TEXT NOT NULL,
+    at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS job_events_job_seq ON job_events (job_id, seq);
+"""
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+def _record(
+    db: sqlite3.Connection,
+    job_id: str,
+    event: str,
+    data: Dict[str, Any],
+    progress: Optional[float] = None,
+    running: bool = True
+):
+    """Append an event; for running jobs also move the stage, progress and lease on"""
+    
+    now = time.time()
+    db.execute(
+        "INSERT INTO job_events (job_id, event, data, at) VALUES (?, ?, ?, ?)",
+        (job_id, event, json.dumps(data), now)
+    )
+    if running:
+        db.execute(
+            "UPDATE jobs SET stage = ?, progress = MAX(progress, COALESCE(?, progress)), heartbeat_at = ? "
+            "WHERE id = ? AND status = ?",
+            (event, progress, now, job_id, RUNNING)
+        )
+
+
+# Connections opened by JobProgress, one per database per process
+_progress_connections: Dict[str, sqlite3.Connection] = {}
+_progress_lock = threading.Lock()
+
+
+class JobProgress:
+    """
+    Progress callback that records pipeline events against a job
+    Picklable, so it travels with executor tasks into worker processes and
+    writes to the job database from there. Events reporting done/total
+    advance the job's progress within its [low, high] share of the bar.
+    """
+    
+    def __init__(self, db_path: str, job_id: str, low: float, high: float, started_at: Optional[float] = None):
+        self.db_path = db_path
+        self.job_id = job_id
+        self.low = low
+        self.high = high
+        self.started_at = started_at or time.time()
+    
+    def __call__(self, event: str, data: Dict[str, Any]):
+        progress = None
+        if data.get("total"):
+            progress = self.low + (self.high - self.low) * min(data.get("done", 0) / data["total"], 1.0)
+        data = {**data, "elapsed_ms": round((time.time() - self.started_at) * 1000, 1)}
+        
+        with _progress_lock:
+            db = _progress_connections.get(self.db_path)
+            if db is None:
+                db = _progress_connections[self.db_path] = _connect(self.db_path)
+            _record(db, self.job_id, event, data, progress)
+
+# Every column but the result, for listings
+_SUMMARY_COLUMNS = (
+    "id, status, stage, progress, filename, file_type, sha256, input_path, document_id, attempts, "
+    "error, NULL AS result, created_at, started_at, heartbeat_at, finished_at"
+)
+
+
+@dataclass
+class Job:
+    """One submitted analysis and where it has got to"""
+    
+    id: str
+    status: str
+    stage: str
+    progress: float
+    filename: Optional[str]
+    file_type: str
+    sha256: str
+    input_path: Optional[str]
+    document_id: Optional[str]
+    attempts: int
+    error: Optional[str]
+    result: Optional[bytes]
+    created_at: float
+    started_at: Optional[float]
+    heartbeat_at: Optional[float]
+    finished_at: Optional[float]
+    
+    @property
+    def finished(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+    
+    def status_json(self, include_result: bool = True) -> bytes:
+        """Job status as JSON; a finished result is spliced in without re-encoding"""
+        
+        status = {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": round(self.progress, 3),
+            "filename": self.filename,
+            "attempts": self.attempts,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+        head = json.dumps(status).encode()
+        if not include_result or self.result is None:
+            return head
+        return b"".join([head[:-1], b', "result": ', self.result, b"}"])
+
+
+class JobQueue:
+    """
+    Jobs and their inputs on local disk, shared by every API process
+    Rows live in SQLite (WAL mode, so pollers never block the workers);
+    input files are kept in the job directory until the job finishes.
+    """
+    
+    def __init__(
+        self,
+        job_dir: Optional[str] = None,
+        ttl_seconds: Optional[int] = None,
+        lease_seconds: Optional[int] = None,
+        max_attempts: Optional[int] = None
+    ):
+        self.job_dir = job_dir or os.getenv("JOB_DIR", DEFAULT_JOB_DIR)
+        self.ttl_seconds = ttl_seconds or int(os.getenv("JOB_TTL_SECONDS", DEFAULT_JOB_TTL_SECONDS))
+        self.lease_seconds = lease_seconds or JOB_LEASE_SECONDS
+        self.max_attempts = max_attempts or JOB_MAX_ATTEMPTS
+        # Workers open the input paths the database names, so neither may be someone else's
+        make_private_dir(self.job_dir)
+        make_private_dir(os.path.join(self.job_dir, "inputs"))
+        
+        self.db_path = os.path.join(self.job_dir, "jobs.sqlite3")
+        self._db = _connect(self.db_path)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.executescript(_SCHEMA)
+        _queues.add(self)
+    
+    def _reopen(self):
+        """Give a forked child its own connection"""
+        
+        _inherited.append(self._db)
+        self._lock = threading.Lock()
+        self._db = _connect(self.db_path)
+    
+    def submit(
+        self,
+        file_type: str,
+        sha256: str,
+        filename: Optional[str] = None,
+        source_path: Optional[str] = None,
+        document_id: Optional[str] = None
+    ) -> Job:
+        """Queue a job for an uploaded file (moved into the job directory) or a stored document"""
+        
+        job_id = secrets.token_hex(16)
+        input_path = None
+        event = {"filename": filename, "file_type": file_type}
+        if source_path is not None:
+            input_path = os.path.join(self.job_dir, "inputs", job_id + os.path.splitext(source_path)[1])
+            shutil.move(source_path, input_path)
+            event["bytes"] = os.path.getsize(input_path)
+        else:
+            event["document_id"] = document_id
+        
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, status, stage, filename, file_type, sha256, input_path, document_id, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, QUEUED, filename, file_type, sha256, input_path, document_id, time.time())
+            )
+            _record(self._db, job_id, "uploaded" if input_path else QUEUED, event, running=False)
+        return self.get(job_id)
+    
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job(**row) if row else None
+    
+    def recent(self, status: Optional[str] = None, limit: int = 50) -> List[Job]:
+        """Most recent jobs first, without their results"""
+        
+        where = " WHERE status = ?" if status else ""
+        params = (status, limit) if status else (limit,)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {_SUMMARY_COLUMNS} FROM jobs{where} ORDER BY created_at DESC LIMIT ?", params
+            ).fetchall()
+        return [Job(**row) for row in rows]
+    
+    def claim(self) -> Optional[Job]:
+        """
+        Atomically take the oldest runnable job
+        Runnable means queued, or running under a lease that has lapsed
+        because its process died or restarted - such jobs are taken over
+        rather than lost.
+        """
+        
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "UPDATE jobs SET status = ?, stage = ?, attempts = attempts + 1, started_at = ?, heartbeat_at = ? "
+                "WHERE id = (SELECT id FROM jobs WHERE status = ? OR (status = ? AND heartbeat_at < ?) "
+                "ORDER BY created_at LIMIT 1) RETURNING *",
+                (RUNNING, "starting", now, now, QUEUED, RUNNING, now - self.lease_seconds)
+            ).fetchone()
+        if row is None:
+            return None
+        
+        job = Job(**row)
+        if job.attempts > self.max_attempts:
+            self.fail(job.id, f"Abandoned after {job.attempts - 1} interrupted attempts")
+            return self.claim()
+        self.record(job.id, "started", {"attempt": job.attempts})
+        return job
+    
+    def heartbeat(self, job_id: str, stage: Optional[str] = None, progress: Optional[float] = None):
+        """Renew a running job's lease, optionally recording its progress"""
+        
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET heartbeat_at = ?, stage = COALESCE(?, stage), progress = COALESCE(?, progress) "
+                "WHERE id = ? AND status = ?",
+                (time.time(), stage, progress, job_id, RUNNING)
+            )
+    
+    def record(self, job_id: str, event: str, data: Optional[Dict[str, Any]] = None, progress: Optional[float] = None):
+        """Append an event to a running job's stream, renewing its lease"""
+        
+        with self._lock:
+            _record(self._db, job_id, event, data or {}, progress)
+    
+    def progress_callback(self, job: Job, low: float, high: float) -> JobProgress:
+        """A callback for pipeline stages of this job, reporting within [low, high]"""
+        return JobProgress(self.db_path, job.id, low, high, job.started_at)
+    
+    def events(self, job_id: str, after: int = 0, limit: int = 500) -> List[Tuple[int, str, str]]:
+        """(seq, event, JSON data) of a job's events after a sequence number, oldest first"""
+        
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, event, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                (job_id, after, limit)
+            ).fetchall()
+        return [tuple(row) for row in rows]
+    
+    def succeed(self, job_id: str, result: bytes):
+        self._finish(job_id, SUCCEEDED, result=result)
+    
+    def fail(self, job_id: str, error: str):
+        self._finish(job_id, FAILED, error=error)
+    
+    def _finish(self, job_id: str, status: str, result: Optional[bytes] = None, error: Optional[str] = None):
+        with self._lock:
+            row = self._db.execute("SELECT input_path FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            # One transaction, so event streams never see the outcome without its final event
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, stage = ?, progress = ?, result = ?, error = ?, finished_at = ?, "
+                    "input_path = NULL WHERE id = ?",
+                    (status, status, 1.0 if status == SUCCEEDED else 0.0, result, error, time.time(), job_id)
+                )
+                _record(self._db, job_id, status, {"error": error} if error else {}, running=False)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+        # The input is no longer needed once the job has an outcome
+        if row and row["input_path"]:
+            self._remove(row["input_path"])
+    
+    def sweep(self) -> int:
+        """Delete finished jobs older than the TTL; returns how many were removed"""
+        
+        with self._lock:
+            rows = self._db.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ? RETURNING input_path",
+                (SUCCEEDED, FAILED, time.time() - self.ttl_seconds)
+            ).fetchall()
+            self._db.execute("DELETE FROM job_events WHERE job_id NOT IN (SELECT id FROM jobs)")
+        for (path,) in rows:
+            if path:
+                self._remove(path)
+        return len(rows)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Job counts by status"""
+        
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)}
+        counts.update({status: count for status, count in rows})
+        return {**counts, "ttl_seconds": self.ttl_seconds, "lease_seconds": self.lease_seconds}
+    
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+    
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+# SQLite connections must not be shared across fork(), e.g. by pre-forked API workers
+_queues: "weakref.WeakSet[JobQueue]" = weakref.WeakSet()
+# The parent's connections, kept referenced in the child: closing them here could
+# checkpoint or unlock the database underneath the parent
+_inherited: List[sqlite3.Connection] = []
+
+
+def _reopen_after_fork():
+    global _progress_lock
+    _progress_lock = threading.Lock()
+    _inherited.extend(_progress_connections.values())
+    _progress_connections.clear()
+    for queue in list(_queues):
+        queue._reopen()
+
+
+os.register_at_fork(after_in_child=_reopen_after_fork)
+
+
+class JobWorker:
+    """
+    Background tasks that drain the job queue through the pipeline executor
+    Parsing and analysis are separate executor tasks so progress can be
+    reported between them; finished results also go to the result cache.
+    """
+    
+    def __init__(
+        self,
+        queue: JobQueue,
+        executor: PipelineExecutor,
+        cache: ResultCache,
+        documents: DocumentStore,
+        concurrency: Optional[int] = None
+    ):
+        self.queue = queue
+        self.executor = executor
+        self.cache = cache
+        self.documents = documents
+        self.concurrency = concurrency or int(os.getenv("JOB_WORKERS", max(executor.max_workers, 1)))
+        
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._next_sweep = time.monotonic() + JOB_SWEEP_SECONDS
+    
+    def start(self):
+        """Start the worker tasks on the running event loop"""
+        
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.ensure_future(self._loop()) for _ in range(self.concurrency)]
+    
+    def notify(self):
+        """Wake idle workers after a submit from this process"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+    
+    async def stop(self):
+        """Cancel the workers; jobs they held are resumed once their lease lapses"""
+        
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    async def _loop(self):
+        while True:
+            await self._sweep_if_due()
+            job = await run_in_threadpool(self.queue.claim)
+            if job is not None:
+                await self.run_job(job)
+                continue
+            
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    
+    async def _sweep_if_due(self):
+        """Delete expired jobs once every JOB_SWEEP_SECONDS, shared by this process's workers"""
+        
+        now = time.monotonic()
+        if now < self._next_sweep:
+            return
+        # Claimed before the await so the other worker tasks do not sweep as well
+        self._next_sweep = now + JOB_SWEEP_SECONDS
+        await run_in_threadpool(self.queue.sweep)
+    
+    async def run_job(self, job: Job):
+        """Run one claimed job to completion, keeping its lease alive meanwhile"""
+        
+        heartbeat = asyncio.ensure_future(self._keep_alive(job.id))
+        try:
+            result = await self._analyze(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await run_in_threadpool(self.queue.fail, job.id, str(e) or type(e).__name__)
+        else:
+            await run_in_threadpool(self.queue.succeed, job.id, result)
+        finally:
+            heartbeat.cancel()
+    
+    async def _analyze(self, job: Job) -> bytes:
+        key = self.cache.make_key(job.sha256, pipeline.PIPELINE_VERSION, job.file_type)
+        cached = await run_in_threadpool(self.cache.get, key)
+        if cached is not None:
+            await run_in_threadpool(self.queue.record, job.id, "cached", {}, 1.0)
+            return cached
+        
+        if job.document_id is not None:
+            document = await run_in_threadpool(self.documents.get, job.document_id)
+            if document is None:
+                raise ValueError("Unknown or expired document_id; upload the file again")
+            extracted_data = document.extracted_data
+        else:
+            await self._progress(job.id, "parsing", PARSE_PROGRESS[0])
+            extracted_data = await self._run(
+                pipeline.parse_document, job.input_path, job.file_type,
+                self.queue.progress_callback(job, *PARSE_PROGRESS)
+            )
+        
+        await self._progress(job.id, "analyzing", ANALYSIS_PROGRESS[0])
+        result = await self._run(
+            pipeline.analyze_document, extracted_data, self.queue.progress_callback(job, *ANALYSIS_PROGRESS)
+        )
+        encoded = await run_in_threadpool(serialization.dumps, result)
+        await run_in_threadpool(self.cache.put, key, encoded)
+        return encoded
+    
+    async def _run(self, fn, *args):
+        """Submit to the executor, waiting for room rather than failing when it is saturated"""
+        
+        while True:
+            try:
+                return await self.executor.run(fn, *args)
+            except ExecutorSaturatedError:
+                await asyncio.sleep(JOB_POLL_SECONDS / 10)
+    
+    async def _progress(self, job_id: str, stage: str, progress: float):
+        await run_in_threadpool(self.queue.record, job_id, stage, {}, progress)
+    
+    async def _keep_alive(self, job_id: str):
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            await run_in_threadpool(self.queue.heartbeat, job_id)
+
+
+async def stream_events(
+    queue: JobQueue,
+    job_id: str,
+    after: int = 0,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+) -> AsyncIterator[bytes]:
+    """
+    A job's events as Server-Sent Events, ending after its final event
+    Each event's id is its sequence number, so a client reconnecting with
+    Last-Event-ID resumes where it left off instead of starting over.
+    """
+    
+    idle = 0.0
+    while True:
+        events = await run_in_threadpool(queue.events, job_id, after)
+        for seq, event, data in events:
+            after = seq
+            yield f"id: {seq}\nevent: {event}\ndata: {data}\n\n".encode()
+            if event in (SUCCEEDED, FAILED):
+                return
+        
+        if events:
+            idle = 0.0
+        else:
+            job = await run_in_threadpool(queue.get, job_id)
+            if job is None or job.finished and not await run_in_threadpool(queue.events, job_id, after, 1):
+                return
+            idle += JOB_EVENT_POLL_SECONDS
+            if idle >= JOB_EVENT_KEEPALIVE_SECONDS:
+                idle = 0.0
+                yield b": keep-alive\n\n"
+        
+        if is_disconnected is not None and await is_disconnected():
+            return
+        await asyncio.sleep(JOB_EVENT_POLL_SECONDS)
@@ -0,0 +1,159 @@
+"""
+Label Index - Maps raw statement labels to canonical line-item keys
+One synonym table shared by the CSV, Excel and PDF table paths; labels
+are normalized once and looked up in a dict, memoized per process
+"""
+
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from app.services.line_item_extractor import LINE_ITEM_PATTERNS
+from app.services.statement_store import STATEMENT_OF
+
+
+# Distinct labels remembered per process; trial balances repeat the same few thousand
+LABEL_CACHE_SIZE = int(os.getenv("LABEL_CACHE_SIZE", 65_536))
+
+# Normalized phrases (see normalize_label) for each canonical line item
+LINE_ITEM_SYNONYMS: Dict[str, Tuple[str, ...]] = {
+    # Balance sheet
+    "total_assets": ("total assets", "assets total", "total asset"),
+    "current_assets": ("current assets", "total current assets"),
+    "cash": (
+        "cash", "cash and cash equivalents", "cash and equivalents", "cash equivalents",
+        "cash and bank", "cash at bank", "cash and short term investments"
+    ),
+    "receivables": (
+        "receivables", "accounts receivable", "account receivable", "trade receivables",
+        "trade and other receivables", "trade debtors", "debtors", "ar"
+    ),
+    "inventory": ("inventory", "inventories", "merchandise inventory"),
+    "total_liabilities": ("total liabilities", "liabilities total"),
+    "current_liabilities": ("current liabilities", "total current liabilities"),
+    "payables": (
+        "payables", "accounts payable", "account payable", "trade payables",
+        "trade and other payables", "trade creditors", "creditors", "ap"
+    ),
+    "total_debt": ("total debt", "borrowings", "total borrowings", "debt"),
+    "equity": (
+        "equity", "total equity", "shareholders equity", "stockholders equity",
+        "total shareholders equity", "total stockholders equity", "owners equity", "net assets"
+    ),
+    # Income statement
+    "revenue": (
+        "revenue", "revenues", "total revenue", "total revenues", "sales", "net sales",
+        "total sales", "turnover", "net revenue", "net revenues"
+    ),
+    "cogs": (
+        "cogs", "cost of goods sold", "cost of sales", "cost of revenue", "cost of revenues",
+        "total cogs", "total cost of goods sold", "total cost of sales", "total cost of revenue"
+    ),
+    "gross_profit": ("gross profit", "gross income"),
+    "operating_expenses": (
+        "operating expenses", "total operating expenses", "opex", "operating costs",
+        "total operating costs"
+    ),
+    "operating_income": (
+        "operating income", "operating profit", "ebit", "income from operations",
+        "operating income ebit", "profit from operations"
+    ),
+    "ebitda": ("ebitda", "adjusted ebitda"),
+    "depreciation": ("depreciation", "depreciation and amortization", "depreciation expense", "d and a"),
+    "amortization": ("amortization", "amortisation", "amortization expense"),
+    "interest_expense": ("interest expense", "interest expenses", "finance costs", "interest paid"),
+    "net_income": (
+        "net income", "net profit", "net earnings", "profit for the year", "profit for the period",
+        "net income loss", "net profit loss"
+    ),
+    # Cash flow
+    "operating_cash_flow": (
+        "operating cash flow", "cash from operating activities", "cash from operations",
+        "net cash from operating activities", "net cash provided by operating activities",
+        "operating activities"
+    ),
+    "investing_cash_flow": (
+        "investing cash flow", "cash from investing activities",
+        "net cash from investing activities", "net cash used in investing activities",
+        "investing activities"
+    ),
+    "financing_cash_flow": (
+        "financing cash flow", "cash from financing activities",
+        "net cash from financing activities", "net cash used in financing activities",
+        "financing activities"
+    ),
+    "free_cash_flow": ("free cash flow", "fcf")
+}
+
+# Parenthetical qualifiers such as "(EBIT)", "(loss)" or "(in thousands)"
+_PARENTHETICAL = re.compile(r"\([^)]*\)")
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+# Qualifiers that do not change which line item a label is
+_PREFIXES = ("total ",)
+_SUFFIXES = (" net", " total")
+
+
+def normalize_label(label: str) -> str:
+    """Lower-case words only: 'Trade receivables, net (Note 4)' -> 'trade receivables net'"""
+    
+    label = _PARENTHETICAL.sub(" ", label.lower()).replace("&", " and ").replace("'", "")
+    label = label.replace("_", " ")
+    return _NON_WORD.sub(" ", label).strip()
+
+
+def _build_phrase_index() -> Dict[str, str]:
+    phrases = {}
+    for key, synonyms in LINE_ITEM_SYNONYMS.items():
+        for phrase in synonyms:
+            phrases.setdefault(normalize_label(phrase), key)
+    return phrases
+
+
+_PHRASES = _build_phrase_index()
+
+# Whole-label fallback to the free-text patterns, for phrasings not listed above
+_PATTERNS = re.compile("|".join(
+    f"(?P<{key}>{label})" for items in LINE_ITEM_PATTERNS.values() for key, label in items.items()
+))
+
+
+@lru_cache(maxsize=LABEL_CACHE_SIZE)
+def canonical_key(label: str) -> Optional[str]:
+    """Canonical line-item key for a raw label, or None if it is not a known line item"""
+    
+    phrase = normalize_label(label)
+    if not phrase:
+        return None
+    
+    key = _PHRASES.get(phrase)
+    if key is not None:
+        return key
+    
+    # "Total net sales", "Receivables, net": retry without qualifiers that only restate the item
+    stripped = phrase
+    for prefix in _PREFIXES:
+        if stripped.startswith(prefix):
+            stripped = stripped[len(prefix):]
+    for suffix in _SUFFIXES:
+        if stripped.endswith(suffix):
+            stripped = stripped[:-len(suffix)]
+    key = _PHRASES.get(stripped)
+    if key is not None:
+        return key
+    
+    # The pattern must cover the whole label: "Deferred revenue" is not revenue
+    match = _PATTERNS.fullmatch(phrase)
+    return match.lastgroup if match else None
+
+
+def classify_label(label: str) -> Optional[Tuple[str, str]]:
+    """Statement and key for a raw label, e.g. ('balance_sheet', 'receivables')"""
+    
+    key = canonical_key(label)
+    return (STATEMENT_OF[key], key) if key is not None else None
+
+
+def cache_info():
+    """Hit and miss counts of the per-process label cache"""
+    return canonical_key.cache_info()
@@ -0,0 +1,56 @@
+"""
+Lazy Imports - Heavy optional dependencies loaded on first use
+Parsers and report backends name their modules up front but only import
+them when a document of that format arrives, keeping start-up cheap
+"""
+
+import importlib
+import sys
+from types import ModuleType
+from typing import Iterable, Optional
+
+
+class LazyModule:
+    """
+    Stands in for a module until one of its attributes is used
+    The real module is imported then and cached, so later lookups cost one
+    attribute access. Importing it anywhere else is unaffected.
+    """
+    
+    __slots__ = ("name", "_module")
+    
+    def __init__(self, name: str):
+        self.name = name
+        self._module: Optional[ModuleType] = None
+    
+    def __repr__(self) -> str:
+        return f"LazyModule({self.name!r}, loaded={self.loaded})"
+    
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None or self.name in sys.modules
+    
+    def load(self) -> ModuleType:
+        if self._module is None:
+            self._module = importlib.import_module(self.name)
+        return self._module
+    
+    def __getattr__(self, attr: str):
+        return getattr(self.load(), attr)
+    
+    def __setattr__(self, attr: str, value):
+        # Patching an attribute (e.g. in tests) patches the real module
+        if attr in LazyModule.__slots__:
+            object.__setattr__(self, attr, value)
+        else:
+            setattr(self.load(), attr, value)
+
+
+def lazy_module(name: str) -> LazyModule:
+    return LazyModule(name)
+
+
+def load_all(modules: Iterable[LazyModule]):
+    """Import modules now, e.g. in a worker before it takes traffic"""
+    for module in modules:
+        module.load()
@@ -0,0 +1,122 @@
+"""
+Line Item Extractor - Single-pass extraction of financial line items from text
+The document is scanned once for figures; all label patterns are compiled
+into one alternation that is only tried in the short span before a figure
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Tuple
+
+
+# Label patterns per statement. Where labels overlap, the longer phrase is
+# listed first: "cost of revenue" must win over "revenue" at the same spot.
+LINE_ITEM_PATTERNS: Dict[str, Dict[str, str]] = {
+    "balance_sheet": {
+        "total_assets": r"total\s+assets?",
+        "current_assets": r"current\s+assets?",
+        "total_liabilities": r"total\s+liabilities?",
+        "current_liabilities": r"current\s+liabilities?",
+        "equity": r"(?:shareholders?|stockholders?)'?\s+equity",
+        "cash": r"cash\s+(?:and\s+)?(?:cash\s+)?equivalents?",
+        "inventory": r"inventor(?:y|ies)",
+        "receivables": r"(?:accounts?\s+)?receivables?"
+    },
+    "income_statement": {
+        "cogs": r"cost\s+of\s+(?:goods\s+sold|revenues?|sales)|goods\s+sold",
+        "revenue": r"(?:total\s+)?(?:revenues?|sales)",
+        "gross_profit": r"gross\s+profit",
+        "operating_income": r"operating\s+income",
+        "net_income": r"net\s+(?:income|profit)",
+        "ebitda": r"ebitda",
+        "operating_expenses": r"operating\s+expenses?"
+    },
+    "cash_flow": {
+        "operating_cash_flow": r"(?:cash\s+from\s+)?operating\s+activities",
+        "investing_cash_flow": r"(?:cash\s+from\s+)?investing\s+activities",
+        "financing_cash_flow": r"(?:cash\s+from\s+)?financing\s+activities",
+        "free_cash_flow": r"free\s+cash\s+flow"
+    }
+}
+
+# Separator between a label and its figure, and the figure itself
+SEPARATOR_PATTERN = r"\s*:?\s*"
+VALUE_PATTERN = SEPARATOR_PATTERN + r"(\d+[\d,\.]*)"
+
+# Longest span a label may cover, including runs of whitespace in PDF text
+LABEL_WINDOW = 64
+_SEPARATORS = frozenset(" \t\r\n\f\v:")
+
+
+@dataclass(frozen=True)
+class LineItemMatch:
+    """One recognized line item and where it occurs in the text"""
+    
+    statement: str
+    key: str
+    value: float
+    start: int
+    end: int
+
+
+class LineItemExtractor:
+    """
+    Finds every line item with one pass over the text
+    Python's regex engine tries each branch of an alternation at every
+    offset, which makes one big "label then number" pattern slower than
+    separate searches. Figures, though, are cheap to find and rare compared
+    to letters, so the text is scanned for figures and, for each figure
+    that directly follows a word, the label alternation is matched only
+    against the text ending at that word.
+    """
+    
+    def __init__(self, patterns: Dict[str, Dict[str, str]] = LINE_ITEM_PATTERNS):
+        self.statements = list(patterns)
+        self._owner: Dict[str, Tuple[str, str]] = {}
+        
+        alternatives = []
+        for statement, items in patterns.items():
+            for key, label in items.items():
+                group = f"{statement}__{key}"
+                self._owner[group] = (statement, key)
+                alternatives.append(f"(?P<{group}>{label})")
+        
+        # Leftmost start wins, so the longest label ending at a figure is chosen
+        self._labels = re.compile(f"\\b(?:{'|'.join(alternatives)})\\Z", re.IGNORECASE)
+        self._figures = re.compile(r"\d[\d,\.]*")
+    
+    def finditer(self, text: str) -> Iterator[LineItemMatch]:
+        """Yield every line item in document order; unparseable figures are skipped"""
+        
+        labels = self._labels
+        for figure in self._figures.finditer(text):
+            # Labels end in a letter; skip figures that follow other figures or symbols
+            label_end = figure.start()
+            while label_end and text[label_end - 1] in _SEPARATORS:
+                label_end -= 1
+            if not label_end or not text[label_end - 1].isalpha():
+                continue
+            
+            label = labels.search(text, max(0, label_end - LABEL_WINDOW), label_end)
+            if label is None:
+                continue
+            
+            try:
+                value = float(figure.group().replace(',', ''))
+            except ValueError:
+                continue
+            
+            statement, key = self._owner[label.lastgroup]
+            yield LineItemMatch(statement, key, value, label.start(), figure.end())
+    
+    def find_all(self, text: str) -> List[LineItemMatch]:
+        """All line item matches with their positions"""
+        return list(self.finditer(text))
+    
+    def extract(self, text: str) -> Dict[str, Dict[str, float]]:
+        """First value found for each line item, grouped by statement"""
+        
+        result: Dict[str, Dict[str, float]] = {statement: {} for statement in self.statements}
+        for item in self.finditer(text):
+            result[item.statement].setdefault(item.key, item.value)
+        return result
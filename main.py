@@ -1,19 +1,33 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, Form, Header, Request, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile as StarletteUploadFile
 import uvicorn
-from app.services.file_processor import FileProcessor
-from app.services.financial_analyzer import FinancialAnalyzer
-from app.services.ai_insights import AIInsightGenerator
-from app.models.schemas import AnalysisResponse, FileUploadResponse
-import tempfile
+from app.services.file_processor import FileProcessor, close_page_pool
+from app.services.pipeline_executor import PipelineExecutor, ExecutorSaturatedError
+from app.services import pipeline
+from app.services.result_cache import ResultCache
+from app.services.document_store import DocumentStore, ParsedDocument
+from app.services.upload_spooler import UploadSpooler, UploadSizeLimitMiddleware, UploadTooLargeError
+from app.services.batch_analyzer import BatchAnalyzer, BatchTooLargeError, NDJSON_MEDIA_TYPE
+from app.services.response_encoder import ResponseEncoder, Projection
+from app.services import serialization
+from app.services.job_queue import JobQueue, JobWorker, JOB_RETRY_AFTER_SECONDS, EVENT_STREAM_MEDIA_TYPE, stream_events
+from app.services.prefork_server import PreforkServer, SERVER_WORKERS, SERVER_HOST, SERVER_PORT, process_memory
+from app.services.scenario_engine import ScenarioEngine
+from app.models.schemas import (
+    AnalysisResponse, FileUploadResponse, ScenarioRequest, ScenarioResponse,
+    SensitivityRequest, SensitivityResponse, SimulationRequest, SimulationResponse
+)
+from typing import Optional
 import os
-from typing import List
 
 app = FastAPI(
     title="Cosmic Financials API",
     description="AI-powered financial analysis platform",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 app.add_middleware(
@@ -24,9 +38,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+upload_spooler = UploadSpooler()
 file_processor = FileProcessor()
-financial_analyzer = FinancialAnalyzer()
-ai_insights = AIInsightGenerator()
+# Forked server workers already run in parallel on the preloaded services, so unless
+# PIPELINE_WORKERS says otherwise they analyse in-process rather than each starting a pool
+pipeline_executor = PipelineExecutor(
+    max_workers=0 if SERVER_WORKERS > 1 and "PIPELINE_WORKERS" not in os.environ else None,
+    initializer=pipeline.warm_up
+)
+result_cache = ResultCache()
+document_store = DocumentStore()
+batch_analyzer = BatchAnalyzer(pipeline_executor, result_cache, upload_spooler, file_processor.detect_file_type)
+job_queue = JobQueue()
+response_encoder = ResponseEncoder(result_cache)
+job_worker = JobWorker(job_queue, pipeline_executor, result_cache, document_store)
+scenario_engine = ScenarioEngine()
+
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=upload_spooler.max_request_bytes,
+    path_limits={"/api/analyze/batch": batch_analyzer.max_request_bytes}
+)
+
+@app.on_event("startup")
+async def start_job_worker():
+    job_worker.start()
+
+@app.on_event("shutdown")
+async def shutdown_executor():
+    await job_worker.stop()
+    pipeline_executor.shutdown()
+    close_page_pool()
 
 @app.get("/")
 async def root():
@@ -36,62 +78,308 @@ async def root():
 async def upload_file(file: UploadFile = File(...)):
     """Upload and process financial document"""
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_path = temp_file.name
-        
         file_type = file_processor.detect_file_type(file.filename)
-        extracted_data = file_processor.process_file(temp_path, file_type)
         
-        os.unlink(temp_path)
+        async with upload_spooler.spool(file) as upload:
+            extracted_data = await pipeline_executor.run(pipeline.parse_document, upload.path, file_type)
+        
+        document_id = await run_in_threadpool(document_store.put, ParsedDocument(
+            filename=file.filename,
+            file_type=file_type,
+            sha256=upload.sha256,
+            extracted_data=extracted_data
+        ))
         
         return FileUploadResponse(
             success=True,
             filename=file.filename,
             file_type=file_type,
             data_preview=extracted_data.get("preview", {}),
-            message="File processed successfully"
+            message="File processed successfully",
+            document_id=document_id,
+            expires_in=document_store.ttl_seconds
         )
     
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"File processing error: {str(e)}")
 
+def _projection(include: Optional[str], exclude: Optional[str]) -> Projection:
+    """Fields requested with include=/exclude=; raw document text is left out by default"""
+    try:
+        return response_encoder.projection(include, exclude)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.post("/api/analyze", response_model=AnalysisResponse)
-async def analyze_financials(file: UploadFile = File(...)):
-    """Complete financial analysis pipeline"""
+async def analyze_financials(
+    request: Request,
+    file: Optional[UploadFile] = File(None),
+    document_id: Optional[str] = Form(None),
+    include: Optional[str] = None,
+    exclude: Optional[str] = None
+):
+    """Complete financial analysis pipeline, from an upload or a previously uploaded document"""
+    projection = _projection(include, exclude)
+    if document_id:
+        return await _analyze_stored_document(document_id, request, projection)
+    if file is None:
+        raise HTTPException(status_code=400, detail="Provide either a file or a document_id")
+    
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_path = temp_file.name
-        
         file_type = file_processor.detect_file_type(file.filename)
-        extracted_data = file_processor.process_file(temp_path, file_type)
-        
-        ratios = financial_analyzer.calculate_all_ratios(extracted_data)
-        trends = financial_analyzer.detect_trends(extracted_data)
-        anomalies = financial_analyzer.find_anomalies(extracted_data)
-        insights = ai_insights.generate_insights(extracted_data, ratios, trends)
         
-        os.unlink(temp_path)
-        
-        return AnalysisResponse(
-            success=True,
-            financial_data=extracted_data,
-            ratios=ratios,
-            trends=trends,
-            anomalies=anomalies,
-            ai_insights=insights,
-            visualizations=financial_analyzer.generate_chart_data(extracted_data, ratios)
+        async with upload_spooler.spool(file) as upload:
+            cache_key = result_cache.make_key(upload.sha256, pipeline.PIPELINE_VERSION, file_type)
+            return await _run_cached_analysis(
+                cache_key, request, projection, pipeline.run_analysis, upload.path, file_type
+            )
+    
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
+
+@app.post("/api/analyze/batch")
+async def analyze_batch(request: Request, include: Optional[str] = None, exclude: Optional[str] = None):
+    """Analyze many uploads, or the files of one ZIP, streaming one NDJSON line per file as it finishes"""
+    projection = _projection(include, exclude)
+    # Parsed here rather than as a File(...) parameter, whose form parsing stops at 1000 files
+    async with request.form(max_files=batch_analyzer.max_files) as form:
+        files = [file for file in form.getlist("files") if isinstance(file, StarletteUploadFile)]
+        if not files:
+            raise HTTPException(status_code=400, detail="Provide one or more files")
+        try:
+            batch = await batch_analyzer.spool(files)
+        except (BatchTooLargeError, UploadTooLargeError) as e:
+            raise HTTPException(status_code=413, detail=str(e))
+    
+    return StreamingResponse(
+        batch_analyzer.stream(batch, lambda encoded, key: response_encoder.project_json(encoded, projection, key)),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={"X-Batch-Items": str(len(batch.items))}
+    )
+
+@app.post("/api/jobs", status_code=202)
+async def submit_job(
+    file: Optional[UploadFile] = File(None),
+    document_id: Optional[str] = Form(None)
+):
+    """Queue an analysis and return its job ID at once; poll /api/jobs/{job_id} for the result"""
+    try:
+        if document_id:
+            document = await run_in_threadpool(document_store.get, document_id)
+            if document is None:
+                raise HTTPException(status_code=404, detail="Unknown or expired document_id; upload the file again")
+            job = await run_in_threadpool(
+                job_queue.submit, document.file_type, document.sha256, document.filename, None, document_id
+            )
+        elif file is not None:
+            file_type = file_processor.detect_file_type(file.filename)
+            async with upload_spooler.spool(file) as upload:
+                # The job queue takes the spooled file over; it outlives this request
+                job = await run_in_threadpool(job_queue.submit, file_type, upload.sha256, file.filename, upload.path)
+        else:
+            raise HTTPException(status_code=400, detail="Provide either a file or a document_id")
+    
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    job_worker.notify()
+    return Response(
+        content=job.status_json(),
+        status_code=202,
+        media_type="application/json",
+        headers={"Location": f"/api/jobs/{job.id}", "Retry-After": str(JOB_RETRY_AFTER_SECONDS)}
+    )
+
+@app.get("/api/jobs")
+async def list_jobs(status: Optional[str] = None, limit: int = 50):
+    """Recent jobs and their states, newest first"""
+    jobs = await run_in_threadpool(job_queue.recent, status, min(max(limit, 1), 500))
+    body = b"[" + b",".join(job.status_json(include_result=False) for job in jobs) + b"]"
+    return Response(content=body, media_type="application/json")
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    request: Request,
+    include: Optional[str] = None,
+    exclude: Optional[str] = None
+):
+    """Status and progress of a job, with the AnalysisResponse once it has succeeded"""
+    projection = _projection(include, exclude)
+    job = await run_in_threadpool(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job_id")
+    
+    headers = {} if job.finished else {"Retry-After": str(JOB_RETRY_AFTER_SECONDS)}
+    if job.result is not None:
+        job.result = await run_in_threadpool(response_encoder.project_json, job.result, projection)
+    
+    body, encoding = await run_in_threadpool(
+        response_encoder.compress, job.status_json(), request.headers.get("accept-encoding")
+    )
+    if encoding is not None:
+        headers.update({"Content-Encoding": encoding, "Vary": "Accept-Encoding"})
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request, last_event_id: Optional[str] = Header(None)):
+    """Server-Sent Events for each pipeline stage of a job, closing after it succeeds or fails"""
+    job = await run_in_threadpool(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job_id")
+    
+    after = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+    return StreamingResponse(
+        stream_events(job_queue, job_id, after, request.is_disconnected),
+        media_type=EVENT_STREAM_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _run_cached_analysis(cache_key: str, request: Request, projection: Projection, stage, *args) -> Response:
+    """Serve an analysis from the result cache, running the pipeline stage on a miss"""
+    encoded = await run_in_threadpool(result_cache.get, cache_key)
+    hit = encoded is not None
+    if not hit:
+        result = await pipeline_executor.run(stage, *args)
+        encoded = await run_in_threadpool(serialization.dumps, result)
+        await run_in_threadpool(result_cache.put, cache_key, encoded)
+    
+    # The full response is cached; each request gets its own projection and encoding of it
+    return await run_in_threadpool(
+        response_encoder.respond,
+        encoded,
+        projection,
+        request.headers.get("accept"),
+        request.headers.get("accept-encoding"),
+        cache_key,
+        {"X-Cache": "hit" if hit else "miss"}
+    )
+
+async def _analyze_stored_document(document_id: str, request: Request, projection: Projection) -> Response:
+    """Analyze a document parsed earlier by /api/upload, skipping upload and parsing"""
+    document = await run_in_threadpool(document_store.get, document_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired document_id; upload the file again")
+    
+    try:
+        cache_key = result_cache.make_key(document.sha256, pipeline.PIPELINE_VERSION, document.file_type)
+        return await _run_cached_analysis(
+            cache_key, request, projection, pipeline.analyze_document, document.extracted_data
         )
     
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
 
+@app.get("/api/documents/{document_id}/ratios")
+async def document_ratios(document_id: str, fields: Optional[str] = None):
+    """Ratios of a document uploaded earlier; fields= computes only the categories or ratios listed"""
+    document = await run_in_threadpool(document_store.get, document_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired document_id; upload the file again")
+    
+    try:
+        ratios = await run_in_threadpool(pipeline.calculate_ratios, document.extracted_data, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(content=serialization.dumps(ratios), media_type="application/json")
+
+@app.post("/api/documents/{document_id}/scenario", response_model=ScenarioResponse)
+async def document_scenario(document_id: str, scenario: ScenarioRequest):
+    """What-if analysis of a document uploaded earlier, recomputing only what its line-item overrides reach"""
+    document = await run_in_threadpool(document_store.get, document_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired document_id; upload the file again")
+    
+    # Small enough to run here: no parsing, and the base analysis is cached per document
+    try:
+        result = await run_in_threadpool(
+            scenario_engine.run,
+            result_cache.make_key(document.sha256, pipeline.PIPELINE_VERSION, document.file_type),
+            document.extracted_data,
+            scenario.changes,
+            scenario.values,
+            scenario.period
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(content=serialization.dumps(result), media_type="application/json")
+
+@app.post("/api/documents/{document_id}/simulation", response_model=SimulationResponse)
+async def document_simulation(document_id: str, simulation: SimulationRequest):
+    """Monte Carlo percentile bands for every ratio of a document uploaded earlier, one period ahead"""
+    document = await run_in_threadpool(document_store.get, document_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired document_id; upload the file again")
+    
+    try:
+        result = await pipeline_executor.run(
+            pipeline.simulate_ratios,
+            document.extracted_data,
+            {name: spec.model_dump(exclude_none=True) for name, spec in simulation.drivers.items()},
+            simulation.correlations,
+            simulation.scenarios,
+            simulation.seed,
+            simulation.percentiles,
+            simulation.targets
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    return Response(content=serialization.dumps(result), media_type="application/json")
+
+@app.post("/api/documents/{document_id}/sensitivity", response_model=SensitivityResponse)
+async def document_sensitivity(document_id: str, sensitivity: SensitivityRequest):
+    """Tornado, elasticity and heatmap tables showing which line items move chosen ratios and the health score"""
+    document = await run_in_threadpool(document_store.get, document_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired document_id; upload the file again")
+    
+    try:
+        result = await pipeline_executor.run(
+            pipeline.sensitivity,
+            document.extracted_data,
+            sensitivity.items,
+            sensitivity.steps,
+            sensitivity.targets,
+            sensitivity.heatmap
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    return Response(content=serialization.dumps(result), media_type="application/json")
+
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy", "service": "cosmic-financials"}
 
+@app.get("/api/metrics")
+async def metrics():
+    """Runtime metrics for the processing pipeline"""
+    return {
+        "executor": pipeline_executor.stats(),
+        "result_cache": result_cache.stats(),
+        "document_store": document_store.stats(),
+        "jobs": await run_in_threadpool(job_queue.stats),
+        "scenarios": scenario_engine.stats(),
+        "process": {"pid": os.getpid(), "memory": process_memory()}
+    }
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if SERVER_WORKERS > 1:
+        PreforkServer(app).run()
+    else:
+        uvicorn.run(app, host=SERVER_HOST, port=SERVER_PORT)
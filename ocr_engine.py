@@ -0,0 +1,252 @@
+"""
+OCR Engine - Preprocessed, banded and cached OCR for scanned statements
+Images are normalized (orientation, size, binarization, skew) before
+Tesseract sees them, then split into horizontal bands OCR'd in parallel
+"""
+
+import hashlib
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.services.lazy_imports import lazy_module
+from app.services.pipeline_executor import cores_per_parser
+from app.services.result_cache import ResultCache
+
+
+pytesseract = lazy_module("pytesseract")
+Image = lazy_module("PIL.Image")
+ImageOps = lazy_module("PIL.ImageOps")
+OCR_DEPENDENCIES = (pytesseract, Image, ImageOps)
+
+# Bump whenever preprocessing or banding changes so cached text is not reused
+OCR_VERSION = "2"
+
+# Longest side after downscaling; ~2400px keeps statement text near 300 DPI
+OCR_MAX_DIMENSION = int(os.getenv("OCR_MAX_DIMENSION", 2400))
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", cores_per_parser()))
+# Bands shorter than this cost more in Tesseract start-up than they save
+OCR_MIN_BAND_HEIGHT = int(os.getenv("OCR_MIN_BAND_HEIGHT", 400))
+# Unbroken vertical ink taller than this is a page edge or rule, not a line of text
+OCR_MAX_LINE_HEIGHT = int(os.getenv("OCR_MAX_LINE_HEIGHT", 150))
+OCR_LANGUAGE = os.getenv("OCR_LANGUAGE", "eng")
+
+# Adaptive threshold window and how much darker than its surroundings ink must be
+BINARIZE_BLOCK = 31
+BINARIZE_OFFSET = 12
+
+DESKEW_MAX_ANGLE = 5.0
+# Sideways play allowed when following a page edge or rule down the page
+STROKE_SLANT = 4
+# Skew is estimated on a reduced copy no wider than this
+DESKEW_SAMPLE_WIDTH = 1000
+
+# Tesseract runs as a subprocess, so threads are enough to use every core
+_ocr_threads: Optional[ThreadPoolExecutor] = None
+
+
+def _get_ocr_threads() -> ThreadPoolExecutor:
+    global _ocr_threads
+    if _ocr_threads is None:
+        _ocr_threads = ThreadPoolExecutor(max_workers=max(OCR_WORKERS, 1), thread_name_prefix="ocr")
+    return _ocr_threads
+
+
+@dataclass
+class OCRResult:
+    """Recognized text plus how it was produced"""
+    
+    text: str
+    bands: int
+    skew_angle: float
+    scale: float
+    cached: bool
+
+
+class OCREngine:
+    """
+    Image-to-text with preprocessing, parallel bands and a result cache
+    Cache keys hash the normalized binary image rather than the upload,
+    so copies re-saved in another format or with new metadata still hit.
+    """
+    
+    def __init__(self, cache: Optional[ResultCache] = None, workers: Optional[int] = None):
+        self.cache = cache if cache is not None else ResultCache(namespace="ocr")
+        self.workers = workers or OCR_WORKERS
+    
+    def image_to_text(self, file_path: str) -> OCRResult:
+        """OCR an image file, serving repeated scans from the cache"""
+        
+        with Image.open(file_path) as image:
+            gray, scale = self._normalize(image)
+        
+        ink = binarize(np.asarray(gray))
+        angle = estimate_skew(ink)
+        if angle:
+            gray = gray.rotate(angle, resample=Image.BICUBIC, fillcolor=255)
+            ink = binarize(np.asarray(gray))
+        
+        key = self.cache.make_key(self._fingerprint(ink), OCR_VERSION, OCR_LANGUAGE)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return OCRResult(cached.decode(), 0, angle, scale, True)
+        
+        bounds = band_bounds(ink, self.workers, OCR_MIN_BAND_HEIGHT)
+        page = Image.fromarray(np.where(ink, 0, 255).astype(np.uint8))
+        bands = [page.crop((0, top, page.width, bottom)) for top, bottom in bounds]
+        
+        if len(bands) > 1:
+            texts = list(_get_ocr_threads().map(self._recognize, bands))
+        else:
+            texts = [self._recognize(band) for band in bands]
+        
+        text = "\n".join(t.strip("\n") for t in texts if t.strip())
+        self.cache.put(key, text.encode())
+        return OCRResult(text, len(bands), angle, scale, False)
+    
+    @staticmethod
+    def _normalize(image: "Image.Image") -> Tuple["Image.Image", float]:
+        """Apply EXIF orientation, convert to grayscale and cap the resolution"""
+        
+        image = ImageOps.exif_transpose(image).convert("L")
+        scale = min(1.0, OCR_MAX_DIMENSION / max(image.size))
+        if scale < 1.0:
+            size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+            image = image.resize(size, resample=Image.LANCZOS)
+        return image, round(scale, 4)
+    
+    @staticmethod
+    def _fingerprint(ink: np.ndarray) -> str:
+        digest = hashlib.sha256(np.packbits(ink).tobytes())
+        digest.update(str(ink.shape).encode())
+        return digest.hexdigest()
+    
+    @staticmethod
+    def _recognize(band: "Image.Image") -> str:
+        return pytesseract.image_to_string(band, lang=OCR_LANGUAGE)
+
+
+def binarize(gray: np.ndarray, block: int = BINARIZE_BLOCK, offset: float = BINARIZE_OFFSET) -> np.ndarray:
+    """
+    Adaptive mean threshold; True marks ink
+    Comparing each pixel with its local mean copes with the uneven
+    lighting of phone photos, where one global threshold fails.
+    """
+    
+    pad = block // 2
+    padded = np.pad(gray.astype(np.float64), pad, mode="edge")
+    integral = np.pad(padded.cumsum(axis=0).cumsum(axis=1), ((1, 0), (1, 0)))
+    
+    h, w = gray.shape
+    window = (
+        integral[block:block + h, block:block + w]
+        - integral[:h, block:block + w]
+        - integral[block:block + h, :w]
+        + integral[:h, :w]
+    )
+    return gray < window / (block * block) - offset
+
+
+def estimate_skew(ink: np.ndarray, max_angle: float = DESKEW_MAX_ANGLE) -> float:
+    """
+    Rotation (degrees, counter-clockwise) that best levels the text lines
+    Text rows are sharpest - the horizontal ink profile has the largest
+    row-to-row variation - when lines are level. Searched coarse then fine.
+    """
+    
+    if not ink.any():
+        return 0.0
+    
+    step = max(1, math.ceil(ink.shape[1] / DESKEW_SAMPLE_WIDTH))
+    sample = Image.fromarray((ink[::step, ::step] * 255).astype(np.uint8))
+    
+    def sharpness(angle: float) -> float:
+        rotated = np.asarray(sample.rotate(angle, resample=Image.NEAREST))
+        profile = rotated.sum(axis=1, dtype=np.float64)
+        return float(np.sum(np.diff(profile) ** 2))
+    
+    coarse = max(np.arange(-max_angle, max_angle + 0.5, 1.0), key=sharpness)
+    fine = max(np.arange(coarse - 1.0, coarse + 1.01, 0.2), key=sharpness)
+    angle = round(float(fine), 1)
+    return 0.0 if abs(angle) < 0.2 else angle
+
+
+def vertical_strokes(ink: np.ndarray, longer_than: int, slant: int = STROKE_SLANT) -> np.ndarray:
+    """
+    Ink pixels in near-vertical strokes running more than `longer_than` rows
+    Ink is first smeared `slant` pixels sideways, so an edge left slightly
+    slanted by deskewing still reads as one unbroken run.
+    """
+    
+    height, width = ink.shape
+    smeared = ink.copy()
+    for shift in range(1, slant + 1):
+        smeared[:, shift:] |= ink[:, :-shift]
+        smeared[:, :-shift] |= ink[:, shift:]
+    
+    # Columns end to end, each padded with blank rows so no run crosses into the next
+    columns = np.pad(smeared.T, ((0, 0), (1, 1))).ravel()
+    edges = np.flatnonzero(columns[1:] != columns[:-1]) + 1
+    starts, stops = edges[::2], edges[1::2]
+    tall = stops - starts > longer_than
+    
+    marks = np.zeros(columns.size + 1, dtype=np.int8)
+    marks[starts[tall]] = 1
+    marks[stops[tall]] = -1
+    strokes = np.cumsum(marks[:-1], dtype=np.int8).astype(bool)
+    return strokes.reshape(width, height + 2)[:, 1:-1].T & ink
+
+
+def specks(ink: np.ndarray) -> np.ndarray:
+    """Ink pixels with no ink among their eight neighbours"""
+    
+    padded = np.pad(ink, 1)
+    height, width = ink.shape
+    neighbours = np.zeros(ink.shape, dtype=bool)
+    for dy in range(3):
+        for dx in range(3):
+            if dy != 1 or dx != 1:
+                neighbours |= padded[dy:dy + height, dx:dx + width]
+    return ink & ~neighbours
+
+
+def band_bounds(
+    ink: np.ndarray,
+    bands: int,
+    min_height: int = OCR_MIN_BAND_HEIGHT,
+    max_line_height: int = OCR_MAX_LINE_HEIGHT
+) -> List[Tuple[int, int]]:
+    """
+    Split the page into up to `bands` row ranges, cutting only through blank rows
+    Cuts land on the gap nearest each even split so no text line is halved;
+    bands without any ink are dropped. A blank row has no ink at all apart
+    from lone specks and strokes taller than any text line (page edges,
+    rules); ink is not judged by how much a row holds, since a short line
+    on a wide page holds hardly any.
+    """
+    
+    height = ink.shape[0]
+    text = ink & ~vertical_strokes(ink, max_line_height) & ~specks(ink)
+    row_ink = text.sum(axis=1)
+    bands = max(1, min(bands, height // max(min_height, 1)))
+    
+    blank_rows = np.flatnonzero(row_ink == 0)
+    cuts = [0]
+    for i in range(1, bands):
+        candidates = blank_rows[
+            (blank_rows >= cuts[-1] + min_height) & (blank_rows <= height - min_height)
+        ]
+        if not len(candidates):
+            break
+        target = i * height // bands
+        cuts.append(int(candidates[np.argmin(np.abs(candidates - target))]))
+    cuts.append(height)
+    
+    return [
+        (top, bottom) for top, bottom in zip(cuts[:-1], cuts[1:])
+        if bottom > top and row_ink[top:bottom].any()
+    ]
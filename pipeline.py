@@ -0,0 +1,156 @@
+"""
+Analysis Pipeline - Picklable entry points for the CPU-bound stages
+Everything here runs inside PipelineExecutor worker processes, so the
+services are built once per process and reused across tasks
+"""
+
+import os
+from typing import Dict, Any, Mapping, Optional, Sequence
+
+from app.services.file_processor import FileProcessor
+from app.services.financial_analyzer import FinancialAnalyzer
+from app.services.ai_insights import AIInsightGenerator
+from app.services.simulation_engine import SimulationEngine
+from app.services.sensitivity_engine import SensitivityEngine
+from app.services.progress import ProgressCallback, StageTimer, report
+from app.models.schemas import AnalysisResponse, FinancialRatios, SensitivityResponse, SimulationResponse
+
+
+# Bump whenever parsing or analysis output changes so cached results are not reused
+PIPELINE_VERSION = "8"
+
+# Formats whose parser libraries workers import at start-up instead of on first use
+PIPELINE_PRELOAD_FORMATS = os.getenv("PIPELINE_PRELOAD_FORMATS", "")
+
+_services: Dict[str, Any] = {}
+
+
+def _get_services() -> Dict[str, Any]:
+    """Build the pipeline services on first use in this process"""
+    
+    if not _services:
+        _services["file_processor"] = FileProcessor()
+        _services["financial_analyzer"] = FinancialAnalyzer()
+        _services["ai_insights"] = AIInsightGenerator()
+        _services["simulation_engine"] = SimulationEngine(_services["financial_analyzer"])
+        _services["sensitivity_engine"] = SensitivityEngine(_services["financial_analyzer"])
+    return _services
+
+
+def warm_up():
+    """Build the services, and import parsers for PIPELINE_PRELOAD_FORMATS, before any task arrives"""
+    
+    services = _get_services()
+    services["file_processor"].preload(
+        file_type.strip() for file_type in PIPELINE_PRELOAD_FORMATS.split(",") if file_type.strip()
+    )
+
+
+# Analysis steps, reported in this order as each one's result becomes available
+ANALYSIS_STEPS = ("ratios", "trends", "anomalies", "insights", "charts")
+
+
+def parse_document(
+    file_path: str,
+    file_type: str,
+    progress: Optional[ProgressCallback] = None
+) -> Dict[str, Any]:
+    """Parse a document into structured financial data"""
+    return _get_services()["file_processor"].process_file(file_path, file_type, progress)
+
+
+def calculate_ratios(extracted_data: Dict[str, Any], fields: Optional[str] = None) -> FinancialRatios:
+    """Just the ratios of parsed data, or the selected ones; raises ValueError for unknown fields"""
+    return _get_services()["financial_analyzer"].calculate_all_ratios(extracted_data, fields)
+
+
+def simulate_ratios(
+    extracted_data: Dict[str, Any],
+    drivers: Optional[Mapping[str, Mapping[str, float]]] = None,
+    correlations: Optional[Mapping[str, Mapping[str, float]]] = None,
+    scenarios: Optional[int] = None,
+    seed: int = 0,
+    percentiles: Optional[Sequence[float]] = None,
+    targets: Optional[Sequence[str]] = None
+) -> SimulationResponse:
+    """Monte Carlo ratio bands for the period after parsed data's latest; raises ValueError for bad inputs"""
+    return _get_services()["simulation_engine"].run(extracted_data, drivers, correlations, scenarios, seed, percentiles, targets)
+
+
+def sensitivity(
+    extracted_data: Dict[str, Any],
+    items: Optional[Sequence[str]] = None,
+    steps: Optional[Sequence[float]] = None,
+    targets: Optional[Sequence[str]] = None,
+    heatmap: Optional[Sequence[str]] = None
+) -> SensitivityResponse:
+    """Tornado, elasticity and heatmap tables for parsed data's latest period; raises ValueError for bad inputs"""
+    return _get_services()["sensitivity_engine"].run(extracted_data, items, steps, targets, heatmap)
+
+
+def analyze_document(
+    extracted_data: Dict[str, Any],
+    progress: Optional[ProgressCallback] = None
+) -> AnalysisResponse:
+    """
+    Run ratios, trends, anomalies, insights and charts over parsed data
+    Each step's result is reported as soon as it exists, so listeners
+    can show ratios while insights are still being generated; results
+    are only dumped to JSON when there is a listener.
+    """
+    
+    services = _get_services()
+    financial_analyzer = services["financial_analyzer"]
+    timer = StageTimer()
+    total = len(ANALYSIS_STEPS)
+    
+    ratios = financial_analyzer.calculate_all_ratios(extracted_data)
+    report(
+        progress, "ratios", done=1, total=total, duration_ms=timer.lap(),
+        result=lambda: ratios.model_dump(mode="json")
+    )
+    
+    trends = financial_analyzer.detect_trends(extracted_data)
+    report(
+        progress, "trends", done=2, total=total, duration_ms=timer.lap(),
+        result=lambda: trends.model_dump(mode="json")
+    )
+    
+    anomalies = financial_analyzer.find_anomalies(extracted_data)
+    report(
+        progress, "anomalies", done=3, total=total, duration_ms=timer.lap(),
+        result=lambda: [anomaly.model_dump(mode="json") for anomaly in anomalies]
+    )
+    
+    insights = services["ai_insights"].generate_insights(extracted_data, ratios, trends)
+    report(
+        progress, "insights", done=4, total=total, duration_ms=timer.lap(),
+        result=lambda: [insight.model_dump(mode="json") for insight in insights]
+    )
+    
+    charts = financial_analyzer.generate_chart_data(extracted_data, ratios)
+    report(
+        progress, "charts", done=5, total=total, duration_ms=timer.lap(),
+        result=lambda: [chart.model_dump(mode="json") for chart in charts]
+    )
+    
+    # Every part was built here from trusted data, so the response skips re-validation;
+    # parsed tables stay as arrays until serialization.dumps() encodes them
+    return AnalysisResponse.model_construct(
+        success=True,
+        financial_data=extracted_data,
+        ratios=ratios,
+        trends=trends,
+        anomalies=anomalies,
+        ai_insights=insights,
+        visualizations=charts
+    )
+
+
+def run_analysis(
+    file_path: str,
+    file_type: str,
+    progress: Optional[ProgressCallback] = None
+) -> AnalysisResponse:
+    """Complete pipeline in a single task so parsed data never crosses processes"""
+    return analyze_document(parse_document(file_path, file_type, progress), progress)
@@ -0,0 +1,151 @@
+"""
+Pipeline Executor - Process pool for CPU-bound parsing and analysis
+Keeps the event loop free for I/O while parsing scales across cores
+"""
+
+import asyncio
+import functools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+
+def cores_per_parser() -> int:
+    """
+    The cores left to each process that parses documents
+    Every pipeline worker (or every forked server worker analysing in-process)
+    starts its own page and OCR pools, so they split the cores between them
+    rather than each taking all of them.
+    """
+    cores = os.cpu_count() or 1
+    server_workers = max(1, int(os.getenv("SERVER_WORKERS", 1)))
+    default_pipeline_workers = 0 if server_workers > 1 else cores
+    pipeline_workers = int(os.getenv("PIPELINE_WORKERS", default_pipeline_workers))
+    owners = server_workers * max(1, pipeline_workers)
+    return max(1, cores // owners)
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """Raised when the executor already has its maximum of pending tasks"""
+    
+    def __init__(self, max_pending: int):
+        self.max_pending = max_pending
+        super().__init__(f"Analysis queue is full ({max_pending} tasks pending)")
+
+
+class PipelineExecutor:
+    """
+    Bounded process pool for pipeline stages
+    Tasks beyond max_pending are rejected immediately rather than queued,
+    so overload shows up as fast 503s instead of ever-growing latency.
+    With max_workers=0 tasks run on the event loop's default thread pool,
+    which is useful for development and tests.
+    """
+    
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        start_method: Optional[str] = None,
+        initializer: Optional[Callable[[], Any]] = None
+    ):
+        if max_workers is None:
+            max_workers = int(os.getenv("PIPELINE_WORKERS", os.cpu_count() or 1))
+        self.max_workers = max_workers
+        self.max_pending = max_pending or int(
+            os.getenv("PIPELINE_MAX_PENDING", max(self.max_workers, 1) * 4)
+        )
+        self.start_method = start_method or os.getenv("PIPELINE_START_METHOD", "spawn")
+        self.initializer = initializer
+        
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._counters = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "pool_restarts": 0
+        }
+        self._busy_seconds = 0.0
+        self._max_task_seconds = 0.0
+    
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        """Start the worker processes on first use"""
+        
+        if self.max_workers <= 0:
+            return None
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=self.initializer
+            )
+        return self._pool
+    
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run fn(*args) in a worker process and await its result"""
+        
+        if self._pending >= self.max_pending:
+            self._counters["rejected"] += 1
+            raise ExecutorSaturatedError(self.max_pending)
+        
+        self._pending += 1
+        self._counters["submitted"] += 1
+        start = time.perf_counter()
+        
+        try:
+            loop = asyncio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(self._get_pool(), functools.partial(fn, *args))
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed mid-parse); replace the pool
+                self._reset_pool()
+                raise
+        except Exception:
+            self._counters["failed"] += 1
+            raise
+        else:
+            self._counters["completed"] += 1
+            return result
+        finally:
+            self._pending -= 1
+            elapsed = time.perf_counter() - start
+            self._busy_seconds += elapsed
+            self._max_task_seconds = max(self._max_task_seconds, elapsed)
+    
+    def _reset_pool(self):
+        """Discard a broken pool so the next task starts a fresh one"""
+        
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._counters["pool_restarts"] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Pool metrics for monitoring"""
+        
+        finished = self._counters["completed"] + self._counters["failed"]
+        running = min(self._pending, max(self.max_workers, 1))
+        
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pool_started": self._pool is not None,
+            "pending": self._pending,
+            "running": running,
+            "queued": self._pending - running,
+            **self._counters,
+            "avg_task_seconds": round(self._busy_seconds / finished, 4) if finished else 0.0,
+            "max_task_seconds": round(self._max_task_seconds, 4)
+        }
+    
+    def shutdown(self):
+        """Stop the worker processes"""
+        
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,158 @@
+"""
+Prefork Server - Multi-worker launcher that shares preloaded data
+The master imports the app and loads parsers, patterns and benchmark
+tables once, freezes them out of the garbage collector, then forks
+workers that serve one listening socket and share those pages copy-on-write
+"""
+
+import gc
+import os
+import signal
+import socket
+import time
+from typing import Any, Dict, Optional
+
+import uvicorn
+
+
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", 1))
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", 8000))
+SERVER_BACKLOG = 2048
+
+# A worker that dies sooner than this after starting is respawned only after a pause
+RESPAWN_MIN_UPTIME_SECONDS = 5.0
+
+
+def preload():
+    """
+    Load everything workers would otherwise build for themselves
+    Parser libraries, the pipeline services (compiled extraction patterns,
+    benchmark tables, the label index) and the report backends and styles.
+    """
+    
+    from app.services import pipeline
+    from app.services.file_processor import FORMAT_DEPENDENCIES
+    from app.services.financial_calculator import FinancialCalculator
+    from app.services.report_generator import ReportGenerator
+    
+    # Every format, not just PIPELINE_PRELOAD_FORMATS: loaded once here it costs each worker nothing
+    pipeline.warm_up()
+    pipeline._get_services()["file_processor"].preload(FORMAT_DEPENDENCIES)
+    FinancialCalculator()
+    ReportGenerator.preload()
+
+
+def process_memory() -> Optional[Dict[str, float]]:
+    """
+    This process's memory in MB, split into shared and private pages
+    PSS charges shared pages fractionally to each process that maps them,
+    so summing it across workers gives the node's real footprint. Linux only.
+    """
+    
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line and not line.startswith(" "))
+    except OSError:
+        return None
+    
+    def mb(name: str) -> float:
+        return round(int(fields.get(name, "0 kB").split()[0]) / 1024, 1)
+    
+    return {
+        "rss_mb": mb("Rss"),
+        "pss_mb": mb("Pss"),
+        "shared_mb": round(mb("Shared_Clean") + mb("Shared_Dirty"), 1),
+        "private_mb": round(mb("Private_Clean") + mb("Private_Dirty"), 1)
+    }
+
+
+class PreforkServer:
+    """
+    Forks uvicorn workers from a master that has already loaded the app
+    Workers that exit unexpectedly are replaced; SIGTERM or SIGINT stops
+    them all gracefully. Each worker runs the app's startup and shutdown
+    events itself, so per-process resources are created after the fork.
+    """
+    
+    def __init__(
+        self,
+        app: Any,
+        workers: Optional[int] = None,
+        host: Optional[str] = None,
+        port: Optional[int] = None
+    ):
+        self.app = app
+        self.workers = workers or SERVER_WORKERS
+        self.host = host or SERVER_HOST
+        self.port = port or SERVER_PORT
+        
+        self._children: Dict[int, float] = {}
+        self._stopping = False
+        self._socket: Optional[socket.socket] = None
+    
+    def run(self):
+        """Preload, fork the workers and supervise them until told to stop"""
+        
+        preload()
+        self._socket = socket.create_server((self.host, self.port), backlog=SERVER_BACKLOG, reuse_port=False)
+        self._socket.set_inheritable(True)
+        
+        # Everything loaded so far is shared with the workers; moving it to the permanent
+        # generation keeps their collections from writing to (and so copying) those pages
+        gc.collect()
+        gc.freeze()
+        
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        
+        for _ in range(self.workers):
+            self._spawn()
+        try:
+            self._supervise()
+        finally:
+            self._socket.close()
+    
+    def _spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker()
+        self._children[pid] = time.monotonic()
+    
+    def _run_worker(self):
+        """Worker process body; never returns"""
+        
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        code = 0
+        try:
+            config = uvicorn.Config(self.app, host=self.host, port=self.port, lifespan="on")
+            uvicorn.Server(config).run(sockets=[self._socket])
+        except BaseException:
+            code = 1
+        finally:
+            os._exit(code)
+    
+    def _supervise(self):
+        while self._children:
+            try:
+                pid, _ = os.wait()
+            except ChildProcessError:
+                break
+            started = self._children.pop(pid, None)
+            if self._stopping or started is None:
+                continue
+            
+            # Back off when a worker crashes at start-up so a bad deploy does not spin
+            if time.monotonic() - started < RESPAWN_MIN_UPTIME_SECONDS:
+                time.sleep(RESPAWN_MIN_UPTIME_SECONDS)
+            if not self._stopping:
+                self._spawn()
+    
+    def _stop(self, signum, frame):
+        self._stopping = True
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
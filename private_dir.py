@@ -0,0 +1,25 @@
+"""
+Private Dir - On-disk state directories only this user can reach
+Caches, stored documents and queued jobs default to paths under the
+shared /tmp, where another local user could create them first
+"""
+
+import os
+import stat
+
+
+def make_private_dir(path: str) -> str:
+    """
+    Create a directory as owner-only (0700), or check an existing one
+    A directory another user owns is refused with PermissionError, since
+    whatever is read back from it could have been planted; one of ours
+    that others can reach is tightened to 0700.
+    """
+    
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise PermissionError(f"Directory is not owned by this user: {path}")
+    if info.st_mode & 0o077:
+        os.chmod(path, 0o700)
+    return path
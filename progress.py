@@ -0,0 +1,39 @@
+"""
+Progress - Stage events reported while a document moves through the pipeline
+A callback receives an event name and a small JSON-safe payload; stages
+that report a count include "done" and "total"
+"""
+
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+ProgressCallback = Callable[[str, Dict[str, Any]], None]
+
+
+def report(progress: Optional[ProgressCallback], event: str, **data: Any):
+    """
+    Send an event to the callback, if there is one
+    Costly values can be passed as zero-argument callables; they are only
+    called when someone is listening.
+    """
+    
+    if progress is None:
+        return
+    try:
+        progress(event, {key: value() if callable(value) else value for key, value in data.items()})
+    except Exception:
+        # Progress is best-effort; it must never fail the analysis it describes
+        pass
+
+
+class StageTimer:
+    """Milliseconds spent in the current stage, restarted by each lap"""
+    
+    def __init__(self):
+        self._start = time.perf_counter()
+    
+    def lap(self) -> float:
+        now = time.perf_counter()
+        elapsed, self._start = now - self._start, now
+        return round(elapsed * 1000, 1)
@@ -0,0 +1,105 @@
+"""
+Ratio Engine - Every ratio for a whole portfolio in one pass
+Statements for N companies x M periods are stacked into one array and the
+FinancialAnalyzer formulas run over it with broadcasting, so each ratio
+costs a handful of array operations however many companies there are
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.models.schemas import FinancialRatios
+from app.services.financial_analyzer import FinancialAnalyzer
+from app.services.statement_store import StatementPanel
+
+
+class RatioMatrix:
+    """
+    Ratios x companies x periods, aligned like the panel they came from
+    `names` lists (category, ratio) for each row of `values`. Cells before
+    a company's first period are NaN.
+    """
+    
+    __slots__ = ("names", "values", "period_counts", "periods", "_index")
+    
+    def __init__(
+        self,
+        names: Sequence[Tuple[str, str]],
+        values: np.ndarray,
+        period_counts: np.ndarray,
+        periods: Optional[List[List[str]]] = None
+    ):
+        self.names = tuple(names)
+        self.values = values
+        self.period_counts = period_counts
+        self.periods = periods
+        self._index = {name: i for i, name in enumerate(self.names)}
+    
+    def __repr__(self) -> str:
+        return f"RatioMatrix(ratios={len(self.names)}, companies={self.n_companies}, periods={self.n_periods})"
+    
+    @property
+    def n_companies(self) -> int:
+        return self.values.shape[1]
+    
+    @property
+    def n_periods(self) -> int:
+        return self.values.shape[2]
+    
+    def ratio(self, category: str, name: str) -> np.ndarray:
+        """One ratio for every company and period (a view)"""
+        return self.values[self._index[(category, name)]]
+    
+    def latest(self) -> np.ndarray:
+        """Ratios x companies for each company's latest period (a view)"""
+        return self.values[:, :, -1]
+    
+    def to_ratios(self, company: int) -> FinancialRatios:
+        """One company's ratios, as FinancialAnalyzer.calculate_all_ratios returns them"""
+        
+        count = int(self.period_counts[company])
+        series = self.values[:, company, self.n_periods - count:].tolist()
+        
+        latest: Dict[str, Dict[str, float]] = {}
+        history: Dict[str, Dict[str, List[Optional[float]]]] = {}
+        for (category, name), values in zip(self.names, series):
+            latest.setdefault(category, {})[name] = values[-1]
+            if count > 1:
+                history.setdefault(category, {})[name] = [None if v != v else v for v in values]
+        
+        periods = self.periods[company] if self.periods is not None else [f"period_{i + 1}" for i in range(count)]
+        return FinancialRatios.model_construct(
+            **latest, periods=list(periods), history=history if count > 1 else None
+        )
+
+
+class RatioEngine:
+    """
+    Computes ratio matrices from stacked statements
+    The formulas are FinancialAnalyzer's own, so each company's figures are
+    exactly those calculate_all_ratios gives it on its own.
+    """
+    
+    def __init__(self, analyzer: Optional[FinancialAnalyzer] = None):
+        self.analyzer = analyzer or FinancialAnalyzer()
+    
+    def calculate(self, panel: StatementPanel, fields: Optional[str] = None) -> RatioMatrix:
+        """Every ratio, or the selected ones, for every company in the panel"""
+        
+        categories = self.analyzer.ratio_arrays(panel, fields)
+        names = [(category, name) for category, ratios in categories.items() for name in ratios]
+        
+        values = np.empty((len(names), *panel.shape))
+        for i, (category, name) in enumerate(names):
+            values[i] = categories[category][name]
+        values[:, panel.padding] = np.nan
+        
+        return RatioMatrix(names, values, panel.period_counts, panel.periods)
+    
+    def calculate_all(self, documents: Sequence[Dict[str, Any]], fields: Optional[str] = None) -> List[FinancialRatios]:
+        """calculate_all_ratios for many parsed documents at once"""
+        
+        panel = StatementPanel.from_stores([self.analyzer.statement_store(data) for data in documents])
+        matrix = self.calculate(panel, fields)
+        return [matrix.to_ratios(i) for i in range(matrix.n_companies)]
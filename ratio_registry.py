@@ -0,0 +1,231 @@
+"""
+Ratio Registry - Financial ratios declared once as a dependency graph
+Each ratio names its inputs (line items, constants or other ratios) and a
+formula; evaluating a selection computes only what it needs, once each
+"""
+
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Mapping, NamedTuple, Optional, Set, Tuple, Union
+
+import numpy as np
+
+from app.services.statement_store import LINE_ITEM_INDEX
+
+
+class Item(NamedTuple):
+    """A line item; missing figures read as `default`, or skip the ratio when that is None"""
+    key: str
+    default: Optional[float] = None
+
+
+class Growth(NamedTuple):
+    """Period-over-period growth of a line item, or `assumed` with only one period"""
+    key: str
+    assumed: float
+
+
+class Fill(NamedTuple):
+    """A series holding one value in every period, e.g. a placeholder"""
+    value: float
+
+
+Input = Union[str, float, Item, Growth, Fill]
+
+
+class Ratio(NamedTuple):
+    """
+    One node of the graph: formula(*inputs)
+    Nodes without a category are intermediates, computed when a reported
+    ratio needs them but not reported themselves. A node is skipped (None)
+    when an input is, or when one is zero and `nonzero` is set; it is zero,
+    without evaluating anything else, when its `zero_if` input is all zeros.
+    """
+    name: str
+    formula: Callable[..., Any]
+    inputs: Tuple[Input, ...]
+    category: Optional[str] = None
+    nonzero: bool = False
+    zero_if: Optional[int] = None
+
+
+def divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Element-wise division that yields 0 where the denominator is 0"""
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    shape = numerator.shape if numerator.shape == denominator.shape else np.broadcast_shapes(numerator.shape, denominator.shape)
+    nonzero = denominator != 0
+    if nonzero.all():
+        # A masked divide costs several times a plain one, so it is kept for denominators with zeros
+        return np.divide(numerator, denominator, out=np.empty(shape))
+    return np.divide(numerator, denominator, out=np.zeros(shape), where=nonzero)
+
+
+def ratio(name: str, numerator: Input, denominator: Input, category: Optional[str] = None) -> Ratio:
+    """numerator / denominator, zero where the denominator is, so a zero denominator needs no numerator"""
+    return Ratio(name, divide, (numerator, denominator), category, zero_if=1)
+
+
+def same(value: Any) -> Any:
+    return value
+
+
+class RatioRegistry:
+    """
+    Ratios by name, checked once for unknown inputs and cycles
+    Sources are StatementStores or StatementPanels (every ratio an array
+    shaped like their series) or plain mappings of line item to figure,
+    which may name items beyond the statement line items.
+    """
+    
+    def __init__(self, ratios: Iterable[Ratio], items: Iterable[str] = LINE_ITEM_INDEX):
+        self.items = frozenset(items)
+        self.ratios: Dict[str, Ratio] = {}
+        self.categories: Dict[str, List[str]] = {}
+        for node in ratios:
+            if node.name in self.ratios:
+                raise ValueError(f"Ratio declared twice: {node.name}")
+            self.ratios[node.name] = node
+            if node.category is not None:
+                self.categories.setdefault(node.category, []).append(node.name)
+        
+        self._check_graph()
+        self._reads: Dict[str, FrozenSet[str]] = {}
+        for name in self.ratios:
+            self._line_items(name)
+    
+    def _check_graph(self):
+        done: Set[str] = set()
+        
+        def visit(name: str, path: Tuple[str, ...]):
+            if name in path:
+                raise ValueError(f"Ratio cycle: {' -> '.join(path + (name,))}")
+            if name in done:
+                return
+            for ref in self.ratios[name].inputs:
+                if isinstance(ref, str):
+                    if ref not in self.ratios:
+                        raise ValueError(f"Ratio {name} needs unknown ratio {ref}")
+                    visit(ref, path + (name,))
+                elif isinstance(ref, (Item, Growth)) and ref.key not in self.items:
+                    raise ValueError(f"Ratio {name} needs unknown line item {ref.key}")
+            done.add(name)
+        
+        for name in self.ratios:
+            visit(name, ())
+    
+    def _line_items(self, name: str) -> FrozenSet[str]:
+        """Line items a ratio reads, directly or through the ratios it needs"""
+        
+        if name not in self._reads:
+            reads: Set[str] = set()
+            for ref in self.ratios[name].inputs:
+                if isinstance(ref, str):
+                    reads |= self._line_items(ref)
+                elif isinstance(ref, (Item, Growth)):
+                    reads.add(ref.key)
+            self._reads[name] = frozenset(reads)
+        return self._reads[name]
+    
+    def dependents(self, items: Iterable[str]) -> List[str]:
+        """Reported ratios, as "category.name" fields, that read any of the line items"""
+        
+        items = set(items)
+        return [
+            f"{category}.{name}"
+            for category, names in self.categories.items()
+            for name in names
+            if not self._reads[name].isdisjoint(items)
+        ]
+    
+    def select(self, fields: Union[None, str, Iterable[str]] = None) -> Dict[str, List[str]]:
+        """
+        Reported ratios by category for fields such as "liquidity,profitability.roe"
+        A category selects all of its ratios; None selects everything.
+        """
+        
+        if fields is None:
+            return {category: list(names) for category, names in self.categories.items()}
+        if isinstance(fields, str):
+            fields = fields.split(",")
+        
+        wanted: Set[str] = set()
+        for field in (field.strip() for field in fields):
+            if not field:
+                continue
+            category, _, name = field.partition(".")
+            names = self.categories.get(category)
+            if names is None or (name and name not in names):
+                raise ValueError(f"Unknown ratio: {field}")
+            wanted.update([name] if name else names)
+        
+        # Declaration order, whatever order the fields came in
+        selected = {category: [name for name in names if name in wanted] for category, names in self.categories.items()}
+        return {category: names for category, names in selected.items() if names}
+    
+    def evaluate(self, source: Any, fields: Union[None, str, Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Selected ratios by category; each intermediate is computed at most once"""
+        
+        evaluation = _Evaluation(self, source)
+        return {
+            category: {name: evaluation.value(name) for name in names}
+            for category, names in self.select(fields).items()
+        }
+
+
+class _Evaluation:
+    """Values computed so far for one source"""
+    
+    def __init__(self, registry: RatioRegistry, source: Any):
+        self.registry = registry
+        self.source = source
+        self.values: Dict[Tuple[type, Input], Any] = {}
+    
+    def value(self, ref: Input) -> Any:
+        # Keyed by type too: NamedTuples compare as tuples, so Item("revenue", 0.1) == Growth("revenue", 0.1)
+        key = (type(ref), ref)
+        if key not in self.values:
+            self.values[key] = self._compute(ref)
+        return self.values[key]
+    
+    def _compute(self, ref: Input) -> Any:
+        if isinstance(ref, str):
+            return self._formula(self.registry.ratios[ref])
+        if isinstance(ref, Item):
+            return self._item(ref)
+        if isinstance(ref, Growth):
+            return self._growth(ref)
+        if isinstance(ref, Fill):
+            return ref.value if isinstance(self.source, Mapping) else np.full(self.source.shape, ref.value)
+        return ref
+    
+    def _formula(self, node: Ratio) -> Any:
+        if node.zero_if is not None:
+            guard = self.value(node.inputs[node.zero_if])
+            if isinstance(guard, np.ndarray):
+                if not guard.any():
+                    return np.zeros(guard.shape)
+            elif guard == 0:
+                return 0.0
+        
+        args = []
+        for ref in node.inputs:
+            value = self.value(ref)
+            if value is None or (node.nonzero and not np.all(value)):
+                return None
+            args.append(value)
+        return node.formula(*args)
+    
+    def _item(self, ref: Item) -> Any:
+        if isinstance(self.source, Mapping):
+            value = self.source.get(ref.key)
+            return ref.default if value is None else value
+        if ref.default is None and ref.key not in self.source:
+            return None
+        return self.source.series(ref.key, np.nan if ref.default is None else ref.default)
+    
+    def _growth(self, ref: Growth) -> Any:
+        if isinstance(self.source, Mapping):
+            return None
+        growth = self.source.growth(ref.key)
+        # A missing latest figure reads as no growth rather than NaN
+        growth[..., -1] = np.where(np.isnan(growth[..., -1]), 0.0, growth[..., -1])
+        return np.where(self.source.single_period, ref.assumed, growth)
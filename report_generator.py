@@ -3,52 +3,74 @@ Report Generator - PDF and Excel report creation
 Generates branded, professional financial analysis reports
 """
 
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
-import pandas as pd
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Tuple
 import os
 
+from app.services.lazy_imports import LazyModule, lazy_module, load_all
 
-class ReportGenerator:
-    """
-    Generate professional PDF and Excel reports
-    Cosmic-themed branding with comprehensive analysis
-    """
-    
-    def __init__(self):
-        self.output_dir = "/tmp/cosmic_reports"
-        os.makedirs(self.output_dir, exist_ok=True)
-        self.styles = getSampleStyleSheet()
-        self._setup_custom_styles()
+# Report libraries, imported the first time a report in their format is generated
+colors = lazy_module("reportlab.lib.colors")
+pagesizes = lazy_module("reportlab.lib.pagesizes")
+platypus = lazy_module("reportlab.platypus")
+rl_styles = lazy_module("reportlab.lib.styles")
+units = lazy_module("reportlab.lib.units")
+enums = lazy_module("reportlab.lib.enums")
+pd = lazy_module("pandas")
+
+# Generator method and libraries behind each report format
+REPORT_BACKENDS: Dict[str, Tuple[str, Tuple[LazyModule, ...]]] = {
+    "pdf": ("_generate_pdf", (colors, pagesizes, platypus, rl_styles, units, enums)),
+    "excel": ("_generate_excel", (pd, lazy_module("openpyxl")))
+}
+
+
+_styles = None
+
+
+def pdf_styles():
+    """Paragraph styles for PDF reports, built once per process on first use"""
     
-    def _setup_custom_styles(self):
-        """Setup custom paragraph styles for cosmic theme"""
+    global _styles
+    if _styles is None:
+        styles = rl_styles.getSampleStyleSheet()
         
         # Title style
-        self.styles.add(ParagraphStyle(
+        styles.add(rl_styles.ParagraphStyle(
             name='CosmicTitle',
-            parent=self.styles['Heading1'],
+            parent=styles['Heading1'],
             fontSize=24,
             textColor=colors.HexColor('#8B5CF6'),
             spaceAfter=30,
-            alignment=TA_CENTER
+            alignment=enums.TA_CENTER
         ))
         
         # Section header style
-        self.styles.add(ParagraphStyle(
+        styles.add(rl_styles.ParagraphStyle(
             name='CosmicSection',
-            parent=self.styles['Heading2'],
+            parent=styles['Heading2'],
             fontSize=16,
             textColor=colors.HexColor('#6366F1'),
             spaceBefore=20,
             spaceAfter=12
         ))
+        _styles = styles
+    return _styles
+
+
+class ReportGenerator:
+    """
+    Generate professional PDF and Excel reports
+    Cosmic-themed branding with comprehensive analysis
+    """
+    
+    def __init__(self):
+        self.output_dir = "/tmp/cosmic_reports"
+        os.makedirs(self.output_dir, exist_ok=True)
+    
+    @property
+    def styles(self):
+        return pdf_styles()
     
     def generate_report(
         self,
@@ -59,12 +81,19 @@ class ReportGenerator:
     ) -> str:
         """Generate report in specified format"""
         
-        if format == "pdf":
-            return self._generate_pdf(analysis_id, data, insights)
-        elif format == "excel":
-            return self._generate_excel(analysis_id, data, insights)
-        else:
+        if format not in REPORT_BACKENDS:
             raise ValueError(f"Unsupported format: {format}")
+        method, _ = REPORT_BACKENDS[format]
+        return getattr(self, method)(analysis_id, data, insights)
+    
+    @staticmethod
+    def preload(formats: Iterable[str] = tuple(REPORT_BACKENDS)):
+        """Import the libraries behind these report formats, and build the PDF styles, ahead of first use"""
+        formats = list(formats)
+        for format in formats:
+            load_all(REPORT_BACKENDS[format][1])
+        if "pdf" in formats:
+            pdf_styles()
     
     def _generate_pdf(
         self,
@@ -77,37 +106,37 @@ class ReportGenerator:
         filename = f"financial_analysis_{analysis_id}.pdf"
         filepath = os.path.join(self.output_dir, filename)
         
-        doc = SimpleDocTemplate(filepath, pagesize=letter)
+        doc = platypus.SimpleDocTemplate(filepath, pagesize=pagesizes.letter)
         story = []
         
         # Title
-        title = Paragraph(
+        title = platypus.Paragraph(
             "Cosmic Finance Analyzer",
             self.styles['CosmicTitle']
         )
         story.append(title)
-        story.append(Spacer(1, 0.2 * inch))
+        story.append(platypus.Spacer(1, 0.2 * units.inch))
         
         # Subtitle
-        subtitle = Paragraph(
+        subtitle = platypus.Paragraph(
             f"Financial Analysis Report - {datetime.now().strftime('%B %d, %Y')}",
             self.styles['Normal']
         )
         story.append(subtitle)
-        story.append(Spacer(1, 0.5 * inch))
+        story.append(platypus.Spacer(1, 0.5 * units.inch))
         
         # Executive Summary
-        story.append(Paragraph("Executive Summary", self.styles['CosmicSection']))
+        story.append(platypus.Paragraph("Executive Summary", self.styles['CosmicSection']))
         summary_text = insights.get('executive_summary', 'Analysis complete.')
-        story.append(Paragraph(summary_text, self.styles['Normal']))
-        story.append(Spacer(1, 0.3 * inch))
+        story.append(platypus.Paragraph(summary_text, self.styles['Normal']))
+        story.append(platypus.Spacer(1, 0.3 * units.inch))
         
         # Key Metrics Table
-        story.append(Paragraph("Key Financial Metrics", self.styles['CosmicSection']))
+        story.append(platypus.Paragraph("Key Financial Metrics", self.styles['CosmicSection']))
         metrics_data = self._prepare_metrics_table(data['metrics'])
         if metrics_data:
-            table = Table(metrics_data)
-            table.setStyle(TableStyle([
+            table = platypus.Table(metrics_data)
+            table.setStyle(platypus.TableStyle([
                 ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#8B5CF6')),
                 ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
                 ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
@@ -118,34 +147,34 @@ class ReportGenerator:
                 ('GRID', (0, 0), (-1, -1), 1, colors.grey)
             ]))
             story.append(table)
-        story.append(Spacer(1, 0.3 * inch))
+        story.append(platypus.Spacer(1, 0.3 * units.inch))
         
         # Strengths
-        story.append(Paragraph("Key Strengths", self.styles['CosmicSection']))
+        story.append(platypus.Paragraph("Key Strengths", self.styles['CosmicSection']))
         for strength in insights.get('strengths', []):
-            story.append(Paragraph(f"• {strength}", self.styles['Normal']))
-        story.append(Spacer(1, 0.2 * inch))
+            story.append(platypus.Paragraph(f"• {strength}", self.styles['Normal']))
+        story.append(platypus.Spacer(1, 0.2 * units.inch))
         
         # Weaknesses
-        story.append(Paragraph("Areas for Improvement", self.styles['CosmicSection']))
+        story.append(platypus.Paragraph("Areas for Improvement", self.styles['CosmicSection']))
         for weakness in insights.get('weaknesses', []):
-            story.append(Paragraph(f"• {weakness}", self.styles['Normal']))
-        story.append(Spacer(1, 0.2 * inch))
+            story.append(platypus.Paragraph(f"• {weakness}", self.styles['Normal']))
+        story.append(platypus.Spacer(1, 0.2 * units.inch))
         
         # Recommendations
-        story.append(PageBreak())
-        story.append(Paragraph("Strategic Recommendations", self.styles['CosmicSection']))
+        story.append(platypus.PageBreak())
+        story.append(platypus.Paragraph("Strategic Recommendations", self.styles['CosmicSection']))
         for rec in insights.get('recommendations', []):
-            story.append(Paragraph(
+            story.append(platypus.Paragraph(
                 f"<b>{rec['priority']} Priority - {rec['category']}</b>",
                 self.styles['Normal']
             ))
-            story.append(Paragraph(rec['recommendation'], self.styles['Normal']))
-            story.append(Paragraph(
+            story.append(platypus.Paragraph(rec['recommendation'], self.styles['Normal']))
+            story.append(platypus.Paragraph(
                 f"<i>Expected Impact: {rec['expected_impact']}</i>",
                 self.styles['Normal']
             ))
-            story.append(Spacer(1, 0.15 * inch))
+            story.append(platypus.Spacer(1, 0.15 * units.inch))
         
         # Build PDF
         doc.build(story)
@@ -0,0 +1,213 @@
+"""
+Response Encoder - Field projection and content negotiation for analyses
+Cached AnalysisResponse JSON is trimmed to the fields a client asked for,
+then sent as JSON or MessagePack, compressed when the client accepts it
+"""
+
+import gzip
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from fastapi.responses import Response
+
+from app.models.schemas import AnalysisResponse
+from app.services import serialization
+from app.services.result_cache import ResultCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# Left out unless asked for: the full document text and every parsed row, which the dashboard never shows
+DEFAULT_EXCLUDE = os.getenv("RESPONSE_DEFAULT_EXCLUDE", "financial_data.raw,financial_data.data_table")
+# Smaller bodies are sent uncompressed; compressing them costs more than it saves
+RESPONSE_COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+_MSGPACK_ACCEPT = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+
+
+class Projection:
+    """
+    Dotted field paths to keep and to drop, e.g. "ratios,financial_data.balance_sheet"
+    Paths are parsed into trees once; "success" is always kept.
+    """
+    
+    __slots__ = ("include", "exclude", "signature")
+    
+    def __init__(self, include: Iterable[str] = (), exclude: Iterable[str] = ()):
+        self.include = _path_tree(include)
+        self.exclude = _path_tree(exclude)
+        self.signature = f"include={','.join(sorted(include))};exclude={','.join(sorted(exclude))}"
+    
+    @property
+    def is_identity(self) -> bool:
+        return not self.include and not self.exclude
+    
+    def apply(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        if self.include:
+            document = {"success": document.get("success"), **_keep(document, self.include)}
+        if self.exclude:
+            document = _drop(document, self.exclude)
+        return document
+
+
+class ResponseEncoder:
+    """
+    Serves encoded analyses in the shape and format each request asks for
+    Projected variants of a cached response are cached alongside it, so the
+    common default projection is only computed once per document.
+    """
+    
+    def __init__(
+        self,
+        cache: Optional[ResultCache] = None,
+        default_exclude: Optional[str] = None,
+        compress_min_bytes: Optional[int] = None
+    ):
+        self.cache = cache
+        self.default_exclude = _split(DEFAULT_EXCLUDE if default_exclude is None else default_exclude)
+        self.compress_min_bytes = (
+            compress_min_bytes if compress_min_bytes is not None else RESPONSE_COMPRESS_MIN_BYTES
+        )
+    
+    def projection(self, include: Optional[str] = None, exclude: Optional[str] = None) -> Projection:
+        """
+        Projection for the include=/exclude= query parameters
+        Without exclude= the default exclusions apply, except for fields that
+        are explicitly included; exclude= with no value sends everything.
+        """
+        
+        include_paths = _split(include)
+        if exclude is None:
+            exclude_paths = [
+                path for path in self.default_exclude
+                if not any(path == kept or path.startswith(kept + ".") for kept in include_paths)
+            ]
+        else:
+            exclude_paths = _split(exclude)
+        
+        for path in (*include_paths, *exclude_paths):
+            if path.split(".")[0] not in AnalysisResponse.model_fields:
+                raise ValueError(f"Unknown field: {path}")
+        return Projection(include_paths, exclude_paths)
+    
+    def project_json(self, body: bytes, projection: Projection, cache_key: Optional[str] = None) -> bytes:
+        """Projected JSON of an encoded AnalysisResponse, from the variant cache when possible"""
+        
+        if projection.is_identity:
+            return body
+        
+        variant_key = None
+        if self.cache is not None and cache_key is not None:
+            variant_key = self.cache.make_key(cache_key, "projection", projection.signature)
+            cached = self.cache.get(variant_key)
+            if cached is not None:
+                return cached
+        
+        projected = serialization.dumps(projection.apply(serialization.loads(body)))
+        if variant_key is not None:
+            self.cache.put(variant_key, projected)
+        return projected
+    
+    def respond(
+        self,
+        body: bytes,
+        projection: Projection,
+        accept: Optional[str] = None,
+        accept_encoding: Optional[str] = None,
+        cache_key: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Response:
+        """Project an encoded AnalysisResponse and negotiate its format and compression"""
+        
+        body = self.project_json(body, projection, cache_key)
+        media_type = JSON_MEDIA_TYPE
+        if msgpack is not None and _accepts(accept, _MSGPACK_ACCEPT):
+            body = msgpack.packb(serialization.loads(body), use_bin_type=True)
+            media_type = MSGPACK_MEDIA_TYPE
+        
+        headers = {**(headers or {}), "Vary": "Accept, Accept-Encoding"}
+        body, encoding = self.compress(body, accept_encoding)
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type=media_type, headers=headers)
+    
+    def compress(self, body: bytes, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+        """Brotli or gzip as the client accepts, for bodies worth compressing"""
+        
+        if len(body) < self.compress_min_bytes or not accept_encoding:
+            return body, None
+        if brotli is not None and _accepts(accept_encoding, ("br",)):
+            return brotli.compress(body, quality=BROTLI_QUALITY), "br"
+        if _accepts(accept_encoding, ("gzip",)):
+            return gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+        return body, None
+
+
+def _split(paths: Optional[str]) -> List[str]:
+    return [path.strip() for path in (paths or "").split(",") if path.strip()]
+
+
+def _path_tree(paths: Iterable[str]) -> Dict[str, Any]:
+    """{"a": {"b": True}} for ["a.b"]; True marks a whole subtree"""
+    
+    tree: Dict[str, Any] = {}
+    for path in paths:
+        node = tree
+        *parents, leaf = path.split(".")
+        for part in parents:
+            child = node.setdefault(part, {})
+            if child is True:
+                break
+            node = child
+        else:
+            node[leaf] = True
+    return tree
+
+
+def _keep(document: Any, tree: Dict[str, Any]) -> Any:
+    if not isinstance(document, dict):
+        return document
+    return {
+        key: document[key] if sub is True else _keep(document[key], sub)
+        for key, sub in tree.items() if key in document
+    }
+
+
+def _drop(document: Any, tree: Dict[str, Any]) -> Any:
+    if not isinstance(document, dict):
+        return document
+    result = dict(document)
+    for key, sub in tree.items():
+        if key not in result:
+            continue
+        if sub is True:
+            del result[key]
+        else:
+            result[key] = _drop(result[key], sub)
+    return result
+
+
+def _accepts(header: Optional[str], values: Tuple[str, ...]) -> bool:
+    """Whether an Accept or Accept-Encoding header lists any of the values without q=0"""
+    
+    for part in (header or "").lower().split(","):
+        value, _, params = part.partition(";")
+        if value.strip() in values:
+            q = params.strip()
+            try:
+                return float(q[2:]) > 0 if q.startswith("q=") else True
+            except ValueError:
+                return True
+    return False
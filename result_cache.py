@@ -0,0 +1,214 @@
+"""
+Result Cache - Content-addressed cache for pipeline output
+Size-bounded in-memory LRU in front of an on-disk tier shared by all workers
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.services.private_dir import make_private_dir
+
+
+DEFAULT_CACHE_DIR = "/tmp/cosmic_cache"
+DEFAULT_MEMORY_MB = 64
+DEFAULT_DISK_MB = 1024
+
+# How many disk writes between scans that enforce the disk size bound
+DISK_PRUNE_INTERVAL = 32
+
+
+class ResultCache:
+    """
+    Two-tier cache of encoded results keyed by content hash
+    Values are opaque bytes. The memory tier is private to the process;
+    the disk tier is written atomically so concurrent workers can share it.
+    """
+    
+    def __init__(
+        self,
+        namespace: str = "analysis",
+        max_memory_bytes: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        max_disk_bytes: Optional[int] = None
+    ):
+        self.namespace = namespace
+        self.max_memory_bytes = max_memory_bytes if max_memory_bytes is not None else int(
+            float(os.getenv("RESULT_CACHE_MEMORY_MB", DEFAULT_MEMORY_MB)) * 1024 * 1024
+        )
+        self.max_disk_bytes = max_disk_bytes if max_disk_bytes is not None else int(
+            float(os.getenv("RESULT_CACHE_DISK_MB", DEFAULT_DISK_MB)) * 1024 * 1024
+        )
+        
+        if cache_dir is None:
+            cache_dir = os.getenv("RESULT_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.cache_dir = os.path.join(cache_dir, namespace) if cache_dir else None
+        if self.cache_dir:
+            # Cached bytes go back to clients as they are, so nobody else may write here
+            make_private_dir(cache_dir)
+            make_private_dir(self.cache_dir)
+        
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._writes_since_prune = 0
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+            "disk_evictions": 0
+        }
+    
+    @staticmethod
+    def make_key(content_sha256: str, *parts: str) -> str:
+        """Cache key from a payload hash plus version/format tags"""
+        return hashlib.sha256(":".join((*parts, content_sha256)).encode()).hexdigest()
+    
+    def get(self, key: str) -> Optional[bytes]:
+        """Look up a key in memory, then on disk"""
+        
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return value
+        
+        value = self._read_disk(key)
+        
+        with self._lock:
+            if value is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["disk_hits"] += 1
+            self._store_memory(key, value)
+        return value
+    
+    def put(self, key: str, value: bytes):
+        """Store a value in both tiers"""
+        
+        with self._lock:
+            self._counters["writes"] += 1
+            self._store_memory(key, value)
+        
+        self._write_disk(key, value)
+    
+    def _store_memory(self, key: str, value: bytes):
+        """Insert into the LRU and evict until within the byte budget (lock held)"""
+        
+        if len(value) > self.max_memory_bytes:
+            return
+        
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        
+        self._memory[key] = value
+        self._memory_bytes += len(value)
+        
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self._counters["evictions"] += 1
+    
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key)
+    
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        if not self.cache_dir:
+            return None
+        
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = f.read()
+            # Refresh mtime so pruning drops the least recently used entries
+            os.utime(path)
+            return value
+        except OSError:
+            return None
+    
+    def _write_disk(self, key: str, value: bytes):
+        if not self.cache_dir or len(value) > self.max_disk_bytes:
+            return
+        
+        directory = os.path.dirname(self._disk_path(key))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        
+        # Write-then-rename so readers in other workers never see partial files
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(value)
+            os.replace(tmp_path, self._disk_path(key))
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+        
+        self._writes_since_prune += 1
+        if self._writes_since_prune >= DISK_PRUNE_INTERVAL:
+            self._writes_since_prune = 0
+            self.prune_disk()
+    
+    def prune_disk(self):
+        """Delete least recently used disk entries until under the size bound"""
+        
+        if not self.cache_dir:
+            return
+        
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.startswith(".tmp-"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self._counters["disk_evictions"] += 1
+    
+    def clear(self):
+        """Drop the memory tier (the shared disk tier is left in place)"""
+        
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters and tier sizes"""
+        
+        with self._lock:
+            lookups = self._counters["memory_hits"] + self._counters["disk_hits"] + self._counters["misses"]
+            hits = lookups - self._counters["misses"]
+            return {
+                "namespace": self.namespace,
+                "entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "max_memory_bytes": self.max_memory_bytes,
+                "disk_enabled": bool(self.cache_dir),
+                **self._counters,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+            }
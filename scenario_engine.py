@@ -0,0 +1,205 @@
+"""
+Scenario Engine - What-if analysis of a document analyzed earlier
+Line-item overrides go onto a copy of the document's statements and only
+the ratios, trends, anomalies, insight sections and charts that read a
+changed item are recomputed; everything else comes from the cached base
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from app.models.schemas import AIInsight, Anomaly, ChartData, FinancialRatios, ScenarioResponse, TrendAnalysis
+from app.services.ai_insights import AIInsightGenerator, INSIGHT_SECTIONS
+from app.services.financial_analyzer import ANOMALY_RATIOS, CHART_INPUTS, RATIOS, TREND_ITEMS, FinancialAnalyzer
+from app.services.statement_store import LINE_ITEM_INDEX, LINE_ITEM_KEYS, StatementStore
+
+
+DEFAULT_MAX_BASES = 64
+
+
+@dataclass
+class ScenarioBase:
+    """A document's statements and full analysis, the starting point of every scenario on it"""
+    
+    data: Dict[str, Any]
+    store: StatementStore
+    ratios: FinancialRatios
+    trends: TrendAnalysis
+    anomalies: List[Anomaly]
+    sections: Dict[str, List[AIInsight]]
+    charts: Dict[str, ChartData]
+
+
+class ScenarioEngine:
+    """
+    Reruns the parts of an analysis that line-item overrides reach
+    Each document's base analysis is built once and kept in a small LRU,
+    so a scenario costs the ratios it changes rather than a full pipeline
+    run. Overrides are independent: other line items keep their figures.
+    """
+    
+    def __init__(
+        self,
+        analyzer: Optional[FinancialAnalyzer] = None,
+        insight_generator: Optional[AIInsightGenerator] = None,
+        max_bases: Optional[int] = None
+    ):
+        self.analyzer = analyzer or FinancialAnalyzer()
+        self.insight_generator = insight_generator or AIInsightGenerator()
+        self.max_bases = max_bases or int(os.getenv("SCENARIO_MAX_BASES", DEFAULT_MAX_BASES))
+        
+        self._bases: "OrderedDict[str, ScenarioBase]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"runs": 0, "base_hits": 0, "base_misses": 0}
+    
+    def base(self, key: str, extracted_data: Dict[str, Any]) -> ScenarioBase:
+        """The full analysis of a document, built on first use and cached under key"""
+        
+        with self._lock:
+            base = self._bases.get(key)
+            if base is not None:
+                self._bases.move_to_end(key)
+                self._counters["base_hits"] += 1
+                return base
+            self._counters["base_misses"] += 1
+        
+        store = self.analyzer.statement_store(extracted_data)
+        data = {**extracted_data, "statements": store}
+        ratios = self.analyzer.calculate_all_ratios(data)
+        trends = self.analyzer.detect_trends(data)
+        base = ScenarioBase(
+            data=data,
+            store=store,
+            ratios=ratios,
+            trends=trends,
+            anomalies=self.analyzer.find_anomalies(data),
+            sections=self.insight_generator.generate_sections(ratios, trends),
+            charts={chart.title: chart for chart in self.analyzer.generate_chart_data(data, ratios)}
+        )
+        
+        with self._lock:
+            self._bases[key] = base
+            while len(self._bases) > self.max_bases:
+                self._bases.popitem(last=False)
+        return base
+    
+    def run(
+        self,
+        key: str,
+        extracted_data: Dict[str, Any],
+        changes: Optional[Mapping[str, float]] = None,
+        values: Optional[Mapping[str, float]] = None,
+        period: Optional[str] = None
+    ) -> ScenarioResponse:
+        """
+        The analysis with line items changed in one period (the latest by default)
+        changes scales figures (0.1 is +10%) and values replaces them, after
+        changes. Raises ValueError for unknown line items or periods.
+        """
+        
+        base = self.base(key, extracted_data)
+        store, column = self._apply(base.store, changes or {}, values or {}, period)
+        touched = {*(changes or {}), *(values or {})}
+        items = [
+            item for item in LINE_ITEM_KEYS
+            if item in touched and not np.array_equal(store.row(item), base.store.row(item), equal_nan=True)
+        ]
+        fields = RATIOS.dependents(items)
+        data = {**base.data, "statements": store}
+        
+        ratios = self._merge(base.ratios, self.analyzer.calculate_all_ratios(data, fields)) if fields else base.ratios
+        
+        trends = base.trends
+        if not set(TREND_ITEMS).isdisjoint(items):
+            trends = self.analyzer.detect_trends(data)
+        
+        anomalies = base.anomalies
+        if not set(ANOMALY_RATIOS).isdisjoint(fields):
+            anomalies = self.analyzer.find_anomalies(data)
+        
+        categories = {field.partition(".")[0] for field in fields}
+        sections = [section for section, reads in INSIGHT_SECTIONS.items() if not categories.isdisjoint(reads)]
+        insights = {**base.sections, **self.insight_generator.generate_sections(ratios, trends, sections)}
+        
+        inputs = {*fields, *items}
+        titles = [title for title, reads in CHART_INPUTS.items() if not inputs.isdisjoint(reads)]
+        charts = dict(base.charts)
+        for chart in self.analyzer.generate_chart_data(data, ratios, titles):
+            charts[chart.title] = chart
+        
+        deltas: Dict[str, Dict[str, float]] = {}
+        for field in fields:
+            category, _, name = field.partition(".")
+            deltas.setdefault(category, {})[name] = getattr(ratios, category)[name] - getattr(base.ratios, category)[name]
+        
+        with self._lock:
+            self._counters["runs"] += 1
+        
+        return ScenarioResponse.model_construct(
+            success=True,
+            period=store.periods[column],
+            changed={
+                "line_items": items,
+                "ratios": fields,
+                "trends": trends is not base.trends,
+                "anomalies": anomalies is not base.anomalies,
+                "insights": sections,
+                "charts": titles
+            },
+            deltas=deltas,
+            ratios=ratios,
+            trends=trends,
+            anomalies=anomalies,
+            ai_insights=self.insight_generator.merge_sections(insights),
+            visualizations=list(charts.values())
+        )
+    
+    @staticmethod
+    def _merge(base: FinancialRatios, updated: FinancialRatios) -> FinancialRatios:
+        """The base ratios with the recomputed ones in their place"""
+        
+        categories = {
+            category: {**getattr(base, category), **getattr(updated, category)} if category in updated.model_fields_set
+            else getattr(base, category)
+            for category in RATIOS.categories
+        }
+        history = base.history
+        if history is not None:
+            history = {category: {**values, **updated.history.get(category, {})} for category, values in history.items()}
+        return FinancialRatios.model_construct(**categories, periods=base.periods, history=history)
+    
+    @staticmethod
+    def _apply(
+        base: StatementStore,
+        changes: Mapping[str, float],
+        values: Mapping[str, float],
+        period: Optional[str]
+    ) -> Tuple[StatementStore, int]:
+        """A copy of the statements with the overrides applied, and the period column they went in"""
+        
+        for item in (*changes, *values):
+            if item not in LINE_ITEM_INDEX:
+                raise ValueError(f"Unknown line item: {item}")
+        if period is None:
+            column = base.n_periods - 1
+        elif period in base.periods:
+            column = base.periods.index(period)
+        else:
+            raise ValueError(f"Unknown period: {period}")
+        
+        store = base.copy()
+        for item, change in changes.items():
+            # Scaling a figure that was never reported leaves it unreported
+            store.set(item, column, store.values[LINE_ITEM_INDEX[item], column] * (1 + change))
+        for item, value in values.items():
+            store.set(item, column, value)
+        return store, column
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._counters, "bases": len(self._bases), "max_bases": self.max_bases}
@@ -7,6 +7,8 @@ class FileUploadResponse(BaseModel):
     file_type: str
     data_preview: Dict[str, Any]
     message: str
+    document_id: Optional[str] = None
+    expires_in: Optional[int] = None
 
 class FinancialRatios(BaseModel):
     liquidity: Dict[str, float]
@@ -15,6 +17,8 @@ class FinancialRatios(BaseModel):
     efficiency: Dict[str, float]
     valuation: Optional[Dict[str, float]] = None
     growth: Dict[str, float]
+    periods: Optional[List[str]] = None
+    history: Optional[Dict[str, Dict[str, List[Optional[float]]]]] = None
 
 class TrendAnalysis(BaseModel):
     revenue_trend: str
@@ -50,3 +54,66 @@ class AnalysisResponse(BaseModel):
     anomalies: List[Anomaly]
     ai_insights: List[AIInsight]
     visualizations: List[ChartData]
+
+class ScenarioRequest(BaseModel):
+    changes: Dict[str, float] = {}
+    values: Dict[str, float] = {}
+    period: Optional[str] = None
+
+class ScenarioResponse(BaseModel):
+    success: bool
+    period: str
+    changed: Dict[str, Any]
+    deltas: Dict[str, Dict[str, float]]
+    ratios: FinancialRatios
+    trends: TrendAnalysis
+    anomalies: List[Anomaly]
+    ai_insights: List[AIInsight]
+    visualizations: List[ChartData]
+
+class DriverDistribution(BaseModel):
+    mean: Optional[float] = None
+    sd: Optional[float] = None
+    low: Optional[float] = None
+    high: Optional[float] = None
+
+class SimulationRequest(BaseModel):
+    drivers: Dict[str, DriverDistribution] = {}
+    correlations: Dict[str, Dict[str, float]] = {}
+    scenarios: Optional[int] = None
+    seed: int = 0
+    percentiles: Optional[List[float]] = None
+    targets: Optional[List[str]] = None
+
+class AnomalyRisk(BaseModel):
+    metric: str
+    condition: str
+    severity: str
+    probability: float
+
+class SimulationResponse(BaseModel):
+    success: bool
+    period: str
+    scenarios: int
+    seed: int
+    drivers: Dict[str, Dict[str, Optional[float]]]
+    percentiles: List[float]
+    ratios: Dict[str, Dict[str, Dict[str, float]]]
+    anomalies: List[AnomalyRisk]
+
+class SensitivityRequest(BaseModel):
+    items: Optional[List[str]] = None
+    steps: Optional[List[float]] = None
+    targets: Optional[List[str]] = None
+    heatmap: Optional[List[str]] = None
+
+class SensitivityResponse(BaseModel):
+    success: bool
+    period: str
+    items: List[str]
+    steps: List[float]
+    targets: List[str]
+    base: Dict[str, Optional[float]]
+    elasticities: Dict[str, Dict[str, Optional[float]]]
+    tornado: List[ChartData]
+    heatmaps: List[ChartData]
@@ -0,0 +1,206 @@
+"""
+Sensitivity Engine - Which line items move a ratio or the health score most
+Chosen line items are scaled over a grid of relative steps, one at a time
+and pairwise for heatmaps, as variants of the latest period that go through
+the ratio registry and the health scorers together in one broadcasted pass
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.models.schemas import ChartData, SensitivityResponse
+from app.services.ai_insights import HEALTH_SCORE_RATIOS, health_score
+from app.services.financial_analyzer import RATIOS, FinancialAnalyzer
+from app.services.statement_store import LINE_ITEM_INDEX, LINE_ITEM_KEYS, StatementStore, StatementVariants
+
+
+SENSITIVITY_MAX_VARIANTS = int(os.getenv("SENSITIVITY_MAX_VARIANTS", 1_000_000))
+
+# The target naming the overall score rather than a ratio
+HEALTH_SCORE = "health_score"
+
+DEFAULT_ITEMS = (
+    "revenue", "cogs", "operating_expenses", "interest_expense", "total_liabilities",
+    "equity", "current_assets", "current_liabilities", "inventory", "receivables"
+)
+DEFAULT_STEPS = (-0.2, -0.1, 0.0, 0.1, 0.2)
+DEFAULT_TARGETS = ("profitability.roe", "leverage.interest_coverage", HEALTH_SCORE)
+
+
+def _number(value: Any) -> Optional[float]:
+    """A JSON-safe figure: None for NaN and infinities"""
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+class SensitivityEngine:
+    """
+    Tornado, elasticity and heatmap tables for a document's latest period
+    Steps are relative (0.1 is +10%) and always include 0, the figures as
+    reported. Items not varied keep their figures, so a change in revenue
+    moves margins but not the gross profit it was reported with.
+    """
+    
+    def __init__(self, analyzer: Optional[FinancialAnalyzer] = None):
+        self.analyzer = analyzer or FinancialAnalyzer()
+    
+    def run(
+        self,
+        data: Dict[str, Any],
+        items: Optional[Sequence[str]] = None,
+        steps: Optional[Sequence[float]] = None,
+        targets: Optional[Sequence[str]] = None,
+        heatmap: Optional[Sequence[str]] = None
+    ) -> SensitivityResponse:
+        """
+        Vary each item over steps and report how the targets respond
+        targets are ratio fields such as "profitability.roe" or "health_score";
+        heatmap names the two items varied together (by default the first
+        two items). Raises ValueError for unknown or unreported items,
+        unknown targets and steps of -100% or less.
+        """
+        
+        store = self.analyzer.statement_store(data)
+        # Items missing from the latest period stand at their last reported figure, as in the ratios
+        current = store.latest_values()
+        previous = self._period(store, -2) if store.n_periods > 1 else None
+        
+        steps = sorted({0.0, *(float(step) for step in (steps if steps is not None else DEFAULT_STEPS))})
+        if steps[0] <= -1:
+            raise ValueError("steps must be greater than -1 (a -100% change)")
+        if items is None:
+            items = [item for item in DEFAULT_ITEMS if item in current]
+            if not items:
+                raise ValueError("No line items are reported")
+        items = list(dict.fromkeys(items))
+        if heatmap is None:
+            heatmap = items[:2] if len(items) > 1 else []
+        heatmap = list(heatmap)
+        if heatmap and (len(heatmap) != 2 or heatmap[0] == heatmap[1]):
+            raise ValueError("heatmap takes two different line items")
+        for item in (*items, *heatmap):
+            if item not in LINE_ITEM_INDEX:
+                raise ValueError(f"Unknown line item: {item}")
+            if item not in current:
+                raise ValueError(f"Line item not reported: {item}")
+        
+        targets = list(dict.fromkeys(targets or DEFAULT_TARGETS))
+        fields = [target for target in targets if target != HEALTH_SCORE]
+        RATIOS.select(fields)
+        if HEALTH_SCORE in targets:
+            fields += HEALTH_SCORE_RATIOS
+        
+        # Row 0 is the period as reported, then each item over the steps, then the heatmap grid
+        n = len(steps)
+        variants = 1 + len(items) * n + (n * n if heatmap else 0)
+        if variants > SENSITIVITY_MAX_VARIANTS:
+            raise ValueError(f"Too many variants ({variants}); the limit is {SENSITIVITY_MAX_VARIANTS}")
+        scale = 1 + np.array(steps)
+        factors = {item: np.ones(variants) for item in (*items, *heatmap)}
+        for k, item in enumerate(items):
+            factors[item][1 + k * n:1 + (k + 1) * n] = scale
+        grid = slice(1 + len(items) * n, variants)
+        if heatmap:
+            factors[heatmap[0]][grid] = np.tile(scale, n)
+            factors[heatmap[1]][grid] = np.repeat(scale, n)
+        
+        statements = StatementVariants(
+            {**current, **{item: current[item] * factor for item, factor in factors.items()}},
+            variants,
+            previous
+        )
+        categories = RATIOS.evaluate(statements, fields)
+        results = {
+            f"{category}.{name}": np.broadcast_to(values, statements.shape).reshape(-1)
+            for category, ratios in categories.items()
+            for name, values in ratios.items()
+        }
+        if HEALTH_SCORE in targets:
+            results[HEALTH_SCORE] = np.broadcast_to(health_score(categories), statements.shape).reshape(-1)
+        
+        down = max((step for step in steps if step < 0), default=0.0)
+        up = min((step for step in steps if step > 0), default=0.0)
+        base: Dict[str, Optional[float]] = {}
+        elasticities: Dict[str, Dict[str, Optional[float]]] = {}
+        tornado: List[ChartData] = []
+        heatmaps: List[ChartData] = []
+        for target in targets:
+            values = results[target]
+            base[target] = _number(values[0])
+            
+            rows = values[1:1 + len(items) * n].reshape(len(items), n)
+            elasticities[target] = {
+                item: self._elasticity(row[steps.index(down)], row[steps.index(up)], up - down, values[0])
+                for item, row in zip(items, rows)
+            }
+            tornado.append(self._tornado(target, items, steps, rows, values[0]))
+            if heatmap:
+                heatmaps.append(self._heatmap(target, heatmap, steps, values[grid].reshape(n, n)))
+        
+        return SensitivityResponse.model_construct(
+            success=True,
+            period=store.periods[-1],
+            items=items,
+            steps=steps,
+            targets=targets,
+            base=base,
+            elasticities=elasticities,
+            tornado=tornado,
+            heatmaps=heatmaps
+        )
+    
+    @staticmethod
+    def _period(store: StatementStore, column: int) -> Dict[str, float]:
+        """Reported figures of one period column"""
+        return {
+            key: float(value)
+            for key, value, missing in zip(LINE_ITEM_KEYS, store.values[:, column], store.missing[:, column])
+            if not missing
+        }
+    
+    @staticmethod
+    def _elasticity(low: float, high: float, width: float, base: float) -> Optional[float]:
+        """% change in a target per % change in an item, across the steps either side of 0"""
+        if not width or not base or not np.isfinite(base):
+            return None
+        return _number((high - low) / width / base)
+    
+    @staticmethod
+    def _tornado(target: str, items: List[str], steps: List[float], rows: np.ndarray, base: float) -> ChartData:
+        """Items by how far the target swings between the lowest and highest step, widest first"""
+        
+        low, high = rows[:, 0], rows[:, -1]
+        swing = np.abs(np.nan_to_num(high - low))
+        order = sorted(range(len(items)), key=lambda k: -swing[k])
+        return ChartData.model_construct(
+            chart_type="tornado",
+            title=f"{target} Sensitivity",
+            data={
+                "target": target,
+                "base": _number(base),
+                "labels": [items[k] for k in order],
+                "low": [_number(low[k]) for k in order],
+                "high": [_number(high[k]) for k in order],
+                "low_step": steps[0],
+                "high_step": steps[-1],
+                "values": [[_number(v) for v in rows[k]] for k in order]
+            },
+            explanation=f"{target} at the lowest and highest step of each line item, the others held as reported"
+        )
+    
+    @staticmethod
+    def _heatmap(target: str, pair: List[str], steps: List[float], grid: np.ndarray) -> ChartData:
+        """The target over both items' steps; values[i][j] has the second item at step i, the first at step j"""
+        return ChartData.model_construct(
+            chart_type="heatmap",
+            title=f"{target} by {pair[0]} and {pair[1]}",
+            data={
+                "target": target,
+                "x": {"item": pair[0], "steps": steps},
+                "y": {"item": pair[1], "steps": steps},
+                "values": [[_number(v) for v in row] for row in grid]
+            },
+            explanation=f"{target} as {pair[0]} and {pair[1]} change together"
+        )
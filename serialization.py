@@ -0,0 +1,47 @@
+"""
+Serialization - Fast JSON encoding for pipeline output
+Models built by the pipeline are trusted and skip re-validation; responses
+are encoded by orjson straight from parsed tables and NumPy arrays
+"""
+
+from typing import Any
+
+import numpy as np
+import orjson
+from pydantic import BaseModel
+
+from app.services.columnar import ColumnarTable
+
+
+# NaN and infinities become null, as to_jsonable() does for parsed tables
+JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    """Encode what orjson does not handle natively, one level at a time"""
+    
+    if isinstance(obj, BaseModel):
+        # Field values as-is; nested models come back through here
+        return dict(obj)
+    if isinstance(obj, ColumnarTable):
+        # Same shape as to_dict(), but the column arrays are encoded natively
+        return {"columns": list(obj.columns), "data": obj.data, "rows": obj.n_rows}
+    if isinstance(obj, np.ndarray):
+        # Object columns and non-contiguous views
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if hasattr(obj, "to_dict") and not isinstance(obj, type):
+        return obj.to_dict()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode a model, or any structure of parsed data, as compact JSON"""
+    return orjson.dumps(obj, default=_default, option=JSON_OPTIONS)
+
+
+def loads(data: bytes) -> Any:
+    return orjson.loads(data)
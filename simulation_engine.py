@@ -0,0 +1,311 @@
+"""
+Simulation Engine - Monte Carlo percentile bands for every ratio
+Revenue growth, margins, rates and working-capital days are drawn together
+as correlated scenarios, projected one period past a document's latest
+statements and run through the ratio registry as arrays, so a million
+scenarios cost a few hundred whole-array operations
+"""
+
+import os
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from app.models.schemas import AnomalyRisk, SimulationResponse
+from app.services.financial_analyzer import ANOMALY_CHECKS, RATIOS, FinancialAnalyzer
+from app.services.statement_store import StatementStore, StatementVariants
+
+
+SIMULATION_SCENARIOS = int(os.getenv("SIMULATION_SCENARIOS", 100_000))
+SIMULATION_MAX_SCENARIOS = int(os.getenv("SIMULATION_MAX_SCENARIOS", 1_000_000))
+DEFAULT_PERCENTILES = (5.0, 25.0, 50.0, 75.0, 95.0)
+
+
+class Distribution(NamedTuple):
+    """A normal distribution clipped to [low, high]; sd 0 fixes the driver at its mean"""
+    mean: float
+    sd: float = 0.0
+    low: float = -np.inf
+    high: float = np.inf
+
+
+# Drivers in sampling order. The means are replaced by the document's own figures where
+# it reports them; revenue growth falls back to the analyzer's single-period assumption
+DRIVERS: Dict[str, Distribution] = {
+    "revenue_growth": Distribution(0.15, 0.10, -1.0),
+    "gross_margin": Distribution(0.40, 0.03, -1.0, 1.0),
+    "operating_margin": Distribution(0.10, 0.03, -1.0, 1.0),
+    "interest_rate": Distribution(0.05, 0.01, 0.0, 1.0),
+    "tax_rate": Distribution(0.25, 0.02, 0.0, 1.0),
+    "dso": Distribution(45.0, 7.0, 0.0, 365.0),
+    "dio": Distribution(60.0, 10.0, 0.0, 365.0),
+    "dpo": Distribution(45.0, 7.0, 0.0, 365.0)
+}
+
+
+class SimulationEngine:
+    """
+    Percentile bands and anomaly breach probabilities from correlated draws
+    The same seed, drivers and scenario count always give the same result.
+    """
+    
+    def __init__(self, analyzer: Optional[FinancialAnalyzer] = None):
+        self.analyzer = analyzer or FinancialAnalyzer()
+    
+    def run(
+        self,
+        data: Dict[str, Any],
+        drivers: Optional[Mapping[str, Mapping[str, float]]] = None,
+        correlations: Optional[Mapping[str, Mapping[str, float]]] = None,
+        scenarios: Optional[int] = None,
+        seed: int = 0,
+        percentiles: Optional[Sequence[float]] = None,
+        targets: Optional[Sequence[str]] = None
+    ) -> SimulationResponse:
+        """
+        Simulate the period after the document's latest one
+        drivers overrides any of mean / sd / low / high per driver and
+        correlations pairs drivers, e.g. {"revenue_growth": {"operating_margin": 0.5}}.
+        targets limits the bands and breach probabilities to ratio fields or
+        categories, e.g. ["liquidity", "profitability.roe"]; only those are computed.
+        Raises ValueError for unknown drivers, targets or inconsistent correlations.
+        """
+        
+        scenarios = scenarios or SIMULATION_SCENARIOS
+        if not 1 <= scenarios <= SIMULATION_MAX_SCENARIOS:
+            raise ValueError(f"scenarios must be between 1 and {SIMULATION_MAX_SCENARIOS}")
+        percentiles = [float(q) for q in (percentiles or DEFAULT_PERCENTILES)]
+        if not all(0 <= q <= 100 for q in percentiles):
+            raise ValueError("percentiles must be between 0 and 100")
+        selected = RATIOS.select(targets)
+        
+        store = self.analyzer.statement_store(data)
+        base = store.latest_values()
+        if base.get("revenue", 0) <= 0:
+            raise ValueError("Simulation needs a positive revenue figure in the latest period")
+        
+        distributions = self.drivers(store, base, drivers or {})
+        draws = self.sample(distributions, correlations or {}, scenarios, seed)
+        statements = self.project(base, draws, scenarios)
+        del draws
+        
+        # One category at a time keeps at most a category's arrays alive at a million scenarios
+        checks = {check.field: check for check in ANOMALY_CHECKS}
+        probabilities: Dict[str, float] = {}
+        bands: Dict[str, Dict[str, Dict[str, float]]] = {}
+        for category, names in selected.items():
+            ratios = RATIOS.evaluate(statements, [f"{category}.{name}" for name in names])[category]
+            summaries: Dict[int, Dict[str, float]] = {}
+            bands[category] = {}
+            for name, values in ratios.items():
+                check = checks.get(f"{category}.{name}")
+                if check is not None:
+                    breaches = np.broadcast_to(check.compare(values, check.threshold), statements.shape)
+                    probabilities[check.field] = np.count_nonzero(breaches) / scenarios
+                # Aliases such as the DuPont components are the same array as the ratio they repeat
+                if id(values) not in summaries:
+                    summaries[id(values)] = self._band(values, percentiles, statements)
+                bands[category][name] = summaries[id(values)]
+        
+        anomalies = [
+            AnomalyRisk.model_construct(
+                metric=check.metric,
+                condition=check.condition,
+                severity=check.severity,
+                probability=probabilities[check.field]
+            )
+            for check in ANOMALY_CHECKS
+            if check.field in probabilities
+        ]
+        
+        return SimulationResponse.model_construct(
+            success=True,
+            period=f"{store.periods[-1]} + 1",
+            scenarios=scenarios,
+            seed=seed,
+            drivers={name: dist._asdict() for name, dist in distributions.items()},
+            percentiles=percentiles,
+            ratios=bands,
+            anomalies=anomalies
+        )
+    
+    @staticmethod
+    def _band(values: np.ndarray, percentiles: List[float], statements: StatementVariants) -> Dict[str, float]:
+        """
+        Mean and percentiles of one ratio across the scenarios
+        Fresh arrays are sorted in place, which beats np.percentile's copy and
+        partial sorts for several percentiles; the interpolation between the
+        closest ranks is np.percentile's default.
+        """
+        
+        values = np.broadcast_to(values, statements.shape) if values.shape != statements.shape else values
+        if not values.strides[0]:
+            # The same figure in every scenario
+            value = float(values[0, 0])
+            return {"mean": value, **{f"p{q:g}": value for q in percentiles}}
+        if not values.flags.writeable or any(np.may_share_memory(values, item) for item in statements.arrays()):
+            values = values.copy()
+        
+        values = values.reshape(-1)
+        mean = float(values.mean())
+        values.sort()
+        ranks = np.array(percentiles) / 100 * (len(values) - 1)
+        low = np.floor(ranks).astype(np.intp)
+        high = np.minimum(low + 1, len(values) - 1)
+        points = values[low] + (values[high] - values[low]) * (ranks - low)
+        return {"mean": mean, **{f"p{q:g}": float(point) for q, point in zip(percentiles, points)}}
+    
+    @staticmethod
+    def drivers(
+        store: StatementStore,
+        base: Dict[str, float],
+        overrides: Mapping[str, Mapping[str, float]]
+    ) -> Dict[str, Distribution]:
+        """Driver distributions centred on the document's latest figures, with any overrides applied"""
+        
+        unknown = [name for name in overrides if name not in DRIVERS]
+        if unknown:
+            raise ValueError(f"Unknown driver: {unknown[0]}")
+        
+        revenue = base["revenue"]
+        cogs = base.get("cogs", revenue - base["gross_profit"] if "gross_profit" in base else None)
+        debt = base.get("total_debt", base.get("total_liabilities"))
+        means = {}
+        
+        growth = store.growth("revenue")[-1] if store.n_periods > 1 else np.nan
+        if not np.isnan(growth):
+            means["revenue_growth"] = float(growth)
+        if cogs is not None:
+            means["gross_margin"] = (revenue - cogs) / revenue
+        if "operating_income" in base:
+            means["operating_margin"] = base["operating_income"] / revenue
+        if debt and "interest_expense" in base:
+            means["interest_rate"] = base["interest_expense"] / debt
+        pretax = base.get("operating_income", 0) - base.get("interest_expense", 0)
+        if "net_income" in base and pretax > 0 and 0 <= 1 - base["net_income"] / pretax <= 1:
+            means["tax_rate"] = 1 - base["net_income"] / pretax
+        if "receivables" in base:
+            means["dso"] = base["receivables"] / revenue * 365
+        if cogs:
+            if "inventory" in base:
+                means["dio"] = base["inventory"] / cogs * 365
+            if "payables" in base:
+                means["dpo"] = base["payables"] / cogs * 365
+        
+        distributions = {}
+        for name, default in DRIVERS.items():
+            distribution = default._replace(mean=means.get(name, default.mean))
+            distribution = distribution._replace(**overrides.get(name, {}))
+            if distribution.sd < 0 or distribution.low > distribution.high:
+                raise ValueError(f"Invalid distribution for {name}")
+            distributions[name] = distribution
+        return distributions
+    
+    @staticmethod
+    def sample(
+        distributions: Dict[str, Distribution],
+        correlations: Mapping[str, Mapping[str, float]],
+        scenarios: int,
+        seed: int
+    ) -> Dict[str, np.ndarray]:
+        """Correlated draws of every driver: standard normals mixed by the Cholesky factor"""
+        
+        names = list(distributions)
+        index = {name: i for i, name in enumerate(names)}
+        matrix = np.eye(len(names))
+        for first, pairs in correlations.items():
+            for second, rho in pairs.items():
+                if first not in index or second not in index:
+                    raise ValueError(f"Unknown driver: {first if first not in index else second}")
+                if first == second or not -1 <= rho <= 1:
+                    raise ValueError(f"Invalid correlation between {first} and {second}")
+                matrix[index[first], index[second]] = matrix[index[second], index[first]] = rho
+        try:
+            factor = np.linalg.cholesky(matrix)
+        except np.linalg.LinAlgError:
+            raise ValueError("Correlations are inconsistent (the matrix is not positive definite)")
+        
+        rng = np.random.default_rng(seed)
+        normals = factor @ rng.standard_normal((len(names), scenarios))
+        
+        draws = {}
+        for name, row in zip(names, normals):
+            distribution = distributions[name]
+            row *= distribution.sd
+            row += distribution.mean
+            draws[name] = np.clip(row, distribution.low, distribution.high, out=row)
+        return draws
+    
+    @staticmethod
+    def project(base: Dict[str, float], draws: Dict[str, np.ndarray], scenarios: int) -> StatementVariants:
+        """
+        Statements for the next period under each scenario
+        Costs follow the margins, working capital the days, and interest the
+        rate on today's debt; the cash this generates lands in cash, and the
+        balance sheet moves with it so assets still equal liabilities plus equity.
+        The draws are overwritten: each becomes the buffer of the figure it drives.
+        """
+        
+        def figure(key: str) -> float:
+            return base.get(key, 0.0)
+        
+        depreciation = figure("depreciation") + figure("amortization")
+        if not depreciation and "ebitda" in base and "operating_income" in base:
+            depreciation = base["ebitda"] - base["operating_income"]
+        
+        # In-place arithmetic on the draws saves a temporary per figure at a million scenarios
+        revenue = draws["revenue_growth"]
+        revenue += 1
+        revenue *= base["revenue"]
+        gross_profit = draws["gross_margin"]
+        gross_profit *= revenue
+        cogs = revenue - gross_profit
+        operating_income = draws["operating_margin"]
+        operating_income *= revenue
+        interest_expense = draws["interest_rate"]
+        interest_expense *= base.get("total_debt", figure("total_liabilities"))
+        net_income = np.subtract(1, draws["tax_rate"], out=draws["tax_rate"])
+        net_income *= operating_income - interest_expense
+        
+        receivables = draws["dso"]
+        receivables *= revenue
+        receivables /= 365
+        inventory = draws["dio"]
+        inventory *= cogs
+        inventory /= 365
+        payables = draws["dpo"]
+        payables *= cogs
+        payables /= 365
+        receivables_change = receivables - figure("receivables")
+        inventory_change = inventory - figure("inventory")
+        payables_change = payables - figure("payables")
+        working_capital_change = receivables_change + inventory_change
+        working_capital_change -= payables_change
+        operating_cash_flow = net_income + depreciation
+        operating_cash_flow -= working_capital_change
+        current_assets_change = receivables_change
+        current_assets_change += operating_cash_flow
+        current_assets_change += inventory_change
+        
+        projected = {
+            "revenue": revenue,
+            "gross_profit": gross_profit,
+            "cogs": cogs,
+            "operating_income": operating_income,
+            "operating_expenses": gross_profit - operating_income,
+            "interest_expense": interest_expense,
+            "net_income": net_income,
+            "receivables": receivables,
+            "inventory": inventory,
+            "payables": payables,
+            "operating_cash_flow": operating_cash_flow,
+            "cash": figure("cash") + operating_cash_flow,
+            "current_assets": figure("current_assets") + current_assets_change,
+            "total_assets": figure("total_assets") + current_assets_change - depreciation,
+            "current_liabilities": figure("current_liabilities") + payables_change,
+            "total_liabilities": figure("total_liabilities") + payables_change,
+            "equity": figure("equity") + net_income
+        }
+        if depreciation or "ebitda" in base:
+            projected["ebitda"] = operating_income + depreciation
+        return StatementVariants({**base, **projected}, scenarios, previous=base)
@@ -0,0 +1,395 @@
+"""
+Statement Store - Multi-period financial statements as contiguous arrays
+A fixed line-item index by a period axis, with a mask of missing values,
+so per-period calculations are whole-array operations
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+
+
+# The fixed line-item index, grouped by statement
+LINE_ITEMS: Dict[str, Tuple[str, ...]] = {
+    "balance_sheet": (
+        "total_assets", "current_assets", "cash", "receivables", "inventory",
+        "total_liabilities", "current_liabilities", "payables", "total_debt", "equity"
+    ),
+    "income_statement": (
+        "revenue", "cogs", "gross_profit", "operating_expenses", "operating_income",
+        "ebitda", "depreciation", "amortization", "interest_expense", "net_income"
+    ),
+    "cash_flow": (
+        "operating_cash_flow", "investing_cash_flow", "financing_cash_flow", "free_cash_flow"
+    )
+}
+
+LINE_ITEM_KEYS: Tuple[str, ...] = tuple(key for items in LINE_ITEMS.values() for key in items)
+LINE_ITEM_INDEX: Dict[str, int] = {key: i for i, key in enumerate(LINE_ITEM_KEYS)}
+STATEMENT_OF: Dict[str, str] = {key: name for name, items in LINE_ITEMS.items() for key in items}
+
+# Period labels that carry a year, used to order periods chronologically
+_PERIOD_YEAR = re.compile(r"(?:19|20)\d{2}")
+
+# Undated column labels by how many periods before the latest they are
+RELATIVE_PERIODS: Dict[str, int] = {
+    **dict.fromkeys(("current", "current year", "current period", "cy", "this year", "ty", "actual", "amount"), 0),
+    **dict.fromkeys(("prior", "prior year", "prior period", "previous", "previous year", "py", "last year", "ly"), -1)
+}
+# Numbered period labels such as "Q1", "H2" or "Month 3", which run oldest first
+_PERIOD_NUMBER = re.compile(r"(?:q|h|p|quarter|half|month)[ -]?(\d{1,2})")
+
+
+class StatementStore:
+    """
+    Line items x periods in one float64 array plus a boolean missing mask
+    Periods run oldest to newest, so the latest figures are the last column.
+    Missing cells are NaN in `values` and True in `missing`; series() reads
+    an item missing from the latest period as its last reported figure,
+    the same figure latest_values() reports.
+    """
+    
+    __slots__ = ("periods", "values", "missing")
+    
+    def __init__(
+        self,
+        periods: Sequence[str],
+        values: Optional[np.ndarray] = None,
+        missing: Optional[np.ndarray] = None
+    ):
+        self.periods = list(periods)
+        shape = (len(LINE_ITEM_KEYS), len(self.periods))
+        self.values = values if values is not None else np.full(shape, np.nan)
+        self.missing = missing if missing is not None else np.isnan(self.values)
+    
+    def __repr__(self) -> str:
+        return f"StatementStore(periods={self.periods!r}, items={int((~self.missing).any(axis=1).sum())})"
+    
+    def __contains__(self, key: str) -> bool:
+        return key in LINE_ITEM_INDEX and not self.missing[LINE_ITEM_INDEX[key]].all()
+    
+    @property
+    def n_periods(self) -> int:
+        return len(self.periods)
+    
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        """Shape of one line item's series"""
+        return (self.n_periods,)
+    
+    @property
+    def single_period(self) -> bool:
+        return self.n_periods < 2
+    
+    def row(self, key: str) -> np.ndarray:
+        """Values of one line item across periods (a view; NaN where missing)"""
+        return self.values[LINE_ITEM_INDEX[key]]
+    
+    def series(self, key: str, default: float = np.nan) -> np.ndarray:
+        """Copy of one line item across periods with missing cells set to default"""
+        
+        index = LINE_ITEM_INDEX[key]
+        series = np.where(self.missing[index], default, self.values[index])
+        if self.n_periods and self.missing[index, -1]:
+            latest = self.latest(key)
+            if latest is not None:
+                series[-1] = latest
+        return series
+    
+    def copy(self) -> "StatementStore":
+        return StatementStore(self.periods, self.values.copy(), self.missing.copy())
+    
+    def set(self, key: str, period: int, value: float):
+        index = LINE_ITEM_INDEX[key]
+        self.values[index, period] = value
+        self.missing[index, period] = bool(np.isnan(value))
+    
+    def latest(self, key: str) -> Optional[float]:
+        """Most recent reported value of a line item"""
+        
+        index = LINE_ITEM_INDEX[key]
+        present = np.flatnonzero(~self.missing[index])
+        return float(self.values[index, present[-1]]) if len(present) else None
+    
+    def statement(self, name: str) -> Dict[str, float]:
+        """Latest reported value of every line item in one statement"""
+        
+        result = {}
+        for key in LINE_ITEMS[name]:
+            value = self.latest(key)
+            if value is not None:
+                result[key] = value
+        return result
+    
+    def latest_values(self) -> Dict[str, float]:
+        """Latest reported value of every line item, across statements"""
+        return {key: value for name in LINE_ITEMS for key, value in self.statement(name).items()}
+    
+    def growth(self, key: str) -> np.ndarray:
+        """Period-over-period growth rate; NaN for the first period and gaps"""
+        
+        row = self.row(key)
+        growth = np.full(self.n_periods, np.nan)
+        previous = row[:-1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            growth[1:] = np.where(previous != 0, (row[1:] - previous) / np.abs(previous), np.nan)
+        return growth
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-safe representation: reported line items only, None for gaps"""
+        
+        items = {}
+        for key, index in LINE_ITEM_INDEX.items():
+            if not self.missing[index].all():
+                values = self.values[index].tolist()
+                items[key] = [None if gap else value for value, gap in zip(values, self.missing[index])]
+        return {"periods": list(self.periods), "line_items": items}
+    
+    @classmethod
+    def from_statements(cls, data: Dict[str, Any], period: str = "current") -> "StatementStore":
+        """Single-period store from balance_sheet / income_statement / cash_flow dicts"""
+        
+        builder = StatementBuilder()
+        for name in LINE_ITEMS:
+            section = data.get(name)
+            if isinstance(section, dict):
+                for key, value in section.items():
+                    builder.add(key, period, value)
+        return builder.build()
+
+
+class StatementPanel:
+    """
+    Statements of many companies stacked as line items x companies x periods
+    Companies are aligned on their latest period, so the last column is
+    everyone's latest figures; those with fewer periods are padded on the
+    left with missing cells. series() and growth() return companies x
+    periods arrays, so formulas written for one StatementStore apply as-is.
+    """
+    
+    __slots__ = ("values", "missing", "period_counts", "periods")
+    
+    def __init__(
+        self,
+        values: np.ndarray,
+        missing: Optional[np.ndarray] = None,
+        period_counts: Optional[np.ndarray] = None,
+        periods: Optional[List[List[str]]] = None
+    ):
+        if values.ndim != 3 or values.shape[0] != len(LINE_ITEM_KEYS):
+            raise ValueError(f"Expected a ({len(LINE_ITEM_KEYS)}, companies, periods) array, got {values.shape}")
+        self.values = values
+        self.missing = missing if missing is not None else np.isnan(values)
+        self.period_counts = (
+            period_counts if period_counts is not None
+            else np.full(values.shape[1], values.shape[2], dtype=np.intp)
+        )
+        self.periods = periods
+    
+    def __repr__(self) -> str:
+        return f"StatementPanel(companies={self.n_companies}, periods={self.n_periods})"
+    
+    def __contains__(self, key: str) -> bool:
+        return key in LINE_ITEM_INDEX and not self.missing[LINE_ITEM_INDEX[key]].all()
+    
+    @classmethod
+    def from_stores(cls, stores: Sequence[StatementStore]) -> "StatementPanel":
+        """Stack per-company stores; an empty store counts as one period with nothing reported"""
+        
+        counts = np.array([max(store.n_periods, 1) for store in stores], dtype=np.intp)
+        width = int(counts.max()) if len(stores) else 1
+        values = np.full((len(LINE_ITEM_KEYS), len(stores), width), np.nan)
+        missing = np.ones(values.shape, dtype=bool)
+        periods = []
+        for i, store in enumerate(stores):
+            if store.n_periods:
+                values[:, i, width - store.n_periods:] = store.values
+                missing[:, i, width - store.n_periods:] = store.missing
+            periods.append(list(store.periods) or ["current"])
+        return cls(values, missing, counts, periods)
+    
+    @property
+    def n_companies(self) -> int:
+        return self.values.shape[1]
+    
+    @property
+    def n_periods(self) -> int:
+        return self.values.shape[2]
+    
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        """Shape of one line item's series: companies x periods"""
+        return self.values.shape[1:]
+    
+    @property
+    def single_period(self) -> np.ndarray:
+        """Companies with one period, as a column that broadcasts across periods"""
+        return (self.period_counts < 2)[:, None]
+    
+    @property
+    def padding(self) -> np.ndarray:
+        """True for the cells before each company's first period"""
+        return np.arange(self.n_periods) < (self.n_periods - self.period_counts)[:, None]
+    
+    def row(self, key: str) -> np.ndarray:
+        return self.values[LINE_ITEM_INDEX[key]]
+    
+    def series(self, key: str, default: float = np.nan) -> np.ndarray:
+        """Like StatementStore.series: a gap in a company's latest period reads as its last reported figure"""
+        
+        index = LINE_ITEM_INDEX[key]
+        missing = self.missing[index]
+        series = np.where(missing, default, self.values[index])
+        gaps = np.flatnonzero(missing[:, -1] & ~missing.all(axis=1))
+        if len(gaps):
+            last = self.n_periods - 1 - np.argmin(missing[gaps, ::-1], axis=1)
+            series[gaps, -1] = self.values[index, gaps, last]
+        return series
+    
+    def growth(self, key: str) -> np.ndarray:
+        """Period-over-period growth for every company; NaN for each first period and gaps"""
+        
+        row = self.row(key)
+        growth = np.full(self.shape, np.nan)
+        previous = row[:, :-1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            growth[:, 1:] = np.where(previous != 0, (row[:, 1:] - previous) / np.abs(previous), np.nan)
+        return growth
+
+
+
+class StatementVariants:
+    """
+    Alternative versions of one period's statements, read like a StatementPanel
+    Variants are the company axis and the period the only one, so series
+    are (variants, 1) arrays. Figures in `current` are floats, shared by
+    every variant, or arrays with one value per variant; growth is measured
+    from `previous`, the period before, and there is none without it.
+    """
+    
+    __slots__ = ("current", "previous", "shape")
+    
+    def __init__(
+        self,
+        current: Mapping[str, Union[float, np.ndarray]],
+        variants: int,
+        previous: Optional[Mapping[str, float]] = None
+    ):
+        self.current = {
+            key: value.reshape(variants, 1) if isinstance(value, np.ndarray) else value
+            for key, value in current.items()
+        }
+        self.previous = previous
+        self.shape = (variants, 1)
+    
+    def __repr__(self) -> str:
+        return f"StatementVariants(variants={self.shape[0]}, items={len(self.current)})"
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self.current or (self.previous is not None and key in self.previous)
+    
+    @property
+    def single_period(self) -> bool:
+        return self.previous is None
+    
+    def arrays(self) -> List[np.ndarray]:
+        """The figures that vary between variants"""
+        return [value for value in self.current.values() if isinstance(value, np.ndarray)]
+    
+    def series(self, key: str, default: float = np.nan) -> np.ndarray:
+        value = self.current.get(key, default)
+        if isinstance(value, np.ndarray):
+            return value
+        return np.broadcast_to(np.float64(value), self.shape)
+    
+    def growth(self, key: str) -> np.ndarray:
+        previous = self.previous.get(key) if self.previous is not None else None
+        if key not in self.current or not previous:
+            return np.full(self.shape, np.nan)
+        growth = (self.current[key] - previous) / abs(previous)
+        return growth if isinstance(growth, np.ndarray) else np.full(self.shape, growth)
+
+
+# Anything the ratio formulas accept: one company's statements a stack of them or variants of them
+Statements = Union[StatementStore, StatementPanel, StatementVariants]
+
+
+class StatementBuilder:
+    """
+    Collects (line item, period, value) figures from any parser
+    The first figure for a cell wins unless a later one is authoritative
+    (a "Total ..." row beats its components). Periods are ordered by year
+    when every label has one, otherwise in the order sources introduced them.
+    """
+    
+    def __init__(self):
+        self._cells: Dict[Tuple[str, str], float] = {}
+        self._periods: List[str] = []
+        self._undated: Dict[str, float] = {}
+        self._authoritative: Set[Tuple[str, str]] = set()
+    
+    def add(self, key: str, period: str, value: Any, authoritative: bool = False):
+        """Record one figure; unknown line items and non-numbers are ignored"""
+        
+        if key not in LINE_ITEM_INDEX or not _is_number(value):
+            return
+        if period not in self._periods:
+            self._periods.append(period)
+        if authoritative:
+            if (key, period) not in self._authoritative:
+                self._authoritative.add((key, period))
+                self._cells[(key, period)] = float(value)
+        else:
+            self._cells.setdefault((key, period), float(value))
+    
+    def add_series(self, key: str, periods: Iterable[str], values: Iterable[Any], authoritative: bool = False):
+        """Record a line item across periods given oldest first"""
+        for period, value in zip(periods, values):
+            self.add(key, period, value, authoritative)
+    
+    def add_undated(self, key: str, value: Any):
+        """A figure with no period, used for the latest period if that is missing"""
+        if key in LINE_ITEM_INDEX and _is_number(value):
+            self._undated.setdefault(key, float(value))
+    
+    def build(self) -> StatementStore:
+        periods = list(self._periods)
+        if periods and all(_PERIOD_YEAR.search(p) for p in periods):
+            periods.sort(key=lambda p: _PERIOD_YEAR.search(p).group())
+        if not periods and self._undated:
+            periods = ["current"]
+        
+        store = StatementStore(periods)
+        column = {period: i for i, period in enumerate(periods)}
+        for (key, period), value in self._cells.items():
+            store.set(key, column[period], value)
+        for key, value in self._undated.items():
+            if store.missing[LINE_ITEM_INDEX[key], -1]:
+                store.set(key, len(periods) - 1, value)
+        return store
+
+
+def chronological_order(periods: Sequence[str]) -> List[int]:
+    """
+    Positions of one table's period columns, oldest first
+    Columns that all carry a year are left as they are for StatementBuilder
+    to sort. Undated ones are ordered by relative labels ("Prior", "Current",
+    "PY") or numbered ones ("Q1".."Q4"); anything else is read newest first,
+    the way statements lay out their columns.
+    """
+    
+    positions = list(range(len(periods)))
+    labels = [" ".join(str(period).lower().replace("_", " ").split()) for period in periods]
+    if any(_PERIOD_YEAR.search(label) for label in labels):
+        return positions
+    if all(label in RELATIVE_PERIODS for label in labels):
+        return sorted(positions, key=lambda i: RELATIVE_PERIODS[labels[i]])
+    numbers = [_PERIOD_NUMBER.fullmatch(label) for label in labels]
+    if all(numbers):
+        return sorted(positions, key=lambda i: int(numbers[i].group(1)))
+    return positions[::-1]
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float, np.number)) and not isinstance(value, bool) and not np.isnan(value)
@@ -0,0 +1,231 @@
+"""
+Table Detector - Streaming detection of numeric tables in extracted text
+Tables are yielded one at a time as labels plus a rows x periods float
+array, so downstream code never has to re-parse row strings
+"""
+
+import io
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+# One numeric cell: 1,250,000  (610,000)  -3.5  12%  $1,000  or a nil dash
+_CELL = r"\(?[-−]?[$€£]?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?%?\)?|[-–—]+|[$€£]"
+_CELLS = re.compile(rf"{_CELL}")
+# Blank-separated tokens of a line, matched one at a time against _CELL from the right
+_TOKENS = re.compile(r"[^ \t]+")
+_CURRENCY = frozenset("$€£")
+# Rewrites a whole run of cells into plain float literals in one call:
+# "(610,000)" -> "-610000", "$1,000" -> "1000", "—" -> "-"
+_TO_FLOATS = str.maketrans({
+    "(": "-", ")": None, ",": None, "%": None, "$": None, "€": None, "£": None,
+    "−": "-", "–": "-", "—": "-"
+})
+_DIGIT = re.compile(r"\d")
+_LETTER = re.compile(r"[^\W\d_]")
+_YEAR = re.compile(r"(?:FY)?(?:19|20)\d{2}")
+
+# Column offsets within this many characters count as aligned
+ALIGNMENT_TOLERANCE = 2
+# A period header is used if the table starts within this many lines of it
+HEADER_REACH = 3
+# Full rows sampled to locate column edges
+ANCHOR_SAMPLE_ROWS = 32
+
+# label, values, source line, offset where the cells start
+Row = Tuple[str, List[float], str, int]
+
+
+@dataclass
+class TextTable:
+    """A numeric table found in text: one label per row, one column per period"""
+    
+    labels: List[str]
+    values: np.ndarray
+    periods: List[str]
+    first_line: int
+    last_line: int
+    
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.values.shape
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-safe representation (missing cells become None)"""
+        return {
+            "labels": list(self.labels),
+            "periods": list(self.periods),
+            "values": [[None if np.isnan(v) else v for v in row] for row in self.values.tolist()],
+            "lines": [self.first_line, self.last_line]
+        }
+
+
+class TableDetector:
+    """
+    Finds runs of lines ending in numbers and turns them into arrays
+    The trailing numeric cells of a line are its values and the rest is
+    its label, so figures inside labels ("Note 3") are left alone. Rows
+    with fewer values than the table are placed by character offset when
+    the text keeps its column layout, and from the left otherwise, as a
+    missing figure is usually the earliest period.
+    """
+    
+    def __init__(self, min_rows: int = 2, max_gap: int = 1):
+        self.min_rows = min_rows
+        self.max_gap = max_gap
+    
+    def iter_tables(self, pages: Iterable[str]) -> Iterator[TextTable]:
+        """Yield tables page by page; a table never spans a page break"""
+        
+        line_number = 0
+        for page in pages:
+            rows: List[Row] = []
+            first = last = gap = 0
+            header: Optional[List[str]] = None
+            header_line = -HEADER_REACH - 1
+            
+            for line in io.StringIO(page):
+                row = self._parse_row(line) if _DIGIT.search(line) else None
+                
+                if row is not None and not rows and all(_YEAR.fullmatch(cell) for cell in row[4]):
+                    # A line of years ahead of a table labels its columns
+                    header, header_line = row[4], line_number
+                    row = None
+                
+                if row is not None:
+                    if not rows:
+                        first = line_number
+                    rows.append(row[:4])
+                    last, gap = line_number, 0
+                elif rows and line.strip():
+                    gap += 1
+                    if gap > self.max_gap:
+                        table = self._build(rows, first, last, header, header_line)
+                        if table is not None:
+                            yield table
+                        rows = []
+                
+                line_number += 1
+            
+            if rows:
+                table = self._build(rows, first, last, header, header_line)
+                if table is not None:
+                    yield table
+    
+    def detect(self, text: str) -> List[TextTable]:
+        """All tables in a single block of text"""
+        return list(self.iter_tables([text]))
+    
+    @staticmethod
+    def _parse_row(line: str) -> Optional[Tuple[str, List[float], str, int, List[str]]]:
+        """Split a line into its label and trailing numeric cells, or None"""
+        
+        # The run of cells that ends a line; everything before it is the label. One
+        # fullmatch per token keeps this linear where a single regex would backtrack
+        tokens = list(_TOKENS.finditer(line.rstrip(" \t\r\n")))
+        k = len(tokens)
+        while k and _CELLS.fullmatch(tokens[k - 1].group()):
+            k -= 1
+        if k == len(tokens):
+            return None
+        start = tokens[k - 1].end() if k else 0
+        run = [token.group() for token in tokens[k:]]
+        
+        cells = [cell for cell in run if cell not in _CURRENCY]
+        try:
+            # A bare dash (nil) is left as "-" and reads as zero
+            values = [float(v) if v.strip("-") else 0.0 for v in " ".join(run).translate(_TO_FLOATS).split()]
+        except ValueError:
+            return None
+        if not values:
+            return None
+        
+        label = line[:start].strip().rstrip(".:$ ")
+        if len(values) < 2 and not _LETTER.search(label):
+            return None
+        
+        return label, values, line, start, cells
+    
+    def _build(
+        self,
+        rows: List[Row],
+        first: int,
+        last: int,
+        header: Optional[List[str]],
+        header_line: int
+    ) -> Optional[TextTable]:
+        """Align collected rows into a labels + values table"""
+        
+        if len(rows) < self.min_rows:
+            return None
+        
+        # Period count: the widest row that occurs at least twice
+        counts: Dict[int, int] = {}
+        for _, values, _, _ in rows:
+            counts[len(values)] = counts.get(len(values), 0) + 1
+        repeated = [n for n, c in counts.items() if c >= 2]
+        periods = max(repeated) if repeated else max(counts)
+        
+        ragged = any(len(values) < periods for _, values, _, _ in rows)
+        anchors = self._column_anchors(rows, periods) if ragged else None
+        table = np.full((len(rows), periods), np.nan)
+        labels = []
+        
+        for i, (label, values, line, start) in enumerate(rows):
+            if len(values) > periods:
+                # Surplus leading figures are part of the label (e.g. a note number)
+                extra = len(values) - periods
+                label = " ".join([label] + [_format(v) for v in values[:extra]]).strip()
+                values = values[extra:]
+            
+            if len(values) == periods or anchors is None:
+                table[i, :len(values)] = values
+            else:
+                for value, column in zip(values, self._assign(_cell_ends(line, start), anchors)):
+                    table[i, column] = value
+            labels.append(label)
+        
+        if header is not None and len(header) == periods and 0 <= first - header_line <= HEADER_REACH:
+            names = list(header)
+        else:
+            names = [f"period_{j + 1}" for j in range(periods)]
+        
+        return TextTable(labels, table, names, first, last)
+    
+    @staticmethod
+    def _column_anchors(rows: List[Row], periods: int) -> Optional[np.ndarray]:
+        """Right edge of each column if full rows agree on it, else None"""
+        
+        sample = [(line, start) for _, values, line, start in rows if len(values) == periods]
+        full = np.array([_cell_ends(line, start) for line, start in sample[:ANCHOR_SAMPLE_ROWS]], dtype=float)
+        if len(full) < 2 or periods < 2:
+            return None
+        if np.any(full.max(axis=0) - full.min(axis=0) > ALIGNMENT_TOLERANCE):
+            return None
+        return np.median(full, axis=0)
+    
+    @staticmethod
+    def _assign(ends: List[int], anchors: np.ndarray) -> List[int]:
+        """Nearest column for each cell, keeping cells in left-to-right order"""
+        
+        columns = []
+        lowest = 0
+        for end in ends:
+            column = int(np.argmin(np.abs(anchors[lowest:] - end))) + lowest
+            # Leave room for the cells still to place
+            column = min(column, len(anchors) - (len(ends) - len(columns)))
+            columns.append(column)
+            lowest = column + 1
+        return columns
+
+
+def _cell_ends(line: str, start: int) -> List[int]:
+    """Character offset where each value cell of a row ends"""
+    return [m.end() for m in _CELLS.finditer(line, start) if m.group() not in _CURRENCY]
+
+
+def _format(value: float) -> str:
+    return str(int(value)) if value.is_integer() else str(value)
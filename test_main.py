@@ -2,14 +2,48 @@
 Test suite for Cosmic Finance Analyzer backend
 """
 
+import numpy as np
 import pytest
 from fastapi.testclient import TestClient
-from main import app
+from main import app, upload_spooler
 from app.services.ratio_calculator import RatioCalculator
 from app.services.file_processor import FileProcessor
+from app.services.upload_spooler import UploadSpooler, UploadTooLargeError
+from app.services.pipeline_executor import PipelineExecutor, ExecutorSaturatedError
+from app.services.result_cache import ResultCache
+from app.services.document_store import DocumentStore, ParsedDocument
+from app.services.columnar import ColumnarTable
+from app.services.line_item_extractor import LineItemExtractor
+from app.services.table_detector import TableDetector
+from app.services.ocr_engine import OCREngine, binarize, estimate_skew, band_bounds
+from app.services.statement_store import StatementStore, StatementBuilder, StatementPanel
+from app.services.financial_analyzer import FinancialAnalyzer
+from app.services.label_index import canonical_key, normalize_label
+from app.services.batch_analyzer import BatchAnalyzer, BatchTooLargeError
+from app.services.job_queue import JobQueue, JobWorker, stream_events
+from app.services.response_encoder import ResponseEncoder
+from app.services.ratio_engine import RatioEngine
+from app.services import pipeline, serialization
 
 client = TestClient(app)
 
+# FY2022 and FY2023 statements shared by the scenario, simulation and sensitivity tests
+TWO_YEAR_FIGURES = {
+    "revenue": [800, 1000], "cogs": [500, 600], "operating_income": [120, 150], "net_income": [60, 90],
+    "interest_expense": [10, 12], "total_debt": [400, 450], "total_assets": [1500, 1800],
+    "total_liabilities": [800, 1000], "equity": [700, 800], "current_assets": [500, 600],
+    "current_liabilities": [300, 350], "cash": [100, 120], "receivables": [100, 130],
+    "operating_cash_flow": [90, 110]
+}
+
+
+def two_year_statements():
+    """Parsed data holding TWO_YEAR_FIGURES as a fresh statement store"""
+    builder = StatementBuilder()
+    for key, values in TWO_YEAR_FIGURES.items():
+        builder.add_series(key, ["FY2022", "FY2023"], values)
+    return {"statements": builder.build()}
+
 
 class TestHealthEndpoints:
     """Test health check endpoints"""
@@ -238,5 +272,1563 @@ class TestEdgeCases:
         assert result["liquidity"]["current_ratio"] == 0
 
 
+class TestUploadSpooler:
+    """Test chunked upload spooling"""
+    
+    def _upload(self, content: bytes, filename: str = "statement.csv"):
+        import io
+        from fastapi import UploadFile
+        return UploadFile(file=io.BytesIO(content), filename=filename)
+    
+    def test_spool_writes_file_and_cleans_up(self):
+        """Test upload is written in chunks and removed afterwards"""
+        import asyncio
+        import hashlib
+        import os
+        
+        content = b"Account,Amount\nRevenue,1000\n" * 100
+        spooler = UploadSpooler(max_bytes=1024 * 1024, chunk_size=64)
+        
+        async def run():
+            async with spooler.spool(self._upload(content)) as upload:
+                with open(upload.path, "rb") as f:
+                    assert f.read() == content
+                assert upload.size == len(content)
+                assert upload.sha256 == hashlib.sha256(content).hexdigest()
+                assert upload.path.endswith(".csv")
+                return upload.path
+        
+        path = asyncio.run(run())
+        assert not os.path.exists(path)
+    
+    def test_spool_rejects_oversized_upload(self):
+        """Test uploads over the cap are rejected"""
+        import asyncio
+        
+        spooler = UploadSpooler(max_bytes=100, chunk_size=32)
+        
+        async def run():
+            async with spooler.spool(self._upload(b"x" * 500)):
+                pass
+        
+        with pytest.raises(UploadTooLargeError):
+            asyncio.run(run())
+    
+    def test_oversized_request_returns_413(self):
+        """Test declared Content-Length over the limit is rejected early"""
+        oversized = b"x" * (upload_spooler.max_request_bytes + 1)
+        response = client.post("/api/upload", files={"file": ("big.csv", oversized)})
+        assert response.status_code == 413
+
+
+class TestPipelineExecutor:
+    """Test the bounded pipeline executor"""
+    
+    def test_runs_task_and_records_metrics(self):
+        """Test tasks complete and are counted"""
+        import asyncio
+        
+        executor = PipelineExecutor(max_workers=0)
+        result = asyncio.run(executor.run(sum, [1, 2, 3]))
+        
+        assert result == 6
+        stats = executor.stats()
+        assert stats["submitted"] == 1
+        assert stats["completed"] == 1
+        assert stats["pending"] == 0
+    
+    def test_rejects_when_queue_is_full(self):
+        """Test tasks beyond max_pending are rejected immediately"""
+        import asyncio
+        import time
+        
+        executor = PipelineExecutor(max_workers=0, max_pending=1)
+        
+        async def run():
+            first = asyncio.ensure_future(executor.run(time.sleep, 0.2))
+            await asyncio.sleep(0.01)
+            with pytest.raises(ExecutorSaturatedError):
+                await executor.run(time.sleep, 0)
+            await first
+        
+        asyncio.run(run())
+        assert executor.stats()["rejected"] == 1
+
+
+class TestResultCache:
+    """Test the two-tier result cache"""
+    
+    def test_memory_hit_and_miss(self, tmp_path):
+        """Test values round-trip and lookups are counted"""
+        cache = ResultCache(max_memory_bytes=1024, cache_dir=str(tmp_path))
+        key = cache.make_key("abc123", "v1", "pdf")
+        
+        assert cache.get(key) is None
+        cache.put(key, b'{"success": true}')
+        assert cache.get(key) == b'{"success": true}'
+        
+        stats = cache.stats()
+        assert stats["misses"] == 1
+        assert stats["memory_hits"] == 1
+    
+    def test_key_depends_on_version(self):
+        """Test pipeline version is part of the key"""
+        assert ResultCache.make_key("abc123", "v1") != ResultCache.make_key("abc123", "v2")
+    
+    def test_lru_eviction_falls_back_to_disk(self, tmp_path):
+        """Test evicted entries are still served from the disk tier"""
+        cache = ResultCache(max_memory_bytes=10, cache_dir=str(tmp_path))
+        cache.put("a" * 64, b"12345678")
+        cache.put("b" * 64, b"abcdefgh")
+        
+        assert cache.stats()["evictions"] == 1
+        assert cache.get("a" * 64) == b"12345678"
+        assert cache.stats()["disk_hits"] == 1
+    
+    def test_disk_tier_shared_between_instances(self, tmp_path):
+        """Test a second worker sees entries written by the first"""
+        ResultCache(cache_dir=str(tmp_path)).put("c" * 64, b"shared")
+        assert ResultCache(cache_dir=str(tmp_path)).get("c" * 64) == b"shared"
+
+
+class TestDocumentStore:
+    """Test the parsed-document store"""
+    
+    def _document(self):
+        return ParsedDocument(
+            filename="statement.csv",
+            file_type="csv",
+            sha256="0" * 64,
+            extracted_data={"income_statement": {"revenue": 1000.0}}
+        )
+    
+    def test_put_and_get(self, tmp_path):
+        """Test a stored document resolves by ID"""
+        store = DocumentStore(store_dir=str(tmp_path))
+        document_id = store.put(self._document())
+        
+        document = store.get(document_id)
+        assert document.extracted_data["income_statement"]["revenue"] == 1000.0
+    
+    def test_store_dirs_kept_private(self, tmp_path, monkeypatch):
+        """Test state directories are made owner-only and refused when someone else owns them"""
+        import os
+        
+        shared = tmp_path / "shared"
+        shared.mkdir(mode=0o777)
+        os.chmod(shared, 0o777)
+        DocumentStore(store_dir=str(shared))
+        ResultCache(cache_dir=str(shared))
+        JobQueue(job_dir=str(shared / "jobs"))
+        assert shared.stat().st_mode & 0o777 == 0o700
+        assert (shared / "analysis").stat().st_mode & 0o777 == 0o700
+        assert (shared / "jobs" / "inputs").stat().st_mode & 0o777 == 0o700
+        
+        monkeypatch.setattr(os, "getuid", lambda: shared.stat().st_uid + 1)
+        for create in (
+            lambda: DocumentStore(store_dir=str(shared)),
+            lambda: ResultCache(cache_dir=str(shared)),
+            lambda: JobQueue(job_dir=str(shared / "jobs"))
+        ):
+            with pytest.raises(PermissionError):
+                create()
+    
+    def test_id_resolves_in_another_worker(self, tmp_path):
+        """Test the disk tier serves IDs issued by another process"""
+        document_id = DocumentStore(store_dir=str(tmp_path)).put(self._document())
+        assert DocumentStore(store_dir=str(tmp_path)).get(document_id).filename == "statement.csv"
+    
+    def test_memory_tier_bounded_by_bytes(self, tmp_path):
+        """Test the memory tier evicts on its byte budget as well as its entry count"""
+        import pickle
+        
+        size = len(pickle.dumps(self._document(), protocol=pickle.HIGHEST_PROTOCOL))
+        store = DocumentStore(max_entries=100, store_dir=str(tmp_path), max_memory_bytes=2 * size)
+        ids = [store.put(self._document()) for _ in range(3)]
+        
+        assert list(store._memory) == ids[1:]
+        assert store.stats()["memory_bytes"] == 2 * size
+        assert store.get(ids[0]).filename == "statement.csv"
+        assert list(store._memory) == [ids[2], ids[0]]
+        
+        memory_only = DocumentStore(max_entries=100, store_dir="", max_memory_bytes=size // 2)
+        document_id = memory_only.put(self._document())
+        assert memory_only.get(document_id).filename == "statement.csv"
+        memory_only.put(self._document())
+        assert memory_only.get(document_id) is None
+    
+    def test_expired_and_unknown_ids(self, tmp_path):
+        """Test expired or malformed IDs return None"""
+        import os
+        
+        store = DocumentStore(ttl_seconds=60, store_dir=str(tmp_path))
+        document_id = store.put(self._document())
+        store._memory.clear()
+        os.utime(os.path.join(str(tmp_path), f"{document_id}.pkl"), (0, 0))
+        
+        assert store.get(document_id) is None
+        assert store.get("../../etc/passwd") is None
+
+
+class TestExcelIngestion:
+    """Test streaming Excel ingestion"""
+    
+    def _workbook(self, tmp_path):
+        import openpyxl
+        
+        wb = openpyxl.Workbook(write_only=True)
+        bs = wb.create_sheet("Balance Sheet")
+        bs.append(["Item", "FY2022", "FY2023"])
+        bs.append(["Total Assets", 1000, 1200])
+        bs.append(["Inventory", None, 150])
+        notes = wb.create_sheet("Notes")
+        notes.append(["Note", "Text"])
+        notes.append([1, "Unaudited"])
+        path = tmp_path / "statements.xlsx"
+        wb.save(str(path))
+        return str(path)
+    
+    def test_sheets_become_columnar_tables(self, tmp_path):
+        """Test rows stream into typed columns"""
+        raw = FileProcessor()._process_excel(self._workbook(tmp_path))
+        
+        table = raw["sheets"]["Balance Sheet"]
+        assert isinstance(table, ColumnarTable)
+        assert table.columns == ["Item", "FY2022", "FY2023"]
+        assert table.is_numeric("FY2023")
+        assert table.column("FY2023").tolist() == [1200.0, 150.0]
+        assert table.to_dict()["data"]["FY2022"] == [1000.0, None]
+    
+    def test_unmapped_sheets_are_skipped(self, tmp_path):
+        """Test sheets that never map to a statement are not read"""
+        raw = FileProcessor()._process_excel(self._workbook(tmp_path))
+        
+        assert raw["sheet_names"] == ["Balance Sheet"]
+        assert raw["skipped_sheets"] == ["Notes"]
+    
+    def test_sheet_names_matched_as_words(self):
+        """Test short keywords only match whole words"""
+        classify = FileProcessor._classify_sheet
+        
+        assert classify("BS 2023") == "balance_sheet"
+        assert classify("P&L") == "income_statement"
+        assert classify("Statement of Cash Flows") == "cash_flow"
+        assert classify("Subsidiaries") is None
+        assert classify("Facts") is None
+    
+    def test_default_named_sheet_probed_for_labels(self, tmp_path):
+        """Test a "Sheet1" holding a statement is read like its CSV export would be"""
+        import openpyxl
+        
+        wb = openpyxl.Workbook(write_only=True)
+        sheet = wb.create_sheet("Sheet1")
+        sheet.append(["Account", "FY2023"])
+        sheet.append(["Revenue", 2000])
+        sheet.append(["Net Income", 270])
+        path = tmp_path / "export.xlsx"
+        wb.save(str(path))
+        
+        processor = FileProcessor()
+        structured = processor._structure_financial_data(processor._process_excel(str(path)))
+        
+        assert structured["income_statement"] == {"revenue": 2000.0, "net_income": 270.0}
+
+
+class TestCSVIngestion:
+    """Test chunked, typed CSV ingestion"""
+    
+    def test_numeric_columns_are_float_arrays(self, tmp_path):
+        """Test numeric columns are typed and thousands separators parsed"""
+        path = tmp_path / "ledger.csv"
+        path.write_text('Account,Amount\nRevenue,"2,000,000"\nCash,120000\n,\n')
+        
+        raw = FileProcessor()._process_csv(str(path))
+        table = raw["data"]
+        
+        assert isinstance(table, ColumnarTable)
+        assert raw["rows"] == 2
+        assert table.is_numeric("Amount")
+        assert table.column("Amount").tolist() == [2000000.0, 120000.0]
+        assert table.column("Account").tolist() == ["Revenue", "Cash"]
+    
+    def test_text_after_sample_is_coerced(self, tmp_path):
+        """Test stray text beyond the sampled rows becomes a blank value"""
+        import math
+        
+        path = tmp_path / "ledger.csv"
+        path.write_text("a,b\n" + "1,2\n" * 1500 + "n/a,3\n")
+        
+        table = FileProcessor()._process_csv(str(path))["data"]
+        assert table.is_numeric("a")
+        assert math.isnan(table.column("a")[-1])
+    
+    def test_data_table_shares_parsed_table(self):
+        """Test the structured data references the table instead of copying rows"""
+        processor = FileProcessor()
+        raw = processor._process_csv("sample-financials.csv")
+        structured = processor._structure_financial_data(raw)
+        
+        assert structured["data_table"] is raw["data"]
+
+
+class TestPDFExtraction:
+    """Test per-page PDF text extraction"""
+    
+    @staticmethod
+    def _write_pdf(path, page_count):
+        """Write a minimal PDF whose pages read 'Page 1', 'Page 2', ..."""
+        objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+                   "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+        kids = []
+        for number in range(1, page_count + 1):
+            stream = f"BT /F1 12 Tf 72 720 Td (Page {number}) Tj ET"
+            objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+            objects.append(
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+            )
+            kids.append(f"{len(objects)} 0 R")
+        objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {page_count} >>"
+        
+        body = b"%PDF-1.4\n"
+        offsets = []
+        for number, obj in enumerate(objects, start=1):
+            offsets.append(len(body))
+            body += f"{number} 0 obj\n{obj}\nendobj\n".encode()
+        xref = len(body)
+        body += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+        body += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+        body += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+        path.write_bytes(body)
+    
+    def test_small_pdf_extracted_sequentially(self, tmp_path):
+        """Test short documents skip the worker pool"""
+        path = tmp_path / "short.pdf"
+        self._write_pdf(path, 3)
+        
+        raw = FileProcessor()._process_pdf(str(path))
+        
+        assert raw["page_count"] == 3
+        assert raw["extraction_workers"] == 1
+        assert len(raw["page_timings"]) == 3
+        assert "Page 3" in raw["text"]
+    
+    def test_parallel_extraction_keeps_page_order(self, tmp_path, monkeypatch):
+        """Test pages extracted across workers are merged in document order"""
+        from app.services import file_processor
+        
+        path = tmp_path / "long.pdf"
+        self._write_pdf(path, 12)
+        monkeypatch.setattr(file_processor, "PDF_PARALLEL_MIN_PAGES", 4)
+        monkeypatch.setattr(file_processor, "PDF_PAGE_WORKERS", 2)
+        monkeypatch.setattr(file_processor, "PDF_PAGES_PER_TASK", 3)
+        
+        raw = FileProcessor()._process_pdf(str(path))
+        
+        assert raw["extraction_workers"] == 2
+        assert raw["page_count"] == 12
+        positions = [raw["text"].index(f"Page {n}\n") if n < 12 else raw["text"].index("Page 12")
+                     for n in range(1, 13)]
+        assert positions == sorted(positions)
+        
+        file_processor.close_page_pool()
+        assert file_processor._page_pool is None
+    
+    def test_page_workers_split_cores_across_parser_processes(self, monkeypatch):
+        """Test each parser process's page and OCR pools get its share of the cores, not all of them"""
+        import os
+        from app.services.pipeline_executor import cores_per_parser
+        
+        monkeypatch.setattr(os, "cpu_count", lambda: 8)
+        monkeypatch.delenv("SERVER_WORKERS", raising=False)
+        monkeypatch.delenv("PIPELINE_WORKERS", raising=False)
+        assert cores_per_parser() == 1
+        
+        monkeypatch.setenv("PIPELINE_WORKERS", "2")
+        assert cores_per_parser() == 4
+        
+        monkeypatch.setenv("PIPELINE_WORKERS", "0")
+        assert cores_per_parser() == 8
+        
+        monkeypatch.setenv("SERVER_WORKERS", "4")
+        monkeypatch.delenv("PIPELINE_WORKERS")
+        assert cores_per_parser() == 2
+
+
+class TestOCREngine:
+    """Test OCR preprocessing, banding and caching"""
+    
+    @staticmethod
+    def _scan(path=None, skew=0.0):
+        """Synthetic statement scan: dark text-like bars under uneven lighting"""
+        from PIL import Image, ImageDraw
+        
+        image = Image.new("L", (1200, 1600), 235)
+        draw = ImageDraw.Draw(image)
+        for i in range(28):
+            y = 80 + i * 50
+            draw.rectangle((80, y, 700 + (i % 4) * 100, y + 16), fill=30)
+        shaded = np.asarray(image).astype(float) * np.linspace(0.6, 1.0, 1200)[None, :]
+        image = Image.fromarray(shaded.astype(np.uint8))
+        if skew:
+            image = image.rotate(skew, fillcolor=235, resample=Image.BICUBIC)
+        if path is not None:
+            image.save(path)
+        return np.asarray(image)
+    
+    def test_binarize_handles_uneven_lighting(self):
+        """Test text is separated from background across a lighting gradient"""
+        ink = binarize(self._scan())
+        
+        assert ink[88, 100] and ink[88, 650]
+        assert not ink[70, 100] and not ink[70, 1100]
+    
+    def test_skew_is_detected(self):
+        """Test a rotated scan yields the correcting rotation"""
+        assert estimate_skew(binarize(self._scan(skew=-3))) == pytest.approx(3.0, abs=0.3)
+        assert estimate_skew(binarize(self._scan())) == 0.0
+    
+    def test_bands_cut_between_text_lines(self):
+        """Test band boundaries only fall on blank rows"""
+        ink = binarize(self._scan())
+        bounds = band_bounds(ink, 3, min_height=200)
+        
+        assert len(bounds) == 3
+        for top, _ in bounds[1:]:
+            assert not ink[top].any()
+    
+    def test_bands_keep_narrow_lines_whole(self):
+        """Test a short line on a wide page is never cut, however little ink its rows hold"""
+        ink = np.zeros((600, 3000), dtype=bool)
+        ink[60:70, 50:100] = True
+        ink[180:220, 40:60] = True
+        ink[195:205, 60:80] = True
+        ink[300:310, 50:100] = True
+        ink[520:530, 50:100] = True
+        ink[::7, 2999] = True
+        
+        bounds = band_bounds(ink, 3, min_height=100)
+        
+        assert len(bounds) == 3
+        assert not any(180 < top < 220 for top, _ in bounds)
+    
+    def test_bands_recognized_and_cached(self, tmp_path, monkeypatch):
+        """Test every band is recognized once and repeat scans skip OCR"""
+        from app.services import ocr_engine
+        
+        calls = []
+        
+        def fake_ocr(band, lang=None):
+            calls.append(band.size)
+            return "Revenue 1,000\n"
+        
+        monkeypatch.setattr(ocr_engine, "OCR_MIN_BAND_HEIGHT", 200)
+        monkeypatch.setattr(ocr_engine.pytesseract, "image_to_string", fake_ocr)
+        path = tmp_path / "scan.png"
+        self._scan(path, skew=-2)
+        engine = OCREngine(cache=ResultCache(namespace="ocr", cache_dir=str(tmp_path)), workers=4)
+        
+        first = engine.image_to_text(str(path))
+        assert first.bands == 4 and not first.cached
+        assert first.text.splitlines() == ["Revenue 1,000"] * 4
+        
+        second = engine.image_to_text(str(path))
+        assert second.cached
+        assert second.text == first.text
+        assert len(calls) == 4
+
+
+class TestLineItemExtractor:
+    """Test single-pass line item extraction"""
+    
+    STATEMENT = (
+        "Management discussion mentions 2023 results.\n"
+        "Total Revenue: 1,250,000\n"
+        "Cost of revenue      610,000\n"
+        "Net income 250,000\n"
+        "Total assets 2,400,000\n"
+        "Cash from operating activities 290,000\n"
+        "Total revenue 1,100,000\n"
+    )
+    
+    def test_extracts_first_value_per_line_item(self):
+        """Test items are grouped by statement with the first value winning"""
+        items = LineItemExtractor().extract(self.STATEMENT)
+        
+        assert items["income_statement"] == {"revenue": 1250000.0, "cogs": 610000.0, "net_income": 250000.0}
+        assert items["balance_sheet"] == {"total_assets": 2400000.0}
+        assert items["cash_flow"] == {"operating_cash_flow": 290000.0}
+    
+    def test_finds_all_matches_with_positions(self):
+        """Test every occurrence is reported, in order, with its span"""
+        matches = LineItemExtractor().find_all(self.STATEMENT)
+        
+        revenues = [m for m in matches if m.key == "revenue"]
+        assert [m.value for m in revenues] == [1250000.0, 1100000.0]
+        assert self.STATEMENT[revenues[0].start:revenues[0].end] == "Total Revenue: 1,250,000"
+        assert [m.start for m in matches] == sorted(m.start for m in matches)
+    
+    def test_longest_label_wins(self):
+        """Test 'cost of revenue' is not also read as revenue"""
+        matches = LineItemExtractor().find_all("Cost of revenue 610,000")
+        
+        assert [(m.key, m.value) for m in matches] == [("cogs", 610000.0)]
+    
+    def test_figures_without_labels_ignored(self):
+        """Test table figures that follow other figures are not attributed to a label"""
+        items = LineItemExtractor().extract("Revenue 100 200 300\nSegment 4 500")
+        
+        assert items["income_statement"] == {"revenue": 100.0}
+
+
+class TestTableDetector:
+    """Test streaming detection of numeric tables in text"""
+    
+    STATEMENT = (
+        "Consolidated Statement of Operations\n"
+        "                              2023          2022\n"
+        "Revenue                  1,250,000     1,100,000\n"
+        "Cost of revenue           (610,000)     (560,000)\n"
+        "Discontinued                             8,000\n"
+        "Other income                     —        3,000\n"
+        "Net income                 250,000       190,000\n"
+        "Narrative resumes here.\n"
+        "And continues without figures.\n"
+    )
+    
+    def test_table_parsed_into_labels_and_array(self):
+        """Test rows become labels plus a rows x periods float array"""
+        tables = TableDetector().detect(self.STATEMENT)
+        
+        assert len(tables) == 1
+        table = tables[0]
+        assert table.periods == ["2023", "2022"]
+        assert table.labels == ["Revenue", "Cost of revenue", "Discontinued", "Other income", "Net income"]
+        assert table.values.dtype == np.float64
+        assert table.values[1].tolist() == [-610000.0, -560000.0]
+        assert table.values[3].tolist() == [0.0, 3000.0]
+    
+    def test_short_rows_follow_column_layout(self):
+        """Test a row with one figure lands in the column it is aligned under"""
+        import math
+        
+        values = TableDetector().detect(self.STATEMENT)[0].values
+        
+        assert math.isnan(values[2, 0])
+        assert values[2, 1] == 8000.0
+    
+    def test_tables_yielded_lazily_per_page(self):
+        """Test tables are produced one at a time and never span pages"""
+        pages = iter(["Revenue 100 90\nCOGS 40 35\n", "Assets 500 450\nLiabilities 200 190\n"])
+        
+        tables = TableDetector().iter_tables(pages)
+        first = next(tables)
+        
+        assert first.labels == ["Revenue", "COGS"]
+        assert first.periods == ["period_1", "period_2"]
+        assert next(tables).labels == ["Assets", "Liabilities"]
+        assert next(tables, None) is None
+    
+    def test_text_tables_serialize(self):
+        """Test detected tables survive JSON encoding with blanks as None"""
+        import json
+        from app.services.columnar import to_jsonable
+        
+        encoded = to_jsonable({"tables": TableDetector().detect(self.STATEMENT)})
+        
+        assert json.loads(json.dumps(encoded))["tables"][0]["values"][2] == [None, 8000.0]
+    
+    def test_long_figure_row_parses_in_linear_time(self):
+        """Test a 10,000-cell line is split quickly rather than backtracking"""
+        import time
+        
+        line = "Monthly volume " + " ".join(f"{i:,}" for i in range(1_000, 11_000)) + "  \n"
+        
+        started = time.perf_counter()
+        label, values, _, start, _ = TableDetector._parse_row(line)
+        
+        assert time.perf_counter() - started < 0.5
+        assert label == "Monthly volume"
+        assert len(values) == 10_000 and values[-1] == 10_999.0
+        assert start == len("Monthly volume")
+
+
+class TestStatementStore:
+    """Test the multi-period statement store and its consumers"""
+    
+    def _store(self):
+        builder = StatementBuilder()
+        builder.add_series("revenue", ["FY2022", "FY2023"], [1000.0, 1250.0])
+        builder.add_series("net_income", ["FY2022", "FY2023"], [100.0, 150.0])
+        builder.add_series("equity", ["FY2021", "FY2022"], [400.0, 500.0])
+        return builder.build()
+    
+    def test_periods_ordered_with_missing_mask(self):
+        """Test periods run oldest first and gaps are masked, not zero"""
+        store = self._store()
+        
+        assert store.periods == ["FY2021", "FY2022", "FY2023"]
+        assert store.values.shape[1] == 3
+        assert store.missing[:, 0].sum() == store.values.shape[0] - 1
+        assert store.latest("equity") == 500.0
+        assert store.series("revenue", 0).tolist() == [0.0, 1000.0, 1250.0]
+        assert "cash" not in store
+    
+    def test_total_rows_override_components(self):
+        """Test a 'Total ...' figure wins over an earlier component row"""
+        builder = StatementBuilder()
+        builder.add("revenue", "2023", 350.0)
+        builder.add("revenue", "2023", 500.0, authoritative=True)
+        builder.add("revenue", "2023", 120.0)
+        builder.add_undated("revenue", 999.0)
+        
+        assert builder.build().statement("income_statement") == {"revenue": 500.0}
+    
+    def test_undated_columns_read_alike_from_text_and_sheets(self, tmp_path):
+        """Test undated columns follow one convention, with Prior/Current labels recognized"""
+        from app.services.statement_store import chronological_order
+        
+        csv = tmp_path / "statement.csv"
+        csv.write_text("Account,Amount,Prior\nRevenue,1200,1000\nNet Income,150,100\n")
+        processor = FileProcessor()
+        from_csv = processor._structure_financial_data(processor._process_csv(str(csv)))
+        from_text = processor._structure_financial_data(
+            {"text": "", "tables": TableDetector().detect("Revenue 1,200 1,000\nNet Income 150 100\n")}
+        )
+        
+        for structured in (from_csv, from_text):
+            store = structured["statements"]
+            assert store.latest_values()["revenue"] == 1200.0
+            assert store.growth("revenue")[-1] == pytest.approx(0.2)
+        assert from_csv["statements"].periods == ["Prior", "Amount"]
+        assert chronological_order(["PY", "CY"]) == [0, 1]
+        assert chronological_order(["Q2", "Q1", "Q3"]) == [1, 0, 2]
+        assert chronological_order(["FY2023", "FY2022"]) == [0, 1]
+        assert chronological_order(["This quarter", "Last quarter"]) == [1, 0]
+    
+    def test_ratios_computed_per_period(self):
+        """Test every ratio is reported for every period plus the latest"""
+        ratios = FinancialAnalyzer().calculate_all_ratios({"statements": self._store()})
+        
+        assert ratios.periods == ["FY2021", "FY2022", "FY2023"]
+        assert ratios.profitability["net_margin"] == pytest.approx(0.12)
+        assert ratios.history["profitability"]["net_margin"] == pytest.approx([0.0, 0.1, 0.12])
+        assert ratios.growth["revenue_growth"] == pytest.approx(0.25)
+        assert ratios.history["growth"]["revenue_growth"][0] is None
+    
+    def test_latest_ratios_use_latest_reported_figures(self):
+        """Test an item missing from the latest period reads as it does in latest_values()"""
+        from app.services.financial_analyzer import RATIOS
+        
+        builder = StatementBuilder()
+        builder.add_series("current_assets", ["FY2022", "FY2023"], [600.0, 700.0])
+        builder.add("current_liabilities", "FY2022", 300.0)
+        store = builder.build()
+        
+        ratios = FinancialAnalyzer().calculate_all_ratios({"statements": store})
+        panel = RATIOS.evaluate(StatementPanel.from_stores([store, store]), "liquidity.current_ratio")
+        
+        assert store.latest_values()["current_liabilities"] == 300.0
+        assert ratios.liquidity["current_ratio"] == pytest.approx(700.0 / 300.0)
+        assert ratios.history["liquidity"]["current_ratio"] == pytest.approx([2.0, 700.0 / 300.0])
+        assert panel["liquidity"]["current_ratio"][:, -1] == pytest.approx([700.0 / 300.0] * 2)
+    
+    def test_single_period_dicts_still_supported(self):
+        """Test plain statement dicts give the same ratios as before"""
+        data = {
+            "balance_sheet": {"current_assets": 300.0, "current_liabilities": 150.0},
+            "income_statement": {"revenue": 1000.0, "net_income": -50.0}
+        }
+        analyzer = FinancialAnalyzer()
+        ratios = analyzer.calculate_all_ratios(data)
+        
+        assert ratios.liquidity["current_ratio"] == 2.0
+        assert ratios.growth["revenue_growth"] == 0.15
+        assert ratios.history is None
+        assert [a.metric for a in analyzer.find_anomalies(data)] == ["Net Margin"]
+    
+    def test_csv_statement_parsed_into_store(self, tmp_path):
+        """Test a parsed CSV carries its statements as a store"""
+        path = tmp_path / "statement.csv"
+        path.write_text("Item,2022,2023\nProduct Sales,3000,3500\nTotal Revenue,4400,5000\nNet Income,500,600\n")
+        
+        data = FileProcessor().process_file(str(path), "csv")
+        
+        assert isinstance(data["statements"], StatementStore)
+        assert data["statements"].periods == ["2022", "2023"]
+        assert data["statements"].series("revenue").tolist() == [4400.0, 5000.0]
+        assert data["income_statement"]["revenue"] == 5000.0
+
+
+class TestLabelIndex:
+    """Test mapping raw statement labels to canonical line items"""
+    
+    def test_synonyms_map_to_one_key(self):
+        """Test differently worded labels resolve to the same line item"""
+        for label in ["Accounts Receivable", "Trade receivables, net", "AR", "Debtors"]:
+            assert canonical_key(label) == "receivables"
+        assert canonical_key("OPERATING INCOME (EBIT)") == "operating_income"
+        assert canonical_key("Total COGS") == "cogs"
+        assert canonical_key("total_equity") == "equity"
+    
+    def test_partial_matches_rejected(self):
+        """Test labels that only contain a line item name are not mapped"""
+        assert canonical_key("Deferred revenue") is None
+        assert canonical_key("Total Liabilities and Equity") is None
+        assert canonical_key("Net Income Before Tax") is None
+    
+    def test_normalization(self):
+        """Test case, punctuation and parentheticals are ignored"""
+        assert normalize_label("Shareholders' Equity (Note 12)") == "shareholders equity"
+        assert normalize_label("R&D") == "r and d"
+    
+    def test_lookups_memoized(self):
+        """Test repeated labels are served from the cache"""
+        canonical_key.cache_clear()
+        for _ in range(3):
+            canonical_key("Cash and Cash Equivalents")
+        
+        info = canonical_key.cache_info()
+        assert info.misses == 1 and info.hits == 2
+    
+    def test_statement_csv_fully_mapped(self, tmp_path):
+        """Test an Account,Amount CSV fills the balance sheet and income statement"""
+        path = tmp_path / "accounts.csv"
+        path.write_text(
+            "Account,Amount\nCash,120000\nAccounts Receivable,180000\nTotal Current Assets,450000\n"
+            "Total Assets,1000000\nShareholders Equity,500000\nRevenue,2000000\nCost of Goods Sold,1200000\n"
+        )
+        
+        data = FileProcessor().process_file(str(path), "csv")
+        
+        assert data["balance_sheet"] == {
+            "total_assets": 1000000.0, "current_assets": 450000.0, "cash": 120000.0,
+            "receivables": 180000.0, "equity": 500000.0
+        }
+        assert data["income_statement"] == {"revenue": 2000000.0, "cogs": 1200000.0}
+
+
+class TestBatchAnalyzer:
+    """Test batch analysis streamed as NDJSON"""
+    
+    CSV = b"Account,Amount\nRevenue,2000000\nNet Income,270000\nTotal Assets,1000000\n"
+    
+    def _analyzer(self, tmp_path, **kwargs):
+        return BatchAnalyzer(
+            PipelineExecutor(max_workers=0),
+            ResultCache(cache_dir=str(tmp_path / "cache")),
+            UploadSpooler(spool_dir=str(tmp_path / "spool")),
+            FileProcessor().detect_file_type,
+            **kwargs
+        )
+    
+    def _run(self, analyzer, uploads):
+        import asyncio
+        import io
+        from starlette.datastructures import UploadFile
+        
+        async def run():
+            files = [UploadFile(io.BytesIO(body), filename=name) for name, body in uploads]
+            batch = await analyzer.spool(files)
+            return [line async for line in analyzer.stream(batch)]
+        
+        return asyncio.run(run())
+    
+    def test_zip_members_streamed_with_inline_errors(self, tmp_path):
+        """Test every ZIP member gets one line and failures do not stop the batch"""
+        import io
+        import json
+        import zipfile
+        
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("acme/2023.csv", self.CSV)
+            zf.writestr("notes.txt", "not a statement")
+            zf.writestr("__MACOSX/._2023.csv", "resource fork")
+        
+        lines = self._run(self._analyzer(tmp_path), [("month-end.zip", archive.getvalue())])
+        results = {r["index"]: r for r in map(json.loads, lines)}
+        
+        assert all(line.endswith(b"\n") for line in lines)
+        assert sorted(results) == [0, 1]
+        assert results[0]["success"] and results[0]["filename"] == "acme/2023.csv"
+        assert results[0]["result"]["ratios"]["profitability"]["net_margin"] == pytest.approx(0.135)
+        assert not results[1]["success"] and "Unsupported" in results[1]["error"]
+        assert not list((tmp_path / "spool").iterdir())
+    
+    def test_repeated_files_served_from_cache(self, tmp_path):
+        """Test identical statements in a batch are analyzed once"""
+        import json
+        
+        analyzer = self._analyzer(tmp_path, concurrency=1)
+        lines = self._run(analyzer, [("a.csv", self.CSV), ("b.csv", self.CSV)])
+        
+        assert sorted(json.loads(line)["cached"] for line in lines) == [False, True]
+        assert analyzer.executor.stats()["completed"] == 1
+    
+    def test_limits(self, tmp_path):
+        """Test oversized members fail alone and too many files reject the batch"""
+        import json
+        
+        analyzer = self._analyzer(tmp_path, max_files=2)
+        analyzer.spooler.max_bytes = 10
+        lines = self._run(analyzer, [("big.csv", self.CSV)])
+        assert "exceeds maximum size" in json.loads(lines[0])["error"]
+        
+        with pytest.raises(BatchTooLargeError):
+            self._run(analyzer, [("a.csv", b"x"), ("b.csv", b"x"), ("c.csv", b"x")])
+    
+    def test_corrupt_zip_member_fails_alone(self, tmp_path):
+        """Test a member whose deflate stream is damaged gets an error line instead of failing the batch"""
+        import io
+        import json
+        import zipfile
+        
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("bad.csv", self.CSV * 50)
+            zf.writestr("good.csv", self.CSV)
+        body = bytearray(archive.getvalue())
+        with zipfile.ZipFile(io.BytesIO(bytes(body))) as zf:
+            info = zf.getinfo("bad.csv")
+        # First byte of the member's data: an invalid deflate block type
+        body[info.header_offset + 30 + len(info.filename) + len(info.extra)] = 0xFF
+        
+        lines = self._run(self._analyzer(tmp_path), [("month-end.zip", bytes(body))])
+        results = {r["filename"]: r for r in map(json.loads, lines)}
+        
+        assert not results["bad.csv"]["success"]
+        assert results["good.csv"]["success"]
+        assert not list((tmp_path / "spool").iterdir())
+    
+    def test_endpoint_accepts_more_than_a_thousand_files(self):
+        """Test the batch form is parsed up to BATCH_MAX_FILES rather than Starlette's default of 1000"""
+        files = [("files", (f"{i}.csv", self.CSV, "text/csv")) for i in range(1_001)]
+        
+        response = client.post("/api/analyze/batch", files=files)
+        
+        assert response.status_code == 200
+        assert response.headers["X-Batch-Items"] == "1001"
+    
+    def test_endpoint_results_use_default_projection(self):
+        """Test batch results leave out raw text and the data table unless asked for"""
+        import json
+        
+        files = [("files", ("a.csv", self.CSV, "text/csv"))]
+        
+        default = json.loads(client.post("/api/analyze/batch", files=files).text)
+        everything = json.loads(client.post("/api/analyze/batch?exclude=", files=files).text)
+        
+        assert default["success"] and "raw" not in default["result"]["financial_data"]
+        assert "data_table" not in default["result"]["financial_data"]
+        assert "raw" in everything["result"]["financial_data"]
+        assert client.post("/api/analyze/batch?include=nope", files=files).status_code == 400
+
+
+class TestJobQueue:
+    """Test the durable job queue and its worker"""
+    
+    def test_jobs_survive_restart(self, tmp_path):
+        """Test a queued job is still there for a new queue on the same directory"""
+        source = tmp_path / "upload.csv"
+        source.write_text("Account,Amount\nRevenue,100\n")
+        
+        job = JobQueue(job_dir=str(tmp_path / "jobs")).submit("csv", "abc", "upload.csv", str(source))
+        reopened = JobQueue(job_dir=str(tmp_path / "jobs"))
+        
+        assert not source.exists()
+        assert reopened.get(job.id).status == "queued"
+        assert reopened.claim().id == job.id
+        assert reopened.claim() is None
+    
+    def test_lapsed_lease_taken_over(self, tmp_path):
+        """Test a job whose worker died is claimed again, then failed after too many attempts"""
+        import time
+        
+        queue = JobQueue(job_dir=str(tmp_path), lease_seconds=1, max_attempts=2)
+        job = queue.submit("csv", "abc")
+        queue.claim()
+        assert queue.claim() is None
+        
+        queue._db.execute("UPDATE jobs SET heartbeat_at = ?", (time.time() - 5,))
+        assert queue.claim().attempts == 2
+        
+        queue._db.execute("UPDATE jobs SET heartbeat_at = ?", (time.time() - 5,))
+        assert queue.claim() is None
+        assert queue.get(job.id).status == "failed"
+    
+    def test_worker_runs_job_to_result(self, tmp_path):
+        """Test a claimed job is analyzed and its result stored with the status"""
+        import asyncio
+        import json
+        
+        source = tmp_path / "statement.csv"
+        source.write_text("Account,Amount\nRevenue,2000000\nNet Income,270000\n")
+        queue = JobQueue(job_dir=str(tmp_path / "jobs"))
+        worker = JobWorker(
+            queue,
+            PipelineExecutor(max_workers=0),
+            ResultCache(cache_dir=str(tmp_path / "cache")),
+            DocumentStore(store_dir=str(tmp_path / "docs"))
+        )
+        job = queue.submit("csv", "abc", "statement.csv", str(source))
+        
+        asyncio.run(worker.run_job(queue.claim()))
+        status = json.loads(queue.get(job.id).status_json())
+        
+        assert status["status"] == "succeeded" and status["progress"] == 1.0
+        assert status["result"]["ratios"]["profitability"]["net_margin"] == pytest.approx(0.135)
+        assert not list((tmp_path / "jobs" / "inputs").iterdir())
+    
+    def test_failed_job_reports_error(self, tmp_path):
+        """Test a job that cannot be analyzed ends failed with its error"""
+        import asyncio
+        
+        queue = JobQueue(job_dir=str(tmp_path / "jobs"))
+        worker = JobWorker(
+            queue,
+            PipelineExecutor(max_workers=0),
+            ResultCache(cache_dir=str(tmp_path / "cache")),
+            DocumentStore(store_dir=str(tmp_path / "docs"))
+        )
+        job = queue.submit("csv", "abc", document_id="missing")
+        
+        asyncio.run(worker.run_job(queue.claim()))
+        
+        assert queue.get(job.id).status == "failed"
+        assert "document_id" in queue.get(job.id).error
+    
+    def test_expired_jobs_swept_on_schedule(self, tmp_path):
+        """Test the sweep runs once its interval is up, not after a count of idle polls"""
+        import asyncio
+        import time
+        
+        queue = JobQueue(job_dir=str(tmp_path / "jobs"), ttl_seconds=60)
+        worker = JobWorker(queue, PipelineExecutor(max_workers=0), ResultCache(cache_dir=""),
+                           DocumentStore(store_dir=""))
+        old = queue.submit("csv", "abc")
+        queue.claim()
+        queue.fail(old.id, "boom")
+        queue._db.execute("UPDATE jobs SET finished_at = ?", (time.time() - 120,))
+        
+        asyncio.run(worker._sweep_if_due())
+        assert queue.get(old.id) is not None
+        
+        worker._next_sweep = time.monotonic()
+        asyncio.run(worker._sweep_if_due())
+        assert queue.get(old.id) is None
+
+
+class TestJobEvents:
+    """Test per-stage progress events and their Server-Sent Events stream"""
+    
+    def _run_job(self, tmp_path):
+        import asyncio
+        
+        source = tmp_path / "statement.csv"
+        source.write_text("Account,Amount\nRevenue,2000000\nNet Income,270000\n")
+        queue = JobQueue(job_dir=str(tmp_path / "jobs"))
+        worker = JobWorker(
+            queue,
+            PipelineExecutor(max_workers=0),
+            ResultCache(cache_dir=str(tmp_path / "cache")),
+            DocumentStore(store_dir=str(tmp_path / "docs"))
+        )
+        job = queue.submit("csv", "abc", "statement.csv", str(source))
+        asyncio.run(worker.run_job(queue.claim()))
+        return queue, job
+    
+    def test_stage_events_in_order(self, tmp_path):
+        """Test a job records every stage, with partial results and timings"""
+        import json
+        
+        queue, job = self._run_job(tmp_path)
+        events = [(event, json.loads(data)) for _, event, data in queue.events(job.id)]
+        names = [event for event, _ in events]
+        
+        assert names[:3] == ["uploaded", "started", "parsing"]
+        assert names.index("structured") < names.index("ratios") < names.index("insights") < names.index("charts")
+        assert names[-1] == "succeeded"
+        
+        ratios = dict(events)["ratios"]
+        assert ratios["result"]["profitability"]["net_margin"] == pytest.approx(0.135)
+        assert ratios["done"] == 1 and ratios["elapsed_ms"] >= 0
+    
+    def test_results_not_dumped_without_listener(self, monkeypatch):
+        """Test an analysis nobody listens to never builds the partial-result payloads"""
+        from app.models.schemas import FinancialRatios, TrendAnalysis
+        
+        def fail(*args, **kwargs):
+            raise AssertionError("payload built without a listener")
+        
+        monkeypatch.setattr(FinancialRatios, "model_dump", fail)
+        monkeypatch.setattr(TrendAnalysis, "model_dump", fail)
+        
+        response = pipeline.analyze_document(two_year_statements())
+        
+        assert response.ratios.profitability["net_margin"] == pytest.approx(0.09)
+    
+    def test_event_stream_resumes_and_ends(self, tmp_path):
+        """Test the SSE stream resumes after Last-Event-ID and closes on the final event"""
+        import asyncio
+        
+        queue, job = self._run_job(tmp_path)
+        
+        async def collect(after):
+            return b"".join([chunk async for chunk in stream_events(queue, job.id, after)]).decode()
+        
+        full = asyncio.run(collect(0))
+        first_seq = queue.events(job.id)[0][0]
+        resumed = asyncio.run(collect(first_seq))
+        
+        assert full.startswith(f"id: {first_seq}\nevent: uploaded\ndata: ")
+        assert full.rstrip().endswith("event: succeeded\ndata: {}")
+        assert "event: uploaded" not in resumed and "event: started" in resumed
+
+
+class TestResponseEncoder:
+    """Test field projection and response encoding"""
+    
+    BODY = (
+        b'{"success": true, "financial_data": {"raw": {"text": "..."}, "data_table": [1, 2], '
+        b'"balance_sheet": {"cash": 5}}, "ratios": {"liquidity": {"current_ratio": 2.0}}, "anomalies": []}'
+    )
+    
+    def test_raw_text_excluded_by_default(self):
+        """Test raw text and rows are dropped unless asked for"""
+        import json
+        
+        encoder = ResponseEncoder()
+        default = json.loads(encoder.project_json(self.BODY, encoder.projection()))
+        with_raw = json.loads(encoder.project_json(self.BODY, encoder.projection(include="financial_data.raw")))
+        everything = encoder.project_json(self.BODY, encoder.projection(exclude=""))
+        
+        assert default["financial_data"] == {"balance_sheet": {"cash": 5}}
+        assert with_raw == {"success": True, "financial_data": {"raw": {"text": "..."}}}
+        assert everything == self.BODY
+    
+    def test_include_nested_fields(self):
+        """Test dotted include paths keep only those fields"""
+        import json
+        
+        encoder = ResponseEncoder()
+        projected = json.loads(encoder.project_json(self.BODY, encoder.projection(include="ratios.liquidity,anomalies")))
+        
+        assert projected == {"success": True, "ratios": {"liquidity": {"current_ratio": 2.0}}, "anomalies": []}
+        with pytest.raises(ValueError):
+            encoder.projection(include="nonexistent")
+    
+    def test_compression_negotiated(self):
+        """Test gzip is used when accepted and the body is large enough"""
+        import gzip
+        
+        encoder = ResponseEncoder(compress_min_bytes=64)
+        body, encoding = encoder.compress(self.BODY, "gzip, deflate")
+        
+        assert encoding == "gzip" and gzip.decompress(body) == self.BODY
+        assert encoder.compress(self.BODY, "gzip;q=0") == (self.BODY, None)
+        assert encoder.compress(b"{}", "gzip") == (b"{}", None)
+    
+    def test_analyze_endpoint_projection(self, tmp_path):
+        """Test /api/analyze honours include= and rejects unknown fields"""
+        path = tmp_path / "statement.csv"
+        path.write_text("Account,Amount\nRevenue,2000000\nNet Income,270000\n")
+        
+        with open(path, "rb") as f:
+            response = client.post("/api/analyze?include=ratios", files={"file": ("statement.csv", f, "text/csv")})
+        with open(path, "rb") as f:
+            rejected = client.post("/api/analyze?include=bogus", files={"file": ("statement.csv", f, "text/csv")})
+        
+        assert response.status_code == 200
+        assert set(response.json()) == {"success", "ratios"}
+        assert rejected.status_code == 400
+
+
+class TestSerialization:
+    """Test trusted pipeline models and their fast JSON encoding"""
+    
+    def test_parsed_tables_encoded_like_to_jsonable(self):
+        """Test tables, stores and NumPy values encode to the same JSON as to_jsonable"""
+        import json
+        from app.services.columnar import to_jsonable
+        
+        data = {
+            "table": ColumnarTable(["Account", "Amount"], {
+                "Account": np.array(["Cash", None], dtype=object),
+                "Amount": np.array([1.5, np.nan])
+            }),
+            "statements": StatementStore.from_statements({"balance_sheet": {"cash": 5.0}}),
+            "count": np.int64(3)
+        }
+        
+        assert serialization.loads(serialization.dumps(data)) == json.loads(json.dumps(to_jsonable(data)))
+    
+    def test_analysis_matches_validated_response(self, tmp_path):
+        """Test a trusted AnalysisResponse encodes to the same JSON as a fully validated one"""
+        import json
+        from app.models.schemas import AnalysisResponse
+        from app.services.columnar import to_jsonable
+        
+        path = tmp_path / "statement.csv"
+        path.write_text("Account,Amount,Prior\nTotal Revenue,2000000,1800000\nNet Income,270000,200000\n")
+        result = pipeline.run_analysis(str(path), "csv")
+        validated = AnalysisResponse(**{**result.model_dump(), "financial_data": to_jsonable(result.financial_data)})
+        
+        assert serialization.loads(serialization.dumps(result)) == json.loads(validated.model_dump_json())
+
+
+class TestLazyImports:
+    """Test parser and report libraries are imported only when needed"""
+    
+    def test_startup_skips_parser_libraries(self):
+        """Test importing the processor and report generator loads no parser libraries"""
+        import subprocess
+        import sys
+        
+        code = (
+            "import sys\n"
+            "import app.services.file_processor, app.services.report_generator\n"
+            "heavy = ('pandas', 'PyPDF2', 'openpyxl', 'pytesseract', 'PIL', 'reportlab')\n"
+            "print(','.join(name for name in heavy if name in sys.modules))"
+        )
+        loaded = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        
+        assert loaded.stdout.strip() == ""
+    
+    def test_preload_imports_format_libraries(self):
+        """Test preload imports a format's libraries and rejects unknown formats"""
+        from app.services.file_processor import FORMAT_DEPENDENCIES
+        
+        FileProcessor().preload(["csv"])
+        
+        assert all(module.loaded for module in FORMAT_DEPENDENCIES["csv"])
+        with pytest.raises(ValueError):
+            FileProcessor().preload(["docx"])
+
+
+class TestPreforkServer:
+    """Test state shared with forked server workers"""
+    
+    def test_job_queue_usable_after_fork(self, tmp_path):
+        """Test a forked worker gets its own database connection and can use the queue"""
+        import os
+        
+        queue = JobQueue(job_dir=str(tmp_path))
+        parent_db = queue._db
+        
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                if queue._db is not parent_db and queue.submit("csv", "child").status == "queued":
+                    code = 0
+            finally:
+                os._exit(code)
+        _, status = os.waitpid(pid, 0)
+        
+        assert os.waitstatus_to_exitcode(status) == 0
+        assert queue._db is parent_db
+        assert queue.claim().sha256 == "child"
+    
+    def test_benchmarks_shared(self):
+        """Test benchmark tables are built once per process, not per instance"""
+        assert FinancialAnalyzer().benchmarks is FinancialAnalyzer().benchmarks
+    
+    def test_process_memory(self):
+        """Test memory is reported where /proc is available"""
+        from app.services.prefork_server import process_memory
+        
+        memory = process_memory()
+        
+        if memory is not None:
+            assert set(memory) == {"rss_mb", "pss_mb", "shared_mb", "private_mb"}
+            assert memory["rss_mb"] > 0
+
+
+class TestRatioEngine:
+    """Test portfolio ratios computed over stacked statements"""
+    
+    def _documents(self):
+        long_history = StatementBuilder()
+        long_history.add_series("revenue", ["FY2021", "FY2022", "FY2023"], [800.0, 1000.0, 0.0])
+        long_history.add_series("net_income", ["FY2021", "FY2022", "FY2023"], [80.0, 120.0, -30.0])
+        long_history.add_series("equity", ["FY2022", "FY2023"], [500.0, 0.0])
+        return [
+            {"statements": long_history.build()},
+            {"balance_sheet": {"current_assets": 300.0, "current_liabilities": 150.0, "inventory": 60.0}},
+            {}
+        ]
+    
+    def test_matches_scalar_ratios(self):
+        """Test every company gets exactly the ratios calculate_all_ratios gives it alone"""
+        analyzer = FinancialAnalyzer()
+        documents = self._documents()
+        
+        batch = RatioEngine(analyzer).calculate_all(documents)
+        
+        for data, ratios in zip(documents, batch):
+            assert serialization.dumps(ratios) == serialization.dumps(analyzer.calculate_all_ratios(data))
+    
+    def test_matrix_aligned_on_latest_period(self):
+        """Test companies with fewer periods are padded before their first one"""
+        documents = self._documents()
+        panel = StatementPanel.from_stores([FinancialAnalyzer.statement_store(data) for data in documents])
+        
+        matrix = RatioEngine().calculate(panel)
+        current_ratio = matrix.ratio("liquidity", "current_ratio")
+        
+        assert matrix.values.shape == (len(matrix.names), 3, 3)
+        assert current_ratio[1].tolist()[2] == 2.0
+        assert np.isnan(current_ratio[1, :2]).all()
+        assert matrix.ratio("growth", "revenue_growth")[:, -1].tolist() == [-1.0, 0.15, 0.15]
+        assert matrix.latest()[matrix.names.index(("leverage", "debt_to_equity")), 0] == 0.0
+    
+    def test_panel_shape_checked(self):
+        """Test a panel must have one row per line item"""
+        with pytest.raises(ValueError):
+            StatementPanel(np.zeros((3, 2, 2)))
+
+
+class TestRatioRegistry:
+    """Test ratios declared as a dependency graph and evaluated selectively"""
+    
+    def test_only_selected_ratios_computed(self):
+        """Test a selection computes its ratios and shared intermediates once, and nothing else"""
+        from app.services.ratio_registry import Item, Ratio, RatioRegistry
+        
+        calls = []
+        
+        def counted(name):
+            def formula(*args):
+                calls.append(name)
+                return sum(args)
+            return formula
+        
+        registry = RatioRegistry([
+            Ratio("shared", counted("shared"), (Item("revenue", 0), Item("cogs", 0))),
+            Ratio("a", counted("a"), ("shared",), "first"),
+            Ratio("b", counted("b"), ("shared", 1.0), "first"),
+            Ratio("c", counted("c"), (Item("cash", 0),), "second")
+        ])
+        
+        result = registry.evaluate({"revenue": 10.0, "cogs": 4.0}, "first")
+        
+        assert result == {"first": {"a": 14.0, "b": 15.0}}
+        assert calls == ["shared", "a", "b"]
+    
+    def test_equal_inputs_of_different_kinds_kept_apart(self):
+        """Test Item and Growth with the same fields, equal as tuples, are computed separately"""
+        from app.services.ratio_registry import Growth, Item, Ratio, RatioRegistry, same
+        
+        builder = StatementBuilder()
+        builder.add_series("revenue", ["FY2022", "FY2023"], [100.0, 125.0])
+        registry = RatioRegistry([
+            Ratio("level", same, (Item("revenue", 0.1),), "x"),
+            Ratio("change", same, (Growth("revenue", 0.1),), "x")
+        ])
+        
+        result = registry.evaluate(builder.build())["x"]
+        
+        assert result["level"].tolist() == [100.0, 125.0]
+        assert result["change"][-1] == pytest.approx(0.25)
+    
+    def test_missing_inputs_skip_dependents(self):
+        """Test a metric whose inputs are missing or zero is skipped along with what depends on it"""
+        from app.services.financial_calculator import METRICS
+        
+        metrics = METRICS.evaluate({"cogs": 500.0, "inventory": 0.0, "revenue": 1000.0, "receivables": 250.0}, "activity")
+        
+        assert metrics["activity"]["inventory_turnover"] is None
+        assert metrics["activity"]["days_inventory_outstanding"] is None
+        assert metrics["activity"]["days_sales_outstanding"] == 91.25
+    
+    def test_unknown_fields_and_cycles_rejected(self):
+        """Test unknown ratios and circular declarations raise ValueError"""
+        from app.services.financial_analyzer import RATIOS
+        from app.services.ratio_registry import Ratio, RatioRegistry, same
+        
+        assert RATIOS.select("growth,liquidity.cash_ratio") == {
+            "liquidity": ["cash_ratio"],
+            "growth": ["revenue_growth", "earnings_growth", "asset_growth"]
+        }
+        with pytest.raises(ValueError):
+            RATIOS.select("liquidity.roe")
+        with pytest.raises(ValueError):
+            RatioRegistry([Ratio("a", same, ("b",), "x"), Ratio("b", same, ("a",))])
+    
+    def test_document_ratios_endpoint(self, tmp_path):
+        """Test an uploaded document's ratios can be fetched by field"""
+        path = tmp_path / "statement.csv"
+        path.write_text("Item,Amount\nCurrent Assets,300\nCurrent Liabilities,150\nRevenue,1000\nNet Income,100\n")
+        with open(path, "rb") as f:
+            document_id = client.post("/api/upload", files={"file": ("statement.csv", f, "text/csv")}).json()["document_id"]
+        
+        response = client.get(f"/api/documents/{document_id}/ratios", params={"fields": "liquidity.current_ratio,profitability.net_margin"})
+        
+        assert response.status_code == 200
+        assert response.json()["liquidity"] == {"current_ratio": 2.0}
+        assert response.json()["profitability"] == {"net_margin": 0.1}
+        assert client.get(f"/api/documents/{document_id}/ratios", params={"fields": "liquidity.nope"}).status_code == 400
+
+
+class TestScenarioEngine:
+    """Test what-if scenarios recompute only what their overrides reach"""
+    
+    
+    def test_scenario_matches_full_analysis(self):
+        """Test a scenario gives exactly what a full analysis of the overridden statements does"""
+        from app.services import pipeline, serialization
+        from app.services.scenario_engine import ScenarioEngine
+        
+        data = two_year_statements()
+        scenario = ScenarioEngine().run("doc", data, changes={"revenue": 0.1}, values={"equity": 400})
+        
+        store = data["statements"].copy()
+        store.set("revenue", 1, 1100.0)
+        store.set("equity", 1, 400.0)
+        full = serialization.loads(serialization.dumps(pipeline.analyze_document({"statements": store})))
+        result = serialization.loads(serialization.dumps(scenario))
+        
+        for part in ("ratios", "trends", "anomalies", "ai_insights", "visualizations"):
+            assert result[part] == full[part]
+        assert result["changed"]["line_items"] == ["equity", "revenue"]
+        assert result["deltas"]["leverage"]["debt_to_equity"] == 1000 / 400 - 1000 / 800
+    
+    def test_only_dependents_recomputed(self):
+        """Test an override leaves parts that do not read it untouched"""
+        from app.services.financial_analyzer import RATIOS
+        from app.services.scenario_engine import ScenarioEngine
+        
+        engine = ScenarioEngine()
+        data = two_year_statements()
+        base = engine.base("doc", data)
+        
+        scenario = engine.run("doc", data, values={"cash": 150})
+        
+        assert RATIOS.dependents(["cash"]) == ["liquidity.cash_ratio"]
+        assert scenario.changed["ratios"] == ["liquidity.cash_ratio"]
+        assert scenario.changed["insights"] == ["liquidity", "overall"]
+        assert scenario.changed["charts"] == ["Liquidity Health"]
+        assert scenario.trends is base.trends and scenario.anomalies is base.anomalies
+        assert scenario.ratios.profitability is base.ratios.profitability
+        assert engine.run("doc", data, values={"cash": 120}).ratios is base.ratios
+        assert engine.stats()["base_misses"] == 1
+    
+    def test_scenario_endpoint(self, tmp_path):
+        """Test scenarios on an uploaded document, and bad line items, periods and IDs"""
+        path = tmp_path / "statement.csv"
+        path.write_text("Item,Amount\nCurrent Assets,300\nCurrent Liabilities,150\nRevenue,1000\nNet Income,100\n")
+        with open(path, "rb") as f:
+            document_id = client.post("/api/upload", files={"file": ("statement.csv", f, "text/csv")}).json()["document_id"]
+        
+        response = client.post(f"/api/documents/{document_id}/scenario", json={"changes": {"current_liabilities": 1.0}})
+        
+        assert response.status_code == 200
+        assert response.json()["ratios"]["liquidity"]["current_ratio"] == 1.0
+        assert response.json()["deltas"]["liquidity"]["current_ratio"] == -1.0
+        assert client.post(f"/api/documents/{document_id}/scenario", json={"values": {"nope": 1}}).status_code == 400
+        assert client.post(f"/api/documents/{document_id}/scenario", json={"period": "FY1999"}).status_code == 400
+        assert client.post("/api/documents/missing/scenario", json={}).status_code == 404
+
+
+class TestSimulationEngine:
+    """Test Monte Carlo ratio bands and anomaly breach probabilities"""
+    
+    
+    def test_seeded_and_banded(self):
+        """Test the same seed reproduces the bands, which cover every ratio in order"""
+        from app.services.financial_analyzer import RATIOS
+        from app.services.simulation_engine import SimulationEngine
+        
+        engine = SimulationEngine()
+        correlations = {"revenue_growth": {"operating_margin": 0.6}}
+        first = engine.run(two_year_statements(), correlations=correlations, scenarios=20_000, seed=7)
+        
+        assert first.ratios == engine.run(two_year_statements(), correlations=correlations, scenarios=20_000, seed=7).ratios
+        assert first.ratios != engine.run(two_year_statements(), correlations=correlations, scenarios=20_000, seed=8).ratios
+        assert {category: list(bands) for category, bands in first.ratios.items()} == RATIOS.select()
+        band = first.ratios["growth"]["revenue_growth"]
+        assert band["p5"] < band["p25"] < band["p50"] < band["p75"] < band["p95"]
+        assert abs(band["mean"] - 0.25) < 0.01
+    
+    def test_fixed_drivers_project_exactly(self):
+        """Test drivers without spread give one projected period and certain breaches"""
+        from app.services.simulation_engine import DRIVERS, SimulationEngine
+        
+        drivers = {name: {"sd": 0.0} for name in DRIVERS}
+        drivers["revenue_growth"] = {"mean": 0.1, "sd": 0.0}
+        drivers["operating_margin"] = {"mean": -0.2, "sd": 0.0}
+        result = SimulationEngine().run(two_year_statements(), drivers=drivers, scenarios=1_000)
+        
+        band = result.ratios["profitability"]["operating_margin"]
+        assert band["p5"] == band["p95"] == pytest.approx(-0.2)
+        assert result.ratios["growth"]["revenue_growth"]["p50"] == pytest.approx(0.1)
+        assert {risk.metric: risk.probability for risk in result.anomalies}["Net Margin"] == 1.0
+    
+    def test_targets_limit_the_bands(self):
+        """Test targets report only their ratios and checks, with the bands a full run gives"""
+        from app.services.simulation_engine import SimulationEngine
+        
+        engine = SimulationEngine()
+        full = engine.run(two_year_statements(), scenarios=10_000, seed=3)
+        result = engine.run(two_year_statements(), scenarios=10_000, seed=3, targets=["liquidity", "profitability.net_margin"])
+        
+        assert result.ratios == {"liquidity": full.ratios["liquidity"], "profitability": {"net_margin": full.ratios["profitability"]["net_margin"]}}
+        assert [risk.metric for risk in result.anomalies] == ["Current Ratio", "Net Margin"]
+        with pytest.raises(ValueError):
+            engine.run(two_year_statements(), scenarios=10, targets=["liquidity.nope"])
+    
+    def test_band_matches_numpy_percentile(self):
+        """Test the in-place sort gives np.percentile's figures"""
+        from app.services.simulation_engine import SimulationEngine
+        from app.services.statement_store import StatementVariants
+        
+        values = np.random.default_rng(0).lognormal(size=(10_001, 1))
+        expected = np.percentile(values, [5, 50, 97.5])
+        band = SimulationEngine._band(values.copy(), [5.0, 50.0, 97.5], StatementVariants({}, 10_001))
+        
+        assert [band["p5"], band["p50"], band["p97.5"]] == pytest.approx(expected.tolist(), rel=1e-12)
+    
+    def test_simulation_endpoint(self, tmp_path):
+        """Test simulating an uploaded document, and bad drivers, correlations and IDs"""
+        path = tmp_path / "statement.csv"
+        path.write_text("Item,Amount\nCurrent Assets,300\nCurrent Liabilities,150\nRevenue,1000\nNet Income,100\n")
+        with open(path, "rb") as f:
+            document_id = client.post("/api/upload", files={"file": ("statement.csv", f, "text/csv")}).json()["document_id"]
+        url = f"/api/documents/{document_id}/simulation"
+        
+        response = client.post(url, json={"scenarios": 5_000, "seed": 1, "percentiles": [10, 90]})
+        
+        assert response.status_code == 200
+        assert set(response.json()["ratios"]["liquidity"]["current_ratio"]) == {"mean", "p10", "p90"}
+        assert [risk["metric"] for risk in response.json()["anomalies"]] == ["Current Ratio", "Debt-to-Equity", "Net Margin"]
+        assert list(client.post(url, json={"scenarios": 100, "targets": ["leverage"]}).json()["ratios"]) == ["leverage"]
+        assert client.post(url, json={"drivers": {"nope": {"mean": 1}}}).status_code == 400
+        assert client.post(url, json={"targets": ["nope"]}).status_code == 400
+        assert client.post(url, json={"correlations": {"dso": {"dio": 0.9, "dpo": 0.9}, "dio": {"dpo": -0.9}}}).status_code == 400
+        assert client.post("/api/documents/missing/simulation", json={}).status_code == 404
+
+
+class TestSensitivityEngine:
+    """Test tornado, elasticity and heatmap tables over line-item variants"""
+    
+    def test_variants_match_direct_analysis(self):
+        """Test each varied figure gives the ratios and health score a full analysis of it would"""
+        from app.services.ai_insights import AIInsightGenerator
+        from app.services.financial_analyzer import FinancialAnalyzer
+        from app.services.sensitivity_engine import SensitivityEngine
+        
+        data = two_year_statements()
+        result = SensitivityEngine().run(data, items=["revenue", "equity"], steps=[-0.2, 0.1])
+        
+        analyzer = FinancialAnalyzer()
+        generator = AIInsightGenerator()
+        tornado = {chart.data["target"]: chart.data for chart in result.tornado}
+        for k, step in enumerate(result.steps):
+            store = data["statements"].copy()
+            store.set("equity", 1, 800 * (1 + step))
+            ratios = analyzer.calculate_all_ratios({"statements": store})
+            health = sum(
+                score(getattr(ratios, category)) for category, score in (
+                    ("liquidity", generator._score_liquidity), ("leverage", generator._score_leverage),
+                    ("profitability", generator._score_profitability), ("efficiency", generator._score_efficiency)
+                )
+            ) / 4
+            
+            row = tornado["profitability.roe"]["labels"].index("equity")
+            assert tornado["profitability.roe"]["values"][row][k] == pytest.approx(ratios.profitability["roe"])
+            row = tornado["health_score"]["labels"].index("equity")
+            assert tornado["health_score"]["values"][row][k] == pytest.approx(health)
+        
+        assert result.steps == [-0.2, 0.0, 0.1]
+        assert result.base["profitability.roe"] == pytest.approx(90 / 800)
+        assert result.elasticities["profitability.roe"]["revenue"] == 0.0
+        assert result.elasticities["leverage.interest_coverage"]["revenue"] == 0.0
+        assert tornado["profitability.roe"]["labels"] == ["equity", "revenue"]
+    
+    def test_heatmap_grid(self):
+        """Test the heatmap varies both items together, the second down the rows"""
+        from app.services.sensitivity_engine import SensitivityEngine
+        
+        result = SensitivityEngine().run(
+            two_year_statements(), items=["net_income"], steps=[-0.5, 0.5], targets=["profitability.roe"], heatmap=["net_income", "equity"]
+        )
+        heatmap = result.heatmaps[0].data
+        
+        assert result.heatmaps[0].chart_type == "heatmap"
+        assert heatmap["x"] == {"item": "net_income", "steps": [-0.5, 0.0, 0.5]}
+        assert heatmap["values"][1][1] == pytest.approx(90 / 800)
+        assert heatmap["values"][0][2] == pytest.approx(90 * 1.5 / (800 * 0.5))
+        assert result.elasticities["profitability.roe"]["net_income"] == pytest.approx(1.0)
+    
+    def test_sensitivity_endpoint(self, tmp_path):
+        """Test sensitivity of an uploaded document, and bad items, targets and IDs"""
+        path = tmp_path / "statement.csv"
+        path.write_text("Item,Amount\nCurrent Assets,300\nCurrent Liabilities,150\nRevenue,1000\nNet Income,100\n")
+        with open(path, "rb") as f:
+            document_id = client.post("/api/upload", files={"file": ("statement.csv", f, "text/csv")}).json()["document_id"]
+        url = f"/api/documents/{document_id}/sensitivity"
+        
+        response = client.post(url, json={"targets": ["liquidity.current_ratio", "health_score"]})
+        
+        assert response.status_code == 200
+        assert response.json()["items"] == ["revenue", "current_assets", "current_liabilities"]
+        assert response.json()["elasticities"]["liquidity.current_ratio"]["current_assets"] == pytest.approx(1.0)
+        assert [chart["chart_type"] for chart in response.json()["tornado"]] == ["tornado", "tornado"]
+        assert client.post(url, json={"items": ["cogs"]}).status_code == 400
+        assert client.post(url, json={"targets": ["liquidity.nope"]}).status_code == 400
+        assert client.post("/api/documents/missing/sensitivity", json={}).status_code == 404
+
+
+class TestFinancialMetrics:
+    """Test compact metric records, their wire form and expansion"""
+    
+    data = {"metrics": {"Current Assets": 300.0, "Current Liabilities": 150.0, "Revenue": 1000.0, "Net Income": 100.0}}
+    
+    def test_record_reads_like_attributes(self):
+        """Test metrics read and set by name, None where missing, and survive pickling"""
+        import pickle
+        from app.services.financial_calculator import FinancialCalculator, FinancialMetrics
+        
+        metrics = FinancialCalculator().calculate_metrics(self.data)
+        
+        assert metrics.current_ratio == 2.0
+        assert metrics.debt_to_equity is None
+        metrics.debt_to_equity = 1.5
+        assert metrics == FinancialMetrics(**{**metrics.to_dict(), "debt_to_equity": 1.5})
+        assert pickle.loads(pickle.dumps(metrics)) == metrics
+        assert not hasattr(metrics, "__dict__")
+        with pytest.raises(TypeError):
+            FinancialMetrics(nope=1.0)
+    
+    def test_wire_form_expands_to_full_result(self):
+        """Test the compact form carries only values and expands to what calculate_all_ratios gives"""
+        from app.services.financial_calculator import METRIC_FIELDS, FinancialCalculator
+        
+        calculator = FinancialCalculator()
+        full = calculator.calculate_all_ratios(self.data)
+        wire = calculator.calculate_all_ratios(self.data, compact=True)
+        expanded = calculator.expand_metrics(wire, full["raw_financials"])
+        
+        assert set(wire) == {"metadata_version", "values"}
+        assert len(wire["values"]) == len(METRIC_FIELDS)
+        assert {**expanded, "timestamp": None} == {**full, "timestamp": None}
+        assert full["liquidity_ratios"]["current_ratio"]["interpretation"] == "Good - above benchmark"
+        assert calculator.detect_anomalies(wire) == calculator.detect_anomalies(full)
+        with pytest.raises(ValueError):
+            calculator.expand_metrics({**wire, "metadata_version": "0"})
+    
+    def test_batch_records_share_one_array(self):
+        """Test a batch's records are rows of one array with each document's own figures"""
+        from app.services.financial_calculator import FinancialCalculator
+        
+        calculator = FinancialCalculator()
+        documents = [self.data, {"metrics": {"Revenue": 500.0, "Net Income": -50.0}}]
+        records = calculator.calculate_many(documents)
+        
+        assert records[0].values.base is records[1].values.base
+        assert records == [calculator.calculate_metrics(data) for data in documents]
+        assert records[1].net_profit_margin == -10.0
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,214 @@
+"""
+Upload Spooler - Chunked, size-capped streaming of uploads to disk
+Keeps request bodies out of worker memory regardless of document size
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, BinaryIO, Callable, Dict, Optional
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+
+DEFAULT_MAX_UPLOAD_SIZE = 50 * 1024 * 1024
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# Allowance for multipart boundaries and part headers on top of the file cap
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds the configured size cap"""
+    
+    def __init__(self, limit: int):
+        self.limit = limit
+        super().__init__(f"Upload exceeds maximum size of {limit} bytes")
+
+
+@dataclass
+class SpooledUpload:
+    """An upload that has been written to a temporary file on disk"""
+    
+    path: str
+    filename: str
+    size: int
+    sha256: str
+
+
+class SpoolFile:
+    """
+    A temp file written chunk by chunk, size-capped and hashed on the way
+    on_chunk is told each chunk's size before it is written and may raise
+    to stop the copy, e.g. to enforce a limit across several files.
+    """
+    
+    def __init__(
+        self,
+        directory: Optional[str],
+        filename: str,
+        limit: int,
+        on_chunk: Optional[Callable[[int], None]] = None
+    ):
+        fd, self.path = tempfile.mkstemp(suffix=os.path.splitext(filename)[1], dir=directory)
+        self.limit = limit
+        self.on_chunk = on_chunk
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._out = os.fdopen(fd, 'wb')
+    
+    @property
+    def sha256(self) -> str:
+        return self._digest.hexdigest()
+    
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.size > self.limit:
+            raise UploadTooLargeError(self.limit)
+        if self.on_chunk is not None:
+            self.on_chunk(len(chunk))
+        
+        self._digest.update(chunk)
+        self._out.write(chunk)
+    
+    def close(self):
+        self._out.close()
+    
+    def discard(self):
+        self._out.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class UploadSpooler:
+    """
+    Streams UploadFile bodies to disk in bounded chunks
+    Only one chunk is ever held in memory; the SHA-256 of the payload is
+    computed on the fly so callers never need to re-read the file
+    """
+    
+    def __init__(
+        self,
+        max_bytes: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        spool_dir: Optional[str] = None
+    ):
+        self.max_bytes = max_bytes or int(os.getenv("MAX_UPLOAD_SIZE", DEFAULT_MAX_UPLOAD_SIZE))
+        self.chunk_size = chunk_size or int(os.getenv("UPLOAD_CHUNK_SIZE", DEFAULT_CHUNK_SIZE))
+        self.spool_dir = spool_dir or os.getenv("UPLOAD_SPOOL_DIR") or None
+        if self.spool_dir:
+            os.makedirs(self.spool_dir, exist_ok=True)
+    
+    @property
+    def max_request_bytes(self) -> int:
+        """Largest request body accepted before the endpoint runs"""
+        return self.max_bytes + MULTIPART_OVERHEAD
+    
+    @asynccontextmanager
+    async def spool(self, file: UploadFile) -> AsyncIterator[SpooledUpload]:
+        """Write an upload to a temp file chunk by chunk; removed on exit"""
+        
+        written = await self.write_upload(file)
+        try:
+            yield SpooledUpload(
+                path=written.path,
+                filename=file.filename or "",
+                size=written.size,
+                sha256=written.sha256
+            )
+        finally:
+            written.discard()
+    
+    async def write_upload(
+        self,
+        file: UploadFile,
+        directory: Optional[str] = None,
+        limit: Optional[int] = None,
+        on_chunk: Optional[Callable[[int], None]] = None
+    ) -> SpoolFile:
+        """Copy an upload to a new temp file that the caller owns; nothing is left behind on failure"""
+        
+        written = SpoolFile(directory or self.spool_dir, file.filename or "", limit or self.max_bytes, on_chunk)
+        try:
+            while True:
+                chunk = await file.read(self.chunk_size)
+                if not chunk:
+                    break
+                await run_in_threadpool(written.write, chunk)
+        except BaseException:
+            written.discard()
+            raise
+        
+        written.close()
+        return written
+    
+    def write_stream(
+        self,
+        stream: BinaryIO,
+        filename: str,
+        directory: Optional[str] = None,
+        limit: Optional[int] = None,
+        on_chunk: Optional[Callable[[int], None]] = None
+    ) -> SpoolFile:
+        """write_upload for a blocking file object, such as a ZIP member; call from a thread"""
+        
+        written = SpoolFile(directory or self.spool_dir, filename, limit or self.max_bytes, on_chunk)
+        try:
+            while True:
+                chunk = stream.read(self.chunk_size)
+                if not chunk:
+                    break
+                written.write(chunk)
+        except BaseException:
+            written.discard()
+            raise
+        
+        written.close()
+        return written
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Reject oversized request bodies from their Content-Length header
+    Responds with 413 before any of the body is read or parsed.
+    path_limits raises (or lowers) the cap for specific paths.
+    """
+    
+    def __init__(self, app, max_bytes: int, path_limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_limits = path_limits or {}
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] in ("POST", "PUT"):
+            limit = self.path_limits.get(scope["path"], self.max_bytes)
+            declared = dict(scope["headers"]).get(b"content-length")
+            if declared and declared.isdigit() and int(declared) > limit:
+                await self._reject(send, limit)
+                return
+        
+        await self.app(scope, receive, send)
+    
+    async def _reject(self, send, limit: int):
+        """Send a 413 response without touching the request body"""
+        
+        body = json.dumps({
+            "detail": f"Request body exceeds maximum size of {limit} bytes"
+        }).encode()
+        
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close")
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})